@@ -1,78 +1,97 @@
 from datetime import datetime
-from telegram import Update, InlineKeyboardMarkup, InlineKeyboardButton
+from telegram import Update
 from telegram.ext import ContextTypes, ConversationHandler
 from config import Config
-from database import db
+from database import db, LEDGER_GRANT
 from keyboards import keyboards
+from money import to_nano, format_ton
+from outbox import outbox, PRIORITY_TRANSACTIONAL
+from broadcast import broadcaster
+from templates import templates
+from router import route, CB_ADMIN_PANEL, CB_VIEW_ORDERS, CB_ADD_PRODUCT, CB_CANCEL_ADD, CB_GIVE_BALANCE, CB_CANCEL_GIVE_BALANCE
 
 # States for conversation
 PRODUCT_NAME, PRODUCT_PRICE = range(2)
 GIVE_BALANCE_USER, GIVE_BALANCE_AMOUNT = range(2, 4)
+BROADCAST_TEXT, BROADCAST_CONFIRM = range(4, 6)
 
 class AdminHandler:
     def __init__(self):
         self.admin_id = Config.ADMIN_ID
     
+    @route(CB_ADMIN_PANEL)
     async def admin_panel(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        # Панель открывается кнопкой меню или кнопкой "Назад в админку"
+        query = update.callback_query
+        if query:
+            await query.answer()
+        send = query.edit_message_text if query else update.message.reply_text
+        
         if update.effective_user.id != self.admin_id:
-            await update.message.reply_text("⛔ Доступ запрещен!")
+            await send(templates.access_denied)
             return
         
-        text = f"""{Config.EMOJIS['admin']} *Админ панель*
+        # Счетчики поддерживаются триггерами - один запрос без сканирования таблиц
+        stats = await db.get_statistics()
         
-📊 Статистика:
-• Пользователей: {self._get_users_count()}
-• Товаров: {self._get_products_count()}
-• Заявок: {self._get_pending_orders_count()}
-• Баланс системы: {self._get_total_balance()} TON"""
+        text = templates.admin_panel(
+            users=stats['total_users'],
+            products=stats['total_products'],
+            pending=stats['orders_by_status'].get('pending', 0),
+            balance=format_ton(stats['total_balance'])
+        )
         
-        await update.message.reply_text(
+        await send(
             text,
             reply_markup=keyboards.admin_panel(),
             parse_mode='Markdown'
         )
     
-    async def view_orders(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+    @route(CB_VIEW_ORDERS, str)
+    async def view_orders(self, update: Update, context: ContextTypes.DEFAULT_TYPE, page_token=None):
         query = update.callback_query
         await query.answer()
         
         if query.from_user.id != self.admin_id:
-            await query.edit_message_text("⛔ Доступ запрещен!")
+            await query.edit_message_text(templates.access_denied)
             return
         
-        orders = db.get_pending_orders()
+        # Токен следующей страницы передается в callback_data: o:<токен>
+        orders, next_token = await db.get_orders_page('pending', page_token, Config.ADMIN_PAGE_SIZE)
         
         if not orders:
-            text = f"{Config.EMOJIS['check']} Нет активных заявок!"
-            await query.edit_message_text(text, reply_markup=keyboards.back_to_admin())
+            await query.edit_message_text(templates.no_orders, reply_markup=keyboards.back_to_admin())
             return
         
-        text = f"{Config.EMOJIS['clock']} *Активные заявки:*\n\n"
-        for order in orders:
-            text += f"""📦 Заявка #{order['id']}
-👤 Пользователь: @{order['username']}
-📱 Товар: {order['product_name']}
-💰 Сумма: {order['amount']} TON
-⏰ Время: {order['created_at']}
-━━━━━━━━━━━━━━━━━━━━\n"""
+        text = templates.orders_header + "".join(
+            templates.admin_order(
+                order_id=order['id'],
+                username=order['username'],
+                product_name=order['product_name'],
+                amount=format_ton(order['amount_nano']),
+                created_at=order['created_at']
+            )
+            for order in orders
+        )
         
         await query.edit_message_text(
             text,
-            reply_markup=keyboards.back_to_admin(),
+            reply_markup=keyboards.orders_page(next_token),
             parse_mode='Markdown'
         )
     
+    @route(CB_ADD_PRODUCT)
     async def start_add_product(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         query = update.callback_query
         await query.answer()
         
         if query.from_user.id != self.admin_id:
-            await query.edit_message_text("⛔ Доступ запрещен!")
+            await query.edit_message_text(templates.access_denied)
             return
         
         await query.edit_message_text(
-            f"{Config.EMOJIS['buy']} Введите название товара:",
-            reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("❌ Отмена", callback_data="cancel_add")]])
+            templates.enter_product_name,
+            reply_markup=keyboards.cancel_add()
         )
         return PRODUCT_NAME
     
@@ -80,20 +99,27 @@ class AdminHandler:
         context.user_data['product_name'] = update.message.text
         
         await update.message.reply_text(
-            f"{Config.EMOJIS['money']} Введите цену товара в TON:",
-            reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("❌ Отмена", callback_data="cancel_add")]])
+            templates.enter_product_price,
+            reply_markup=keyboards.cancel_add()
         )
         return PRODUCT_PRICE
     
     async def get_product_price(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         try:
-            price = float(update.message.text)
+            price = to_nano(update.message.text)
             name = context.user_data['product_name']
             
-            db.add_product(name, price)
+            if price <= 0:
+                await update.message.reply_text(
+                    templates.price_not_positive,
+                    reply_markup=keyboards.cancel_add()
+                )
+                return PRODUCT_PRICE
+            
+            await db.add_product(name, price)
             
             await update.message.reply_text(
-                f"{Config.EMOJIS['check']} Товар '{name}' успешно добавлен за {price} TON!",
+                templates.product_added(name, format_ton(price)),
                 reply_markup=keyboards.admin_panel()
             )
             
@@ -101,19 +127,20 @@ class AdminHandler:
             return ConversationHandler.END
             
         except ValueError:
-            await update.message.reply_text("❌ Неверная цена! Введите число.")
+            await update.message.reply_text(templates.invalid_price)
             return PRODUCT_PRICE
     
+    @route(CB_GIVE_BALANCE)
     async def start_give_balance(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         query = update.callback_query
         await query.answer()
         
         if query.from_user.id != self.admin_id:
-            await query.edit_message_text("⛔ Доступ запрещен!")
+            await query.edit_message_text(templates.access_denied)
             return
         
         await query.edit_message_text(
-            f"{Config.EMOJIS['money']} Введите ID пользователя, которому хотите выдать баланс:",
+            templates.enter_balance_user,
             reply_markup=keyboards.cancel_give_balance()
         )
         return GIVE_BALANCE_USER
@@ -124,21 +151,17 @@ class AdminHandler:
             context.user_data['give_balance_user_id'] = user_id
             
             # Проверяем существование пользователя
-            cursor = db.conn.cursor()
-            cursor.execute("SELECT username FROM users WHERE user_id = ?", (user_id,))
-            user = cursor.fetchone()
+            user = await db.get_user_by_id(user_id)
             
             if user:
-                username = user[0]
+                username = user['username']
                 await update.message.reply_text(
-                    f"👤 Пользователь найден: @{username}\n"
-                    f"{Config.EMOJIS['money']} Введите сумму в TON для выдачи:",
+                    templates.balance_user_found(username),
                     reply_markup=keyboards.cancel_give_balance()
                 )
             else:
                 await update.message.reply_text(
-                    f"❌ Пользователь с ID {user_id} не найден.\n"
-                    f"Попробуйте еще раз или нажмите 'Отмена':",
+                    templates.balance_user_not_found(user_id),
                     reply_markup=keyboards.cancel_give_balance()
                 )
                 return GIVE_BALANCE_USER
@@ -147,53 +170,48 @@ class AdminHandler:
             
         except ValueError:
             await update.message.reply_text(
-                "❌ Неверный ID пользователя! Введите число.\n"
-                "Попробуйте еще раз или нажмите 'Отмена':",
+                templates.invalid_user_id,
                 reply_markup=keyboards.cancel_give_balance()
             )
             return GIVE_BALANCE_USER
     
     async def get_amount_for_balance(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         try:
-            amount = float(update.message.text)
+            amount = to_nano(update.message.text)
             user_id = context.user_data['give_balance_user_id']
             
             if amount <= 0:
                 await update.message.reply_text(
-                    "❌ Сумма должна быть больше 0!\n"
-                    "Попробуйте еще раз или нажмите 'Отмена':",
+                    templates.amount_not_positive,
                     reply_markup=keyboards.cancel_give_balance()
                 )
                 return GIVE_BALANCE_AMOUNT
             
             # Выдаем баланс
-            db.update_balance(user_id, amount)
+            await db.credit(user_id, amount, LEDGER_GRANT, f"admin:{update.effective_user.id}")
             
             # Получаем информацию о пользователе
-            cursor = db.conn.cursor()
-            cursor.execute("SELECT username FROM users WHERE user_id = ?", (user_id,))
-            user = cursor.fetchone()
-            username = user[0] if user else "Неизвестно"
+            username = await db.get_username(user_id) or "Неизвестно"
             
-            # Отправляем уведомление пользователю
-            try:
-                await update._bot.send_message(
-                    user_id,
-                    f"{Config.EMOJIS['money']} *Вам выдан баланс!*\n\n"
-                    f"💰 Сумма: *{amount} TON*\n"
-                    f"👑 Выдал: администратор\n"
-                    f"📅 Время: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n"
-                    f"Ваш текущий баланс: *{db.get_balance(user_id)} TON*",
-                    parse_mode='Markdown'
-                )
-            except:
-                pass  # Пользователь может не начать диалог с ботом
+            # Отправляем уведомление пользователю (может не дойти, если он не начинал диалог с ботом)
+            outbox.send(
+                user_id,
+                templates.balance_granted(
+                    amount=format_ton(amount),
+                    time=datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                    balance=format_ton(await db.get_balance(user_id))
+                ),
+                priority=PRIORITY_TRANSACTIONAL,
+                parse_mode='Markdown'
+            )
             
             await update.message.reply_text(
-                f"{Config.EMOJIS['check']} Баланс успешно выдан!\n\n"
-                f"👤 Пользователь: @{username} (ID: {user_id})\n"
-                f"💰 Сумма: {amount} TON\n"
-                f"✅ Новый баланс: {db.get_balance(user_id)} TON",
+                templates.balance_granted_admin(
+                    username=username,
+                    user_id=user_id,
+                    amount=format_ton(amount),
+                    balance=format_ton(await db.get_balance(user_id))
+                ),
                 reply_markup=keyboards.admin_panel()
             )
             
@@ -202,55 +220,86 @@ class AdminHandler:
             
         except ValueError:
             await update.message.reply_text(
-                "❌ Неверная сумма! Введите число.\n"
-                "Попробуйте еще раз или нажмите 'Отмена':",
+                templates.invalid_amount,
                 reply_markup=keyboards.cancel_give_balance()
             )
             return GIVE_BALANCE_AMOUNT
     
+    async def start_broadcast(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        query = update.callback_query
+        await query.answer()
+        
+        if query.from_user.id != self.admin_id:
+            await query.edit_message_text(templates.access_denied)
+            return
+        
+        await query.edit_message_text(
+            templates.enter_broadcast_text,
+            reply_markup=keyboards.cancel_broadcast()
+        )
+        return BROADCAST_TEXT
+    
+    async def get_broadcast_text(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        context.user_data['broadcast_text'] = update.message.text
+        total = await db.get_active_users_count()
+        
+        await update.message.reply_text(
+            templates.broadcast_preview(total, update.message.text),
+            reply_markup=keyboards.confirm_broadcast()
+        )
+        return BROADCAST_CONFIRM
+    
+    async def confirm_broadcast(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        query = update.callback_query
+        await query.answer()
+        
+        # Это сообщение становится табло прогресса рассылки
+        await query.edit_message_text(templates.broadcast_started, parse_mode='Markdown')
+        await broadcaster.create(
+            context.user_data['broadcast_text'],
+            query.message.chat_id,
+            query.message.message_id
+        )
+        
+        context.user_data.clear()
+        return ConversationHandler.END
+    
+    async def cancel_broadcast(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        query = update.callback_query
+        await query.answer()
+        
+        await query.edit_message_text(
+            templates.broadcast_cancelled,
+            reply_markup=keyboards.admin_panel()
+        )
+        
+        context.user_data.clear()
+        return ConversationHandler.END
+    
+    @route(CB_CANCEL_ADD)
     async def cancel_add(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         query = update.callback_query
         await query.answer()
         
         await query.edit_message_text(
-            "❌ Добавление товара отменено.",
+            templates.add_product_cancelled,
             reply_markup=keyboards.admin_panel()
         )
         
         context.user_data.clear()
         return ConversationHandler.END
     
+    @route(CB_CANCEL_GIVE_BALANCE)
     async def cancel_give_balance(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         query = update.callback_query
         await query.answer()
         
         await query.edit_message_text(
-            "❌ Выдача баланса отменена.",
+            templates.give_balance_cancelled,
             reply_markup=keyboards.admin_panel()
         )
         
         context.user_data.clear()
         return ConversationHandler.END
-    
-    def _get_users_count(self):
-        cursor = db.conn.cursor()
-        cursor.execute("SELECT COUNT(*) FROM users")
-        return cursor.fetchone()[0]
-    
-    def _get_products_count(self):
-        cursor = db.conn.cursor()
-        cursor.execute("SELECT COUNT(*) FROM products")
-        return cursor.fetchone()[0]
-    
-    def _get_pending_orders_count(self):
-        cursor = db.conn.cursor()
-        cursor.execute("SELECT COUNT(*) FROM orders WHERE status = 'pending'")
-        return cursor.fetchone()[0]
-    
-    def _get_total_balance(self):
-        cursor = db.conn.cursor()
-        cursor.execute("SELECT SUM(balance) FROM users")
-        result = cursor.fetchone()[0]
-        return result if result else 0
 
 admin_handler = AdminHandler()
\ No newline at end of file
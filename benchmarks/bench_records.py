@@ -0,0 +1,84 @@
+"""Время и память на 100k строк заказов: dict на строку против записей models.
+
+Запуск из корня репозитория: python benchmarks/bench_records.py [строк]"""
+
+import gc
+import sqlite3
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from models import Order, fetch_all, iter_records
+
+ROWS = 100_000
+REPEATS = 5
+
+def make_connection(rows):
+    # Та же форма строки, что у orders в database.py
+    conn = sqlite3.connect(":memory:")
+    conn.execute('''
+        CREATE TABLE orders (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            product_id INTEGER,
+            amount REAL,
+            amount_nano INTEGER,
+            status TEXT DEFAULT 'pending',
+            chat_id INTEGER,
+            admin_chat_id INTEGER,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            completed_at TIMESTAMP
+        )
+    ''')
+    conn.executemany(
+        "INSERT INTO orders (user_id, product_id, amount, amount_nano, status, chat_id) VALUES (?, ?, ?, ?, ?, ?)",
+        ((1000 + i % 5000, i % 50, 1.5, 1500000000, 'completed', 1000 + i % 5000) for i in range(rows))
+    )
+    conn.commit()
+    return conn
+
+def dicts(conn):
+    # Как было до models: словарь на каждую строку
+    cursor = conn.execute("SELECT * FROM orders")
+    columns = [column[0] for column in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+def records(conn):
+    return fetch_all(conn.execute("SELECT * FROM orders"), Order)
+
+def streamed(conn):
+    # Записи не копятся: результат - только сумма
+    return sum(order.amount_nano for order in iter_records(conn.execute("SELECT * FROM orders"), Order))
+
+def measure(fn, conn):
+    """Лучшее время из REPEATS и пик памяти (tracemalloc) за один вызов"""
+    best = float('inf')
+    for _ in range(REPEATS):
+        gc.collect()
+        started = time.perf_counter()
+        result = fn(conn)
+        best = min(best, time.perf_counter() - started)
+        del result
+    
+    gc.collect()
+    tracemalloc.start()
+    result = fn(conn)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    del result
+    return best, peak
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else ROWS
+    conn = make_connection(rows)
+    
+    print(f"{rows} строк orders, лучшее из {REPEATS}")
+    for name, fn in (("dict(zip(...))", dicts), ("fetch_all", records), ("iter_records", streamed)):
+        seconds, peak = measure(fn, conn)
+        print(f"{name:16} {seconds * 1000:8.1f} ms {peak / 2 ** 20:8.1f} MiB")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+"""Стоимость выбора обработчика нажатия кнопки на одно обновление.
+
+Старая схема: пять CallbackQueryHandler с регулярками, затем общий
+handle_callback с цепочкой if/elif и разбором id через split('_').
+Новая: один CallbackQueryHandler(router.dispatch) и поиск кода в словаре
+CallbackRouter. ConversationHandler-ы стоят перед обеими схемами одинаково
+и не измеряются. Обработчики - заглушки, поэтому время - чистая маршрутизация.
+
+Запуск из корня репозитория: python benchmarks/bench_router.py [раундов]"""
+
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from telegram import CallbackQuery, Update, User
+from telegram.ext import CallbackQueryHandler
+
+from router import (
+    CallbackRouter, route, callback_data, CB_MAIN_MENU, CB_VIEW_ORDERS, CB_SHOW_PRODUCTS,
+    CB_PRODUCT, CB_BUY, CB_PAID, CB_COMPLETE, CB_REJECT, CB_CANCEL_PAYMENT
+)
+
+ROUNDS = 20000
+
+# Типичные кнопки в старом и новом формате callback_data
+OLD_BUTTONS = [
+    "main_menu", "show_products", "product_123456", "buy_123456", "paid_654321",
+    "complete_654321", "reject_654321", "view_orders", "cancel_payment"
+]
+NEW_BUTTONS = [
+    callback_data(CB_MAIN_MENU), callback_data(CB_SHOW_PRODUCTS), callback_data(CB_PRODUCT, 123456),
+    callback_data(CB_BUY, 123456), callback_data(CB_PAID, 654321), callback_data(CB_COMPLETE, 654321),
+    callback_data(CB_REJECT, 654321), callback_data(CB_VIEW_ORDERS), callback_data(CB_CANCEL_PAYMENT)
+]
+
+class OldHandlers:
+    """Обработчики до роутера: id разбирается внутри каждого из callback_data"""
+    
+    async def show_product_detail(self, update, context):
+        return int(update.callback_query.data.split('_')[1])
+    
+    async def buy_product(self, update, context):
+        return int(update.callback_query.data.split('_')[1])
+    
+    async def confirm_payment(self, update, context):
+        return int(update.callback_query.data.split('_')[1])
+    
+    async def complete_order_admin(self, update, context):
+        return int(update.callback_query.data.split('_')[1])
+    
+    async def reject_order_admin(self, update, context):
+        return int(update.callback_query.data.split('_')[1])
+    
+    async def show_products(self, update, context):
+        pass
+    
+    async def main_menu(self, update, context):
+        pass
+    
+    async def view_orders(self, update, context):
+        pass
+    
+    async def cancel_payment(self, update, context):
+        pass
+    
+    async def handle_callback(self, update, context):
+        data = update.callback_query.data
+        
+        if data == "main_menu":
+            await self.main_menu(update, context)
+        elif data == "admin_panel":
+            pass
+        elif data == "view_orders" or data.startswith("orders_page_"):
+            await self.view_orders(update, context)
+        elif data == "add_product":
+            pass
+        elif data == "give_balance":
+            pass
+        elif data == "show_products":
+            await self.show_products(update, context)
+        elif data == "back_to_products":
+            await self.show_products(update, context)
+        elif data.startswith("product_"):
+            await self.show_product_detail(update, context)
+        elif data.startswith("buy_"):
+            await self.buy_product(update, context)
+        elif data.startswith("paid_"):
+            await self.confirm_payment(update, context)
+        elif data.startswith("complete_"):
+            await self.complete_order_admin(update, context)
+        elif data.startswith("reject_"):
+            await self.reject_order_admin(update, context)
+        elif data == "cancel_payment":
+            await self.cancel_payment(update, context)
+
+class NewHandlers:
+    """Те же обработчики за роутером: аргументы уже разобраны"""
+    
+    @route(CB_PRODUCT, int)
+    async def show_product_detail(self, update, context, product_id):
+        return product_id
+    
+    @route(CB_BUY, int)
+    async def buy_product(self, update, context, product_id):
+        return product_id
+    
+    @route(CB_PAID, int)
+    async def confirm_payment(self, update, context, order_id):
+        return order_id
+    
+    @route(CB_COMPLETE, int)
+    async def complete_order_admin(self, update, context, order_id):
+        return order_id
+    
+    @route(CB_REJECT, int)
+    async def reject_order_admin(self, update, context, order_id):
+        return order_id
+    
+    @route(CB_SHOW_PRODUCTS, str)
+    async def show_products(self, update, context, category=''):
+        pass
+    
+    @route(CB_MAIN_MENU)
+    async def main_menu(self, update, context):
+        pass
+    
+    @route(CB_VIEW_ORDERS, str)
+    async def view_orders(self, update, context, page_token=None):
+        pass
+    
+    @route(CB_CANCEL_PAYMENT)
+    async def cancel_payment(self, update, context):
+        pass
+
+def make_updates(buttons):
+    user = User(1, "user", False)
+    return [Update(i, callback_query=CallbackQuery(str(i), user, "chat", data=data))
+            for i, data in enumerate(buttons)]
+
+def old_handlers():
+    handlers = OldHandlers()
+    return [
+        CallbackQueryHandler(handlers.show_product_detail, pattern='^product_'),
+        CallbackQueryHandler(handlers.buy_product, pattern='^buy_'),
+        CallbackQueryHandler(handlers.confirm_payment, pattern='^paid_'),
+        CallbackQueryHandler(handlers.complete_order_admin, pattern='^complete_'),
+        CallbackQueryHandler(handlers.reject_order_admin, pattern='^reject_'),
+        CallbackQueryHandler(handlers.handle_callback)
+    ]
+
+def new_handlers():
+    router = CallbackRouter()
+    router.include(NewHandlers())
+    return router, [CallbackQueryHandler(router.dispatch)]
+
+async def select(handlers, update):
+    # Как Application.process_update: первый обработчик, чей check_update прошел
+    for handler in handlers:
+        if handler.check_update(update):
+            return await handler.callback(update, None)
+
+async def run(handlers, updates, rounds):
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for update in updates:
+            await select(handlers, update)
+    return (time.perf_counter() - started) / (rounds * len(updates))
+
+def resolve_only(router, buttons, rounds):
+    resolve = router.resolve
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for data in buttons:
+            resolve(data)
+    return (time.perf_counter() - started) / (rounds * len(buttons))
+
+def main():
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else ROUNDS
+    router, handlers = new_handlers()
+    assert all(router.resolve(data) for data in NEW_BUTTONS)
+    
+    old = asyncio.run(run(old_handlers(), make_updates(OLD_BUTTONS), rounds))
+    new = asyncio.run(run(handlers, make_updates(NEW_BUTTONS), rounds))
+    resolved = resolve_only(router, NEW_BUTTONS, rounds)
+    
+    print(f"{len(NEW_BUTTONS)} кнопок, {rounds} раундов")
+    print(f"регулярки + if/elif:        {old * 1e6:6.2f} us/update")
+    print(f"CallbackRouter.dispatch:    {new * 1e6:6.2f} us/update")
+    print(f"  из них CallbackRouter.resolve: {resolved * 1e6:6.2f} us")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""Стоимость отрисовки текстов: f-строка прямо в обработчике против templates.
+
+Базовая линия - f-строка в коде обработчика, как до templates.py: эмодзи
+берутся из self.emojis на каждый вызов. Тексты совпадают с templates
+посимвольно (проверяется перед замером). Карточка товара сравнивается
+с попаданием в кэш карточек CatalogCache (без запроса к базе в обоих случаях).
+
+Запуск из корня репозитория: python benchmarks/bench_templates.py [вызовов]"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+# templates тянет database, которая открывает базу при импорте
+os.environ.setdefault("DATABASE_NAME", os.path.join(tempfile.mkdtemp(prefix="bench-templates-"), "bot.db"))
+
+from config import Config
+from catalog import catalog
+from database import db
+from money import format_ton
+from templates import templates
+
+NUMBER = 100000
+REPEATS = 7
+
+class Handler:
+    def __init__(self):
+        self.emojis = Config.EMOJIS
+
+def cached_card(product_id):
+    """catalog.get_product_text при попадании в кэш: корутина завершается без ожидания"""
+    coro = catalog.get_product_text(product_id)
+    try:
+        coro.send(None)
+    except StopIteration as stop:
+        return stop.value
+    coro.close()
+    raise RuntimeError("Карточки нет в кэше")
+
+async def add_product():
+    product_id = await db.add_product('VIP номер +7 999', 1500000000)
+    VALUES['product'] = await db.get_product(product_id)
+    VALUES['product_id'] = product_id
+    await catalog.get_product_text(product_id)
+
+# Данные одного вызова: те же значения получают обе стороны
+VALUES = {
+    'self': Handler(),
+    'Config': Config,
+    'templates': templates,
+    'format_ton': format_ton,
+    'cached_card': cached_card,
+    'wallet_short': templates.wallet_short,
+    'user_id': 123456789,
+    'balance': '12.5',
+    'name': 'VIP номер +7 999',
+    'price': '1.5',
+    'username': 'pizza_lover',
+    'order_id': 4242,
+    'product_name': 'VIP номер +7 999',
+    'amount': '1.5',
+    'created_at': '2026-10-18 12:00:00'
+}
+
+# (название, f-строка в обработчике, вызов templates)
+CASES = [
+    ("welcome", '''f"""{self.emojis['pizza']} *Добро пожаловать в Pizza Numbers Bot!* {self.emojis['pizza']}
+
+🍕 *Горячие номера Telegram как свежая пицца!*
+
+{self.emojis['phone']} Покупайте качественные номера Telegram
+{self.emojis['lock']} Полная анонимность и безопасность
+{self.emojis['ton']} Оплата в TON - быстро и надежно
+{self.emojis['check']} Автоматическая проверка платежей
+
+👇 Выберите действие:"""''', "templates.welcome"),
+    
+    ("balance", '''f"""{self.emojis['balance']} *Ваш баланс*
+
+💰 Доступно: *{balance} TON*
+{self.emojis['ton']} Кошелек: `{wallet_short}`
+
+👇 Используйте кнопку ниже для пополнения:"""''', "templates.balance(balance)"),
+    
+    ("deposit", '''f"""{self.emojis['money']} *Пополнение баланса*
+
+{self.emojis['ton']} Отправьте TON на адрес:
+`{Config.WALLET_TON}`
+
+📝 В комментарии к переводу укажите ваш ID:
+`{user_id}`
+
+⚠️ *Внимание!*
+1. Отправляйте ТОЛЬКО TON
+2. Минимальная сумма: 0.1 TON
+3. Без комментария платеж не будет зачислен автоматически
+4. Баланс пополнится сам в течение минуты после подтверждения
+
+🔎 *Проверка оплаты:*
+Отправьте боту хэш транзакции в формате:
+`check_0xваш_хэш`"""''', "templates.deposit(user_id)"),
+    
+    ("buy_confirmation", '''f"""{self.emojis['buy']} *Подтверждение покупки*
+
+📱 Товар: {name}
+💰 Цена: {price} TON
+👤 Покупатель: @{username}
+🆔 Заказ: #{order_id}
+
+👇 Нажмите 'Оплатил' для продолжения:"""''', "templates.buy_confirmation(name, price, username, order_id)"),
+    
+    ("new_order", '''f"""📦 *Новая заявка!*
+
+🆔 Заказ: #{order_id}
+👤 Пользователь: @{username} (ID: {user_id})
+📱 Товар: {product_name}
+💰 Сумма: {amount} TON
+⏰ Время: {created_at}
+
+👇 Обработайте заявку:"""''', "templates.new_order(order_id, username, user_id, product_name, amount, created_at)"),
+    
+    ("order_completed", '''f"""{self.emojis['check']} *Ваш заказ выполнен!*
+
+🆔 Заказ: #{order_id}
+📱 Товар: {product_name}
+✅ Статус: Выполнен
+
+Спасибо за покупку! Если возникнут вопросы, обращайтесь."""''', "templates.order_completed(order_id, product_name)"),
+    
+    ("product_card", '''f"""{self.emojis['phone']} *{product['name']}*
+
+{templates.product_description(product['name'])}
+
+💰 *Цена:* {format_ton(product['price_nano'])} TON
+🆔 *ID товара:* #{product['id']}
+📅 *Добавлен:* {product['created_at']}
+
+👇 Выберите действие:"""''', "cached_card(product_id)"),
+    
+    ("order_already_processed", '''f"❌ Заказ #{order_id} уже обработан!"''',
+     "templates.order_already_processed(order_id)"),
+]
+
+def best(stmt, number):
+    """Лучшее время одного вызова из REPEATS замеров, нс"""
+    return min(timeit.repeat(stmt, number=number, repeat=REPEATS, globals=VALUES)) / number * 1e9
+
+def main():
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else NUMBER
+    asyncio.run(add_product())
+    
+    print(f"{number} вызовов, лучшее из {REPEATS}")
+    print(f"{'текст':24} {'обработчик':>11} {'templates':>10}")
+    for name, inline, call in CASES:
+        assert eval(inline, VALUES) == eval(call, VALUES), name
+        print(f"{name:24} {best(inline, number):8.0f} ns {best(call, number):7.0f} ns")
+    db.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+import asyncio
+import time
+from telegram.error import Forbidden
+from config import Config
+from database import db
+from outbox import outbox, PRIORITY_BULK
+from resilience import TokenBucket
+from templates import templates
+
+class Broadcaster:
+    """Рассылка сообщения всем пользователям.
+    
+    Получатели читаются из users страницами по user_id, поэтому в памяти
+    одновременно только одна страница. Сообщения уходят через outbox с
+    низшим приоритетом и не быстрее rate в секунду, так что уведомления о
+    заказах не ждут рассылку. После каждой страницы прогресс сохраняется в
+    broadcasts: после перезапуска рассылка продолжается со следующей
+    страницы. Пользователи, заблокировавшие бота, отмечаются в users.blocked_at
+    и в следующие рассылки не попадают."""
+    
+    def __init__(self, rate=20, page_size=100, progress_interval=5):
+        self.limiter = TokenBucket(rate)
+        self.page_size = page_size
+        self.progress_interval = progress_interval
+        self.bot = None
+        self.tasks = {}
+        self.stopping = False
+    
+    async def start(self, bot):
+        """Запускает незавершенные рассылки (например, прерванные перезапуском)"""
+        self.bot = bot
+        for broadcast in await db.get_running_broadcasts():
+            self._spawn(broadcast['id'])
+    
+    async def stop(self, timeout=10):
+        """Дает рассылкам дослать текущую страницу (не дольше timeout секунд) и останавливает их"""
+        self.stopping = True
+        tasks = list(self.tasks.values())
+        if not tasks:
+            return
+        
+        _, pending = await asyncio.wait(tasks, timeout=timeout)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+    
+    async def create(self, text, admin_chat_id, progress_message_id):
+        total = await db.get_active_users_count()
+        broadcast_id = await db.create_broadcast(text, admin_chat_id, progress_message_id, total)
+        self._spawn(broadcast_id)
+        return broadcast_id
+    
+    def _spawn(self, broadcast_id):
+        task = asyncio.create_task(self._run(broadcast_id))
+        self.tasks[broadcast_id] = task
+        task.add_done_callback(lambda _: self.tasks.pop(broadcast_id, None))
+    
+    async def _send_page(self, text, user_ids):
+        futures = []
+        for user_id in user_ids:
+            await self.limiter.acquire()
+            futures.append(outbox.send(user_id, text, priority=PRIORITY_BULK))
+        # При отмене gather отменяет и еще не отправленные сообщения страницы
+        return await asyncio.gather(*futures, return_exceptions=True)
+    
+    async def _run(self, broadcast_id):
+        broadcast = await db.get_broadcast(broadcast_id)
+        last_user_id = broadcast['last_user_id']
+        sent, failed, blocked = broadcast['sent'], broadcast['failed'], broadcast['blocked']
+        
+        started_at = time.monotonic()
+        reported_at = started_at
+        processed_now = 0
+        try:
+            while True:
+                # Останавливаемся только между страницами, чтобы после запуска не слать повторно
+                if self.stopping:
+                    return
+                
+                user_ids = await db.get_broadcast_recipients(last_user_id, self.page_size)
+                if not user_ids:
+                    break
+                
+                results = await self._send_page(broadcast['text'], user_ids)
+                blocked_ids = [user_id for user_id, result in zip(user_ids, results) if isinstance(result, Forbidden)]
+                page_failed = sum(isinstance(result, Exception) for result in results) - len(blocked_ids)
+                page_sent = len(user_ids) - page_failed - len(blocked_ids)
+                
+                last_user_id = user_ids[-1]
+                await db.save_broadcast_progress(broadcast_id, last_user_id, page_sent, page_failed, blocked_ids)
+                sent += page_sent
+                failed += page_failed
+                blocked += len(blocked_ids)
+                processed_now += len(user_ids)
+                
+                if time.monotonic() - reported_at >= self.progress_interval:
+                    reported_at = time.monotonic()
+                    rate = processed_now / (reported_at - started_at)
+                    await self._report(broadcast, sent, failed, blocked, rate)
+            
+            await db.finish_broadcast(broadcast_id)
+            rate = processed_now / max(time.monotonic() - started_at, 0.001)
+            await self._report(broadcast, sent, failed, blocked, rate, finished=True)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # Рассылка остается в статусе running и продолжится после перезапуска
+            print(f"Error in broadcast {broadcast_id}: {e}")
+    
+    async def _report(self, broadcast, sent, failed, blocked, rate, finished=False):
+        text = templates.broadcast_progress(
+            broadcast_id=broadcast['id'],
+            done=sent + failed + blocked,
+            total=broadcast['total'],
+            sent=sent,
+            blocked=blocked,
+            failed=failed,
+            rate=rate,
+            finished=finished
+        )
+        
+        try:
+            await self.bot.edit_message_text(
+                text,
+                chat_id=broadcast['admin_chat_id'],
+                message_id=broadcast['progress_message_id'],
+                parse_mode='Markdown'
+            )
+        except Exception as e:
+            print(f"Error updating broadcast progress: {e}")
+    
+    def stats(self):
+        return {
+            'running': list(self.tasks),
+            'limiter': self.limiter.stats()
+        }
+
+broadcaster = Broadcaster(
+    rate=Config.BROADCAST_RATE,
+    page_size=Config.BROADCAST_PAGE_SIZE,
+    progress_interval=Config.BROADCAST_PROGRESS_INTERVAL
+)
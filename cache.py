@@ -0,0 +1,85 @@
+import time
+from collections import OrderedDict
+
+# Маркер отсутствия значения (None может быть валидным значением)
+MISSING = object()
+
+class LRUCache:
+    """Ограниченный по размеру кэш: при переполнении вытесняет давно не использованные ключи"""
+    
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.data = OrderedDict()
+        
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def __len__(self):
+        return len(self.data)
+    
+    def __contains__(self, key):
+        return key in self.data
+    
+    def get(self, key, default=MISSING):
+        try:
+            value = self.data[key]
+        except KeyError:
+            self.misses += 1
+            return default
+        self.data.move_to_end(key)
+        self.hits += 1
+        return value
+    
+    def put(self, key, value):
+        self.data[key] = value
+        self.data.move_to_end(key)
+        while len(self.data) > self.maxsize:
+            self.data.popitem(last=False)
+            self.evictions += 1
+    
+    def pop(self, key, default=None):
+        return self.data.pop(key, default)
+    
+    def clear(self):
+        self.data.clear()
+    
+    def stats(self):
+        """Счетчики попаданий, промахов и вытеснений"""
+        return {
+            'size': len(self.data),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions
+        }
+
+class TTLCache(LRUCache):
+    """LRU-кэш, записи которого устаревают через ttl секунд после записи"""
+    
+    def __init__(self, maxsize=1024, ttl=60):
+        super().__init__(maxsize)
+        self.ttl = ttl
+        self.expirations = 0
+    
+    def get(self, key, default=MISSING):
+        entry = self.data.get(key)
+        if entry is not None and entry[1] <= time.monotonic():
+            del self.data[key]
+            self.expirations += 1
+        
+        entry = super().get(key)
+        return default if entry is MISSING else entry[0]
+    
+    def put(self, key, value):
+        super().put(key, (value, time.monotonic() + self.ttl))
+    
+    def pop(self, key, default=None):
+        entry = self.data.pop(key, None)
+        return default if entry is None else entry[0]
+    
+    def stats(self):
+        stats = super().stats()
+        stats['ttl'] = self.ttl
+        stats['expirations'] = self.expirations
+        return stats
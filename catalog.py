@@ -0,0 +1,108 @@
+from config import Config
+from database import db
+from cache import LRUCache, MISSING
+from keyboards import keyboards
+from money import format_ton
+from templates import templates
+
+class CatalogCache:
+    """Кэш каталога товаров в памяти процесса.
+    
+    Каталог показывается страницами по page_size товаров: в память читаются
+    только запрошенные страницы (keyset-запрос по id товара), и каждая
+    хранится вместе с готовой клавиатурой. Товары и отрисованные карточки
+    кэшируются по id при первом обращении. Все кэши ограничены cache_size
+    записями и сбрасываются, когда меняется db.catalog_version (после каждого
+    add_product / update_product / delete_product), поэтому повторный показ
+    страницы не делает ни SQL-запросов, ни сборки клавиатуры."""
+    
+    def __init__(self, page_size=10, cache_size=256):
+        self.page_size = page_size
+        self.version = None
+        # (категория, after_id, before_id) -> (товары, клавиатура)
+        self.pages = LRUCache(cache_size)
+        self.products = LRUCache(cache_size)
+        self.texts = LRUCache(cache_size)
+        self.categories = None
+    
+    def _sync(self):
+        """Сбрасывает кэши устаревшей версии каталога и возвращает текущую"""
+        version = db.catalog_version
+        if self.version != version:
+            self.pages.clear()
+            self.products.clear()
+            self.texts.clear()
+            self.categories = None
+            self.version = version
+        return version
+    
+    def _store(self, cache, key, value, version):
+        # Если каталог изменился во время запроса, результат не кэшируем:
+        # следующий вызов увидит новую версию и перечитает данные
+        if db.catalog_version == version:
+            cache.put(key, value)
+    
+    async def get_categories(self):
+        """Категории, в которых есть товары"""
+        version = self._sync()
+        if self.categories is None:
+            categories = await db.get_product_categories()
+            if db.catalog_version != version:
+                return categories
+            self.categories = categories
+        return self.categories
+    
+    async def get_page(self, category=None, after_id=None, before_id=None):
+        """Товары страницы и ее клавиатура; первая страница - без курсоров"""
+        version = self._sync()
+        key = (category, after_id, before_id)
+        page = self.pages.get(key)
+        if page is not MISSING:
+            return page
+        
+        products, has_newer, has_older = await db.get_products_page(
+            category, after_id, before_id, self.page_size
+        )
+        categories = await self.get_categories()
+        page = (products, keyboards.catalog_page(products, category, has_newer, has_older, categories))
+        self._store(self.pages, key, page, version)
+        return page
+    
+    async def get_product(self, product_id):
+        version = self._sync()
+        product = self.products.get(product_id)
+        if product is MISSING:
+            product = await db.get_product(product_id)
+            self._store(self.products, product_id, product, version)
+        return product
+    
+    async def get_product_text(self, product_id):
+        """Карточка товара для текущей версии каталога, либо None"""
+        version = self._sync()
+        text = self.texts.get(product_id)
+        if text is not MISSING:
+            return text
+        
+        product = await self.get_product(product_id)
+        if product is None:
+            return None
+        text = templates.product_detail(
+            name=product['name'],
+            description=templates.product_description(product['name']),
+            price=format_ton(product['price_nano']),
+            product_id=product['id'],
+            created_at=product['created_at']
+        )
+        self._store(self.texts, product_id, text, version)
+        return text
+    
+    def stats(self):
+        """Счетчики попаданий и промахов кэшей"""
+        return {
+            'version': self.version,
+            'pages': self.pages.stats(),
+            'products': self.products.stats(),
+            'texts': self.texts.stats()
+        }
+
+catalog = CatalogCache(page_size=Config.CATALOG_PAGE_SIZE, cache_size=Config.CATALOG_CACHE_SIZE)
@@ -10,8 +10,100 @@ class Config:
     TONCENTER_API_KEY = os.getenv("TONCENTER_API_KEY")
     DATABASE_NAME = os.getenv("DATABASE_NAME", "telegram_numbers.db")
     
+    # Database engine: пул соединений на чтение и очередь писателя
+    DB_READ_POOL_SIZE = int(os.getenv("DB_READ_POOL_SIZE", "4"))
+    DB_WRITE_QUEUE_SIZE = int(os.getenv("DB_WRITE_QUEUE_SIZE", "1000"))
+    
+    # Group commit: записи в пределах окна фиксируются одной транзакцией
+    DB_GROUP_COMMIT = os.getenv("DB_GROUP_COMMIT", "0") == "1"
+    DB_GROUP_COMMIT_WINDOW_MS = float(os.getenv("DB_GROUP_COMMIT_WINDOW_MS", "5"))
+    DB_GROUP_COMMIT_MAX_OPS = int(os.getenv("DB_GROUP_COMMIT_MAX_OPS", "100"))
+    
+    # Размер LRU недавно виденных пользователей (повторный /start без запросов к базе)
+    KNOWN_USERS_CACHE_SIZE = int(os.getenv("KNOWN_USERS_CACHE_SIZE", "10000"))
+    
+    # Журнал балансов: снимок каждые N записей ограничивает время сверки.
+    # Фоновая задача проверяет, пора ли делать снимок, раз в CHECK_INTERVAL секунд; хранятся последние KEEP снимков
+    LEDGER_SNAPSHOT_INTERVAL = int(os.getenv("LEDGER_SNAPSHOT_INTERVAL", "10000"))
+    LEDGER_SNAPSHOT_CHECK_INTERVAL = int(os.getenv("LEDGER_SNAPSHOT_CHECK_INTERVAL", "300"))
+    LEDGER_SNAPSHOTS_KEEP = int(os.getenv("LEDGER_SNAPSHOTS_KEEP", "3"))
+    
+    # Интервал сверки счетчиков статистики с таблицами, секунд
+    STATS_RECHECK_INTERVAL = int(os.getenv("STATS_RECHECK_INTERVAL", "3600"))
+    
+    # Режим получения обновлений: polling или webhook
+    RUN_MODE = os.getenv("RUN_MODE", "polling")
+    # Webhook: публичный URL и локальный HTTP-сервер, который принимает обновления
+    WEBHOOK_URL = os.getenv("WEBHOOK_URL")
+    WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "telegram")
+    WEBHOOK_LISTEN = os.getenv("WEBHOOK_LISTEN", "0.0.0.0")
+    WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8443"))
+    # Секрет из заголовка X-Telegram-Bot-Api-Secret-Token; если не задан, генерируется при запуске
+    WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")
+    WEBHOOK_MAX_CONNECTIONS = int(os.getenv("WEBHOOK_MAX_CONNECTIONS", "40"))
+    
+    # Параллельная обработка обновлений: одновременно выполняемых и всего ожидающих
+    UPDATE_CONCURRENCY = int(os.getenv("UPDATE_CONCURRENCY", "16"))
+    UPDATE_MAX_QUEUED = int(os.getenv("UPDATE_MAX_QUEUED", "1024"))
+    
+    # Исходящие сообщения: лимиты Telegram - около 30 сообщений в секунду всего и 1 в секунду в чат
+    OUTBOX_GLOBAL_RATE = float(os.getenv("OUTBOX_GLOBAL_RATE", "25"))
+    OUTBOX_CHAT_RATE = float(os.getenv("OUTBOX_CHAT_RATE", "1"))
+    OUTBOX_WORKERS = int(os.getenv("OUTBOX_WORKERS", "4"))
+    OUTBOX_MAX_RETRIES = int(os.getenv("OUTBOX_MAX_RETRIES", "3"))
+    
+    # Рассылки: сообщений в секунду (с запасом для уведомлений о заказах), размер страницы получателей,
+    # как часто обновлять прогресс у админа (секунд)
+    BROADCAST_RATE = float(os.getenv("BROADCAST_RATE", "20"))
+    BROADCAST_PAGE_SIZE = int(os.getenv("BROADCAST_PAGE_SIZE", "100"))
+    BROADCAST_PROGRESS_INTERVAL = float(os.getenv("BROADCAST_PROGRESS_INTERVAL", "5"))
+    
+    # Сводка для админа: события за окно (секунд) уходят одним сообщением, не больше MAX_EVENTS в сводке.
+    # Заявки от ADMIN_URGENT_AMOUNT TON отправляются сразу (пусто - отключено)
+    ADMIN_DIGEST_WINDOW = float(os.getenv("ADMIN_DIGEST_WINDOW", "10"))
+    ADMIN_DIGEST_MAX_EVENTS = int(os.getenv("ADMIN_DIGEST_MAX_EVENTS", "10"))
+    ADMIN_URGENT_AMOUNT = os.getenv("ADMIN_URGENT_AMOUNT", "10")
+    
+    # Размер страницы списков в админке
+    ADMIN_PAGE_SIZE = int(os.getenv("ADMIN_PAGE_SIZE", "10"))
+    
+    # Каталог: товаров на странице и сколько страниц/товаров держать в памяти
+    CATALOG_PAGE_SIZE = int(os.getenv("CATALOG_PAGE_SIZE", "10"))
+    CATALOG_CACHE_SIZE = int(os.getenv("CATALOG_CACHE_SIZE", "256"))
+    
+    # Сколько клавиатур с параметрами (товар, заказ) держать готовыми
+    KEYBOARD_CACHE_SIZE = int(os.getenv("KEYBOARD_CACHE_SIZE", "1000"))
+    
     # TON Center API
     TONCENTER_API_URL = "https://toncenter.com/api/v2/"
+    TONCENTER_TIMEOUT = float(os.getenv("TONCENTER_TIMEOUT", "10"))
+    TONCENTER_MAX_CONCURRENCY = int(os.getenv("TONCENTER_MAX_CONCURRENCY", "8"))
+    
+    # Лимит запросов в секунду: toncenter дает 10 rps с API ключом и 1 rps без него
+    TONCENTER_RPS = float(os.getenv("TONCENTER_RPS", "10" if TONCENTER_API_KEY else "1"))
+    # Повторы при 429/5xx и сетевых ошибках: задержка до BACKOFF_BASE * 2^попытка, не больше BACKOFF_MAX
+    TONCENTER_MAX_RETRIES = int(os.getenv("TONCENTER_MAX_RETRIES", "3"))
+    TONCENTER_BACKOFF_BASE = float(os.getenv("TONCENTER_BACKOFF_BASE", "0.5"))
+    TONCENTER_BACKOFF_MAX = float(os.getenv("TONCENTER_BACKOFF_MAX", "8"))
+    # После N неудачных запросов подряд API считается недоступным на BREAKER_RESET секунд
+    TONCENTER_BREAKER_THRESHOLD = int(os.getenv("TONCENTER_BREAKER_THRESHOLD", "5"))
+    TONCENTER_BREAKER_RESET = float(os.getenv("TONCENTER_BREAKER_RESET", "30"))
+    
+    # Кэш проверок транзакций: найденные хранятся без срока, "не найдено" - TX_NEGATIVE_TTL секунд
+    TX_CACHE_SIZE = int(os.getenv("TX_CACHE_SIZE", "10000"))
+    TX_NEGATIVE_CACHE_SIZE = int(os.getenv("TX_NEGATIVE_CACHE_SIZE", "10000"))
+    TX_NEGATIVE_TTL = float(os.getenv("TX_NEGATIVE_TTL", "15"))
+    
+    # Пакетная проверка: хэши, пришедшие за окно, ищутся в нескольких страницах истории кошелька.
+    # Страница читается, только пока ненайденных хэшей не меньше HASHES_PER_PAGE, остальные проверяются по одному
+    TX_BATCH_WINDOW = float(os.getenv("TX_BATCH_WINDOW", "0.5"))
+    TX_BATCH_PAGE_SIZE = int(os.getenv("TX_BATCH_PAGE_SIZE", "100"))
+    TX_BATCH_SCAN_PAGES = int(os.getenv("TX_BATCH_SCAN_PAGES", "3"))
+    TX_BATCH_HASHES_PER_PAGE = int(os.getenv("TX_BATCH_HASHES_PER_PAGE", "3"))
+    
+    # Фоновое зачисление депозитов: интервал опроса кошелька и размер страницы
+    DEPOSIT_POLL_INTERVAL = int(os.getenv("DEPOSIT_POLL_INTERVAL", "30"))
+    DEPOSIT_PAGE_SIZE = int(os.getenv("DEPOSIT_PAGE_SIZE", "50"))
     
     # Pizza design emojis
     EMOJIS = {
@@ -1,12 +1,265 @@
 import sqlite3
+import base64
 import json
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime
+from itertools import islice
+from pathlib import Path
 from config import Config
+from models import User, Product, Order, Transaction, LedgerEntry, Broadcast, fetch_one, fetch_all, iter_records
+from money import NANOTON
+from cache import LRUCache
+
+# Фактические значения счетчиков статистики, посчитанные по таблицам
+COUNTERS_QUERY = '''
+    SELECT 'users', COUNT(*) FROM users
+    UNION ALL SELECT 'products', COUNT(*) FROM products
+    UNION ALL SELECT 'transactions', COUNT(*) FROM transactions
+    UNION ALL SELECT 'balance', COALESCE(SUM(amount), 0) FROM balances
+    UNION ALL SELECT 'sales', COALESCE(SUM(amount_nano), 0) FROM orders WHERE status = 'completed'
+    UNION ALL SELECT 'orders:' || status, COUNT(*) FROM orders WHERE status IS NOT NULL GROUP BY status
+'''
+
+def _bump_counter(name, delta):
+    return f"""INSERT INTO counters (name, value) VALUES ({name}, {delta})
+               ON CONFLICT (name) DO UPDATE SET value = value + excluded.value;"""
+
+def _counter_trigger(name, event, body, when=None):
+    condition = f" WHEN {when}" if when else ""
+    return f"CREATE TRIGGER {name} AFTER {event}{condition} BEGIN {body} END"
+
+# Категории товаров: первое ключевое слово, найденное в названии
+PRODUCT_CATEGORIES = ('fresh', 'vip', 'premium', 'standard')
+
+def product_category(name):
+    """Категория товара по названию, либо None"""
+    name_lower = name.lower()
+    for category in PRODUCT_CATEGORIES:
+        if category in name_lower:
+            return category
+    return None
+
+# То же правило в SQL - для заполнения категорий существующих товаров
+_CATEGORY_CASE = "CASE " + " ".join(
+    f"WHEN lower(name) LIKE '%{category}%' THEN '{category}'" for category in PRODUCT_CATEGORIES
+) + " END"
+
+# Миграции схемы: (версия, описание, SQL-выражения).
+# Применяются по порядку, каждая в своей транзакции; новые добавлять только в конец.
+MIGRATIONS = [
+    (1, "Индексы для горячих запросов по заказам и транзакциям", [
+        "CREATE INDEX IF NOT EXISTS idx_orders_status_created ON orders (status, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_orders_user_status_created ON orders (user_id, status, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_orders_user_created ON orders (user_id, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_orders_created ON orders (created_at)",
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_transactions_tx_hash ON transactions (tx_hash)",
+        "CREATE INDEX IF NOT EXISTS idx_transactions_user_created ON transactions (user_id, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_users_created ON users (created_at)",
+    ]),
+    (2, "Журнал балансов в целых нанотонах", [
+        '''CREATE TABLE ledger (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            amount INTEGER NOT NULL,
+            kind TEXT NOT NULL,
+            ref TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )''',
+        "CREATE INDEX idx_ledger_user ON ledger (user_id, id)",
+        '''CREATE TABLE balances (
+            user_id INTEGER PRIMARY KEY,
+            amount INTEGER NOT NULL DEFAULT 0,
+            last_entry_id INTEGER
+        )''',
+        '''CREATE TABLE ledger_snapshots (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            last_entry_id INTEGER NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )''',
+        '''CREATE TABLE ledger_snapshot_balances (
+            snapshot_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            amount INTEGER NOT NULL,
+            PRIMARY KEY (snapshot_id, user_id)
+        ) WITHOUT ROWID''',
+        "ALTER TABLE products ADD COLUMN price_nano INTEGER",
+        "ALTER TABLE orders ADD COLUMN amount_nano INTEGER",
+        "ALTER TABLE transactions ADD COLUMN amount_nano INTEGER",
+        "UPDATE products SET price_nano = CAST(ROUND(price * 1000000000) AS INTEGER)",
+        "UPDATE orders SET amount_nano = CAST(ROUND(amount * 1000000000) AS INTEGER)",
+        "UPDATE transactions SET amount_nano = CAST(ROUND(amount * 1000000000) AS INTEGER)",
+        # Текущие балансы переносим в журнал открывающими записями
+        '''INSERT INTO ledger (user_id, amount, kind)
+           SELECT user_id, CAST(ROUND(balance * 1000000000) AS INTEGER), 'opening'
+           FROM users WHERE balance != 0 ORDER BY user_id''',
+        '''INSERT INTO balances (user_id, amount, last_entry_id)
+           SELECT user_id, amount, id FROM ledger''',
+    ]),
+    (3, "Счетчики статистики, обновляемые триггерами", [
+        "CREATE TABLE counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL DEFAULT 0) WITHOUT ROWID",
+        "INSERT INTO counters (name, value) " + COUNTERS_QUERY,
+        _counter_trigger("trg_users_insert", "INSERT ON users", _bump_counter("'users'", "1")),
+        _counter_trigger("trg_users_delete", "DELETE ON users", _bump_counter("'users'", "-1")),
+        _counter_trigger("trg_products_insert", "INSERT ON products", _bump_counter("'products'", "1")),
+        _counter_trigger("trg_products_delete", "DELETE ON products", _bump_counter("'products'", "-1")),
+        _counter_trigger("trg_transactions_insert", "INSERT ON transactions", _bump_counter("'transactions'", "1")),
+        _counter_trigger("trg_transactions_delete", "DELETE ON transactions", _bump_counter("'transactions'", "-1")),
+        _counter_trigger("trg_balances_insert", "INSERT ON balances", _bump_counter("'balance'", "NEW.amount")),
+        _counter_trigger("trg_balances_update", "UPDATE OF amount ON balances",
+                         _bump_counter("'balance'", "NEW.amount - OLD.amount")),
+        _counter_trigger("trg_balances_delete", "DELETE ON balances", _bump_counter("'balance'", "-OLD.amount")),
+        _counter_trigger("trg_orders_insert", "INSERT ON orders",
+                         _bump_counter("'orders:' || NEW.status", "1")
+                         + _bump_counter("'sales'", "(NEW.status = 'completed') * COALESCE(NEW.amount_nano, 0)"),
+                         when="NEW.status IS NOT NULL"),
+        _counter_trigger("trg_orders_status", "UPDATE OF status ON orders",
+                         _bump_counter("'orders:' || OLD.status", "-1")
+                         + _bump_counter("'orders:' || NEW.status", "1"),
+                         when="OLD.status IS NOT NEW.status"),
+        _counter_trigger("trg_orders_sales", "UPDATE OF status, amount_nano ON orders",
+                         _bump_counter("'sales'", "(NEW.status = 'completed') * COALESCE(NEW.amount_nano, 0)"
+                                       " - (OLD.status = 'completed') * COALESCE(OLD.amount_nano, 0)")),
+        _counter_trigger("trg_orders_delete", "DELETE ON orders",
+                         _bump_counter("'orders:' || OLD.status", "-1")
+                         + _bump_counter("'sales'", "-(OLD.status = 'completed') * COALESCE(OLD.amount_nano, 0)")),
+    ]),
+    (4, "Состояние фоновых задач (курсор опроса кошелька)", [
+        "CREATE TABLE state (key TEXT PRIMARY KEY, value TEXT) WITHOUT ROWID",
+    ]),
+    (5, "Рассылки и отметка пользователей, заблокировавших бота", [
+        "ALTER TABLE users ADD COLUMN blocked_at TIMESTAMP",
+        '''CREATE TABLE broadcasts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            text TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'running',
+            admin_chat_id INTEGER,
+            progress_message_id INTEGER,
+            total INTEGER NOT NULL DEFAULT 0,
+            last_user_id INTEGER NOT NULL DEFAULT 0,
+            sent INTEGER NOT NULL DEFAULT 0,
+            failed INTEGER NOT NULL DEFAULT 0,
+            blocked INTEGER NOT NULL DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            finished_at TIMESTAMP
+        )''',
+        "CREATE INDEX idx_broadcasts_status ON broadcasts (status)",
+    ]),
+    (6, "Категории товаров и индексы для постраничного каталога", [
+        "ALTER TABLE products ADD COLUMN category TEXT",
+        f"UPDATE products SET category = {_CATEGORY_CASE}",
+        "CREATE INDEX idx_products_category ON products (category, id)",
+    ]),
+]
+
+# Виды записей журнала балансов
+LEDGER_OPENING = 'opening'
+LEDGER_GRANT = 'grant'
+LEDGER_DEPOSIT = 'deposit'
+LEDGER_PURCHASE = 'purchase'
+LEDGER_REFUND = 'refund'
+
+# Статусы входящих транзакций
+TX_COMPLETED = 'completed'
+TX_UNMATCHED = 'unmatched'
+
+# Статусы рассылок
+BROADCAST_RUNNING = 'running'
+BROADCAST_FINISHED = 'finished'
+
+# Результаты оплаты заказа (Database.pay_order)
+PAYMENT_OK = 'ok'
+PAYMENT_NOT_FOUND = 'not_found'
+PAYMENT_ALREADY_PAID = 'already_paid'
+PAYMENT_INSUFFICIENT_FUNDS = 'insufficient_funds'
+
+def encode_page_token(created_at, row_id):
+    """Непрозрачный токен продолжения для keyset-пагинации по (created_at, id)"""
+    raw = f"{created_at}|{row_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_page_token(token):
+    """(created_at, id) из токена, либо None, если токен поврежден"""
+    padded = token + "=" * (-len(token) % 4)
+    try:
+        created_at, row_id = base64.urlsafe_b64decode(padded).decode().rsplit("|", 1)
+        return created_at, int(row_id)
+    except ValueError:
+        # binascii.Error и UnicodeDecodeError - тоже ValueError
+        return None
+
+def _page_condition(columns, page_token):
+    """Условие "строго после токена" для сортировки по (created_at, id) DESC.
+    Поврежденный токен (например, из подделанной callback_data) дает первую страницу"""
+    key = decode_page_token(page_token) if page_token else None
+    if key is None:
+        return "", ()
+    return f"AND ({columns}) < (?, ?)", key
+
+def _split_page(records, limit, key):
+    """Отрезает лишнюю запись, запрошенную для проверки следующей страницы"""
+    if len(records) <= limit:
+        return records, None
+    records = records[:limit]
+    return records, encode_page_token(*key(records[-1]))
 
 class Database:
-    def __init__(self):
-        self.conn = sqlite3.connect(Config.DATABASE_NAME, check_same_thread=False)
+    def __init__(self, read_pool_size=Config.DB_READ_POOL_SIZE,
+                 snapshot_interval=Config.LEDGER_SNAPSHOT_INTERVAL,
+                 snapshots_keep=Config.LEDGER_SNAPSHOTS_KEEP):
+        # Единственное соединение на запись. Транзакциями управляет поток писателя
+        # (AsyncDatabase), поэтому методы записи сами commit не делают
+        self.conn = sqlite3.connect(
+            Config.DATABASE_NAME,
+            check_same_thread=False,
+            isolation_level=None
+        )
+        self.conn.execute("PRAGMA journal_mode=WAL")
         self.create_tables()
+        self.migrate()
+        
+        # Снимок балансов делается фоновой задачей, когда после предыдущего
+        # накопилось snapshot_interval записей журнала; хранятся последние snapshots_keep
+        self.snapshot_interval = snapshot_interval
+        self.snapshots_keep = snapshots_keep
+        
+        # Пул соединений только для чтения: в режиме WAL читатели
+        # не ждут завершения транзакций писателя
+        self.read_pool_size = read_pool_size
+        self.readers = queue.Queue()
+        for _ in range(read_pool_size):
+            self.readers.put(self._connect_reader())
+    
+    def _connect_reader(self):
+        uri = f"{Path(Config.DATABASE_NAME).resolve().as_uri()}?mode=ro"
+        return sqlite3.connect(uri, uri=True, check_same_thread=False)
+    
+    @contextmanager
+    def atomic(self):
+        """Выполняет блок выражений на соединении записи как одно целое"""
+        # Точка сохранения работает и внутри транзакции писателя, и сама по себе
+        self.conn.execute("SAVEPOINT atomic")
+        try:
+            yield self.conn.cursor()
+        except Exception:
+            self.conn.execute("ROLLBACK TO atomic")
+            self.conn.execute("RELEASE atomic")
+            raise
+        else:
+            self.conn.execute("RELEASE atomic")
+    
+    @contextmanager
+    def reader(self):
+        """Выдает курсор соединения из пула чтения"""
+        conn = self.readers.get()
+        try:
+            yield conn.cursor()
+        finally:
+            self.readers.put(conn)
     
     def create_tables(self):
         cursor = self.conn.cursor()
@@ -63,84 +316,273 @@ class Database:
         
         self.conn.commit()
     
-    def get_or_create_user(self, user_id, username):
+    def get_schema_version(self):
+        """Текущая версия схемы"""
         cursor = self.conn.cursor()
-        cursor.execute("SELECT * FROM users WHERE user_id = ?", (user_id,))
-        user = cursor.fetchone()
-        
-        if not user:
-            cursor.execute(
-                "INSERT INTO users (user_id, username) VALUES (?, ?)",
-                (user_id, username)
+        cursor.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version")
+        return cursor.fetchone()[0]
+    
+    def migrate(self):
+        """Применяет миграции, которых еще нет в schema_version"""
+        cursor = self.conn.cursor()
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version INTEGER PRIMARY KEY,
+                description TEXT,
+                applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
             )
-            self.conn.commit()
-            return self.get_or_create_user(user_id, username)
+        ''')
+        self.conn.commit()
         
-        return {
-            'user_id': user[0],
-            'username': user[1],
-            'balance': user[2],
-            'created_at': user[3]
-        }
+        current = self.get_schema_version()
+        for version, description, statements in MIGRATIONS:
+            if version <= current:
+                continue
+            
+            # Соединение в режиме autocommit - транзакцию открываем явно
+            cursor.execute("BEGIN")
+            try:
+                for statement in statements:
+                    cursor.execute(statement)
+                cursor.execute(
+                    "INSERT INTO schema_version (version, description) VALUES (?, ?)",
+                    (version, description)
+                )
+                self.conn.commit()
+            except Exception:
+                self.conn.rollback()
+                raise
     
-    def update_balance(self, user_id, amount):
+    def upsert_user(self, user_id, username):
+        """Создает пользователя или обновляет его username одним выражением.
+        Пользователь, снова написавший боту, больше не считается заблокировавшим его"""
         cursor = self.conn.cursor()
+        cursor.execute('''
+            INSERT INTO users (user_id, username) VALUES (?, ?)
+            ON CONFLICT (user_id) DO UPDATE SET username = excluded.username, blocked_at = NULL
+            WHERE username IS NOT excluded.username OR blocked_at IS NOT NULL
+        ''', (user_id, username))
+    
+    def get_or_create_user(self, user_id, username):
+        self.upsert_user(user_id, username)
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT * FROM users WHERE user_id = ?", (user_id,))
+        return fetch_one(cursor, User)
+    
+    def _post_entry(self, cursor, user_id, amount, kind, ref):
         cursor.execute(
-            "UPDATE users SET balance = balance + ? WHERE user_id = ?",
-            (amount, user_id)
+            "INSERT INTO ledger (user_id, amount, kind, ref) VALUES (?, ?, ?, ?)",
+            (user_id, amount, kind, ref)
         )
-        self.conn.commit()
+        entry_id = cursor.lastrowid
+        cursor.execute('''
+            INSERT INTO balances (user_id, amount, last_entry_id) VALUES (?, ?, ?)
+            ON CONFLICT (user_id) DO UPDATE SET
+                amount = amount + excluded.amount,
+                last_entry_id = excluded.last_entry_id
+        ''', (user_id, amount, entry_id))
+        return entry_id
+    
+    def credit(self, user_id, amount, kind, ref=None):
+        """Зачисляет amount нанотон на баланс с записью в журнале"""
+        if amount <= 0:
+            raise ValueError(f"Сумма зачисления должна быть больше 0: {amount}")
+        with self.atomic() as cursor:
+            return self._post_entry(cursor, user_id, amount, kind, ref)
+    
+    def debit(self, user_id, amount, kind, ref=None):
+        """Списывает amount нанотон, если их хватает на балансе.
+        Возвращает id записи журнала или None при нехватке средств"""
+        # Отрицательное списание прошло бы проверку баланса и зачислило деньги
+        if amount <= 0:
+            raise ValueError(f"Сумма списания должна быть больше 0: {amount}")
+        with self.atomic() as cursor:
+            cursor.execute(
+                "SELECT 1 FROM balances WHERE user_id = ? AND amount >= ?",
+                (user_id, amount)
+            )
+            if not cursor.fetchone():
+                return None
+            return self._post_entry(cursor, user_id, -amount, kind, ref)
     
     def get_balance(self, user_id):
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT balance FROM users WHERE user_id = ?", (user_id,))
-        result = cursor.fetchone()
-        return result[0] if result else 0
+        """Баланс пользователя в нанотонах"""
+        with self.reader() as cursor:
+            cursor.execute("SELECT amount FROM balances WHERE user_id = ?", (user_id,))
+            result = cursor.fetchone()
+            return result[0] if result else 0
+    
+    def get_ledger_entries(self, user_id, limit=50):
+        """Последние записи журнала пользователя"""
+        with self.reader() as cursor:
+            cursor.execute('''
+                SELECT * FROM ledger
+                WHERE user_id = ?
+                ORDER BY id DESC
+                LIMIT ?
+            ''', (user_id, limit))
+            return fetch_all(cursor, LedgerEntry)
+    
+    def take_snapshot(self, force=False):
+        """Делает снимок балансов, если с предыдущего накопилось snapshot_interval
+        записей журнала (или force). Снимок считается только по журналу:
+        предыдущий снимок + записи после него, поэтому расхождение в balances
+        в него не попадает и остается видно сверке. Старые снимки, кроме
+        последних snapshots_keep, удаляются. Возвращает id снимка или None"""
+        with self.atomic() as cursor:
+            cursor.execute("SELECT COALESCE(MAX(id), 0) FROM ledger")
+            entry_id = cursor.fetchone()[0]
+            cursor.execute("SELECT id, last_entry_id FROM ledger_snapshots ORDER BY id DESC LIMIT 1")
+            previous = cursor.fetchone()
+            previous_id, previous_entry_id = previous if previous else (0, 0)
+            
+            if entry_id == previous_entry_id:
+                return None
+            if not force and entry_id - previous_entry_id < self.snapshot_interval:
+                return None
+            
+            cursor.execute("INSERT INTO ledger_snapshots (last_entry_id) VALUES (?)", (entry_id,))
+            snapshot_id = cursor.lastrowid
+            cursor.execute('''
+                INSERT INTO ledger_snapshot_balances (snapshot_id, user_id, amount)
+                SELECT ?, user_id, SUM(amount) FROM (
+                    SELECT user_id, amount FROM ledger_snapshot_balances WHERE snapshot_id = ?
+                    UNION ALL
+                    SELECT user_id, amount FROM ledger WHERE id > ? AND id <= ?
+                ) GROUP BY user_id
+                HAVING SUM(amount) != 0
+            ''', (snapshot_id, previous_id, previous_entry_id, entry_id))
+            
+            # Удаляем все снимки старше snapshots_keep последних
+            cursor.execute(
+                "SELECT id FROM ledger_snapshots ORDER BY id DESC LIMIT 1 OFFSET ?",
+                (max(self.snapshots_keep, 1) - 1,)
+            )
+            oldest_kept = cursor.fetchone()
+            if oldest_kept:
+                cursor.execute("DELETE FROM ledger_snapshot_balances WHERE snapshot_id < ?", oldest_kept)
+                cursor.execute("DELETE FROM ledger_snapshots WHERE id < ?", oldest_kept)
+            return snapshot_id
+    
+    def audit_ledger(self):
+        """Сверяет балансы с журналом: последний снимок + записи после него.
+        Время сверки зависит только от числа записей с момента снимка.
+        Возвращает список расхождений (user_id, по журналу, в balances)"""
+        with self.reader() as cursor:
+            # Все чтения - в одной транзакции, чтобы видеть согласованное состояние
+            cursor.execute("BEGIN")
+            try:
+                cursor.execute("SELECT id, last_entry_id FROM ledger_snapshots ORDER BY id DESC LIMIT 1")
+                snapshot = cursor.fetchone()
+                snapshot_id, last_entry_id = snapshot if snapshot else (0, 0)
+                
+                cursor.execute('''
+                    WITH expected AS (
+                        SELECT user_id, SUM(amount) AS amount FROM (
+                            SELECT user_id, amount FROM ledger_snapshot_balances WHERE snapshot_id = ?
+                            UNION ALL
+                            SELECT user_id, amount FROM ledger WHERE id > ?
+                        ) GROUP BY user_id
+                    )
+                    SELECT e.user_id, e.amount, COALESCE(b.amount, 0)
+                    FROM expected e LEFT JOIN balances b ON b.user_id = e.user_id
+                    WHERE e.amount != COALESCE(b.amount, 0)
+                    UNION ALL
+                    SELECT b.user_id, 0, b.amount
+                    FROM balances b
+                    WHERE b.amount != 0 AND b.user_id NOT IN (SELECT user_id FROM expected)
+                ''', (snapshot_id, last_entry_id))
+                return cursor.fetchall()
+            finally:
+                cursor.execute("COMMIT")
     
     def add_product(self, name, price):
+        """Добавляет товар; price в нанотонах"""
+        if price <= 0:
+            raise ValueError(f"Цена товара должна быть больше 0: {price}")
         cursor = self.conn.cursor()
         cursor.execute(
-            "INSERT INTO products (name, price) VALUES (?, ?)",
-            (name, price)
+            "INSERT INTO products (name, price, price_nano, category) VALUES (?, ?, ?, ?)",
+            (name, price / NANOTON, price, product_category(name))
         )
-        self.conn.commit()
         return cursor.lastrowid
     
     def get_products(self):
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT * FROM products ORDER BY created_at DESC")
-        columns = [column[0] for column in cursor.description]
-        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+        with self.reader() as cursor:
+            cursor.execute("SELECT * FROM products ORDER BY created_at DESC")
+            return fetch_all(cursor, Product)
     
     def get_product(self, product_id):
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT * FROM products WHERE id = ?", (product_id,))
-        columns = [column[0] for column in cursor.description]
-        row = cursor.fetchone()
-        return dict(zip(columns, row)) if row else None
+        with self.reader() as cursor:
+            cursor.execute("SELECT * FROM products WHERE id = ?", (product_id,))
+            return fetch_one(cursor, Product)
+    
+    def get_products_page(self, category=None, after_id=None, before_id=None, limit=10):
+        """Страница каталога (новые сверху) по id товара.
+        
+        after_id - следующая страница (товары старше), before_id - предыдущая
+        (товары новее). Возвращает (товары, есть ли новее, есть ли старше);
+        читается не больше limit + 1 строк по первичному ключу или индексу категории"""
+        conditions = []
+        params = []
+        if category:
+            conditions.append("category = ?")
+            params.append(category)
+        
+        backwards = before_id is not None
+        if backwards:
+            conditions.append("id > ?")
+            params.append(before_id)
+        elif after_id is not None:
+            conditions.append("id < ?")
+            params.append(after_id)
+        
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        with self.reader() as cursor:
+            cursor.execute(f'''
+                SELECT * FROM products
+                {where}
+                ORDER BY id {'ASC' if backwards else 'DESC'}
+                LIMIT ?
+            ''', (*params, limit + 1))
+            products = fetch_all(cursor, Product)
+        
+        more = len(products) > limit
+        products = products[:limit]
+        if backwards:
+            # Предыдущую страницу читаем от курсора вверх и переворачиваем
+            products.reverse()
+            return products, more, True
+        return products, after_id is not None, more
+    
+    def get_product_categories(self):
+        """Категории, в которых есть товары, в порядке PRODUCT_CATEGORIES"""
+        with self.reader() as cursor:
+            cursor.execute("SELECT DISTINCT category FROM products WHERE category IS NOT NULL")
+            present = {row[0] for row in cursor.fetchall()}
+        return [category for category in PRODUCT_CATEGORIES if category in present]
     
     def create_order(self, user_id, product_id, amount):
+        """Создает заказ; amount в нанотонах"""
         cursor = self.conn.cursor()
         cursor.execute(
-            '''INSERT INTO orders (user_id, product_id, amount, status) 
-               VALUES (?, ?, ?, 'pending')''',
-            (user_id, product_id, amount)
+            '''INSERT INTO orders (user_id, product_id, amount, amount_nano, status) 
+               VALUES (?, ?, ?, ?, 'pending')''',
+            (user_id, product_id, amount / NANOTON, amount)
         )
-        self.conn.commit()
         return cursor.lastrowid
     
     def get_pending_orders(self):
-        cursor = self.conn.cursor()
-        cursor.execute('''
-            SELECT o.*, u.username, p.name as product_name 
-            FROM orders o
-            JOIN users u ON o.user_id = u.user_id
-            JOIN products p ON o.product_id = p.id
-            WHERE o.status = 'pending'
-            ORDER BY o.created_at DESC
-        ''')
-        columns = [column[0] for column in cursor.description]
-        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+        with self.reader() as cursor:
+            cursor.execute('''
+                SELECT o.*, u.username, p.name as product_name 
+                FROM orders o
+                JOIN users u ON o.user_id = u.user_id
+                JOIN products p ON o.product_id = p.id
+                WHERE o.status = 'pending'
+                ORDER BY o.created_at DESC
+            ''')
+            return fetch_all(cursor, Order)
     
     def update_order_chat(self, order_id, chat_id, admin_chat_id):
         cursor = self.conn.cursor()
@@ -148,31 +590,76 @@ class Database:
             "UPDATE orders SET chat_id = ?, admin_chat_id = ?, status = 'processing' WHERE id = ?",
             (chat_id, admin_chat_id, order_id)
         )
-        self.conn.commit()
+    
+    def pay_order(self, order_id, user_id, admin_chat_id):
+        """Оплачивает заказ с баланса пользователя одной транзакцией.
+        Списание происходит, только если хватает средств и заказ еще в статусе pending"""
+        with self.atomic() as cursor:
+            cursor.execute(
+                "SELECT amount_nano, status FROM orders WHERE id = ? AND user_id = ?",
+                (order_id, user_id)
+            )
+            order = cursor.fetchone()
+            if not order:
+                return PAYMENT_NOT_FOUND
+            
+            amount, status = order
+            if status != 'pending':
+                return PAYMENT_ALREADY_PAID
+            
+            if self.debit(user_id, amount, LEDGER_PURCHASE, f"order:{order_id}") is None:
+                return PAYMENT_INSUFFICIENT_FUNDS
+            
+            cursor.execute(
+                '''UPDATE orders SET chat_id = ?, admin_chat_id = ?, status = 'processing'
+                   WHERE id = ? AND status = 'pending' ''',
+                (user_id, admin_chat_id, order_id)
+            )
+            return PAYMENT_OK
     
     def complete_order(self, order_id):
+        """Завершает оплаченный заказ. Возвращает False, если заказ уже обработан"""
         cursor = self.conn.cursor()
         cursor.execute(
-            "UPDATE orders SET status = 'completed', completed_at = CURRENT_TIMESTAMP WHERE id = ?",
+            '''UPDATE orders SET status = 'completed', completed_at = CURRENT_TIMESTAMP
+               WHERE id = ? AND status = 'processing' ''',
             (order_id,)
         )
-        self.conn.commit()
+        return cursor.rowcount > 0
+    
+    def reject_order(self, order_id):
+        """Отклоняет заказ и возвращает деньги, если он был оплачен.
+        Возвращает сумму возврата в нанотонах или None, если заказ уже обработан"""
+        with self.atomic() as cursor:
+            cursor.execute("SELECT user_id, amount_nano, status FROM orders WHERE id = ?", (order_id,))
+            order = cursor.fetchone()
+            if not order or order[2] not in ('pending', 'processing'):
+                return None
+            
+            user_id, amount, status = order
+            cursor.execute(
+                "UPDATE orders SET status = 'rejected' WHERE id = ? AND status = ?",
+                (order_id, status)
+            )
+            if status != 'processing':
+                return 0
+            
+            self._post_entry(cursor, user_id, amount, LEDGER_REFUND, f"order:{order_id}")
+            return amount
     
     def add_transaction(self, user_id, amount, tx_hash):
+        """Сохраняет входящую транзакцию; amount в нанотонах"""
         cursor = self.conn.cursor()
         cursor.execute(
-            "INSERT INTO transactions (user_id, amount, tx_hash) VALUES (?, ?, ?)",
-            (user_id, amount, tx_hash)
+            "INSERT INTO transactions (user_id, amount, amount_nano, tx_hash) VALUES (?, ?, ?, ?)",
+            (user_id, amount / NANOTON, amount, tx_hash)
         )
-        self.conn.commit()
         return cursor.lastrowid
     
     def get_transaction_by_hash(self, tx_hash):
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT * FROM transactions WHERE tx_hash = ?", (tx_hash,))
-        columns = [column[0] for column in cursor.description]
-        row = cursor.fetchone()
-        return dict(zip(columns, row)) if row else None
+        with self.reader() as cursor:
+            cursor.execute("SELECT * FROM transactions WHERE tx_hash = ?", (tx_hash,))
+            return fetch_one(cursor, Transaction)
     
     def update_transaction_status(self, tx_id, status):
         cursor = self.conn.cursor()
@@ -180,124 +667,169 @@ class Database:
             "UPDATE transactions SET status = ? WHERE id = ?",
             (status, tx_id)
         )
-        self.conn.commit()
     
-    def get_order_by_id(self, order_id):
-        cursor = self.conn.cursor()
-        cursor.execute('''
-            SELECT o.*, u.username, p.name as product_name 
-            FROM orders o
-            JOIN users u ON o.user_id = u.user_id
-            JOIN products p ON o.product_id = p.id
-            WHERE o.id = ?
-        ''', (order_id,))
-        columns = [column[0] for column in cursor.description]
-        row = cursor.fetchone()
-        return dict(zip(columns, row)) if row else None
+    def apply_deposits(self, deposits, state_key, state_value):
+        """Зачисляет пачку входящих переводов и сохраняет курсор одной транзакцией.
+        
+        deposits - список (user_id или None, сумма в нанотонах, хэш). Перевод с уже
+        известным хэшем пропускается, поэтому повторная обработка ничего не зачислит.
+        Переводы без известного пользователя сохраняются со статусом unmatched.
+        Возвращает список зачисленных (user_id, amount, tx_hash)"""
+        credited = []
+        with self.atomic() as cursor:
+            for user_id, amount, tx_hash in deposits:
+                if user_id is not None:
+                    cursor.execute("SELECT 1 FROM users WHERE user_id = ?", (user_id,))
+                    if not cursor.fetchone():
+                        user_id = None
+                
+                cursor.execute(
+                    '''INSERT OR IGNORE INTO transactions (user_id, amount, amount_nano, tx_hash, status)
+                       VALUES (?, ?, ?, ?, ?)''',
+                    (user_id, amount / NANOTON, amount, tx_hash,
+                     TX_COMPLETED if user_id is not None else TX_UNMATCHED)
+                )
+                if cursor.rowcount and user_id is not None:
+                    self._post_entry(cursor, user_id, amount, LEDGER_DEPOSIT, f"tx:{tx_hash}")
+                    credited.append((user_id, amount, tx_hash))
+            
+            self._set_state(cursor, state_key, state_value)
+        return credited
     
-    def get_active_chats(self):
-        """Получает активные чаты между пользователями и админом"""
-        cursor = self.conn.cursor()
+    def _set_state(self, cursor, key, value):
         cursor.execute('''
-            SELECT DISTINCT o.user_id, u.username, o.chat_id, o.admin_chat_id
-            FROM orders o
-            JOIN users u ON o.user_id = u.user_id
-            WHERE o.status = 'processing' AND o.chat_id IS NOT NULL
-        ''')
-        columns = [column[0] for column in cursor.description]
-        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+            INSERT INTO state (key, value) VALUES (?, ?)
+            ON CONFLICT (key) DO UPDATE SET value = excluded.value
+        ''', (key, value))
     
-    def get_user_chats(self, user_id):
-        """Получает чаты пользователя"""
-        cursor = self.conn.cursor()
-        cursor.execute('''
-            SELECT o.*, p.name as product_name
-            FROM orders o
-            JOIN products p ON o.product_id = p.id
-            WHERE o.user_id = ? AND o.status = 'processing'
-            ORDER BY o.created_at DESC
-        ''', (user_id,))
-        columns = [column[0] for column in cursor.description]
-        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+    def set_state(self, key, value):
+        with self.atomic() as cursor:
+            self._set_state(cursor, key, value)
     
-    def get_user_by_id(self, user_id):
-        """Получает пользователя по ID"""
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT * FROM users WHERE user_id = ?", (user_id,))
-        columns = [column[0] for column in cursor.description]
-        row = cursor.fetchone()
-        return dict(zip(columns, row)) if row else None
+    def get_state(self, key, default=None):
+        with self.reader() as cursor:
+            cursor.execute("SELECT value FROM state WHERE key = ?", (key,))
+            result = cursor.fetchone()
+            return result[0] if result else default
     
-    def get_user_orders(self, user_id, status=None):
-        """Получает заказы пользователя"""
-        cursor = self.conn.cursor()
-        
-        if status:
+    def get_order_by_id(self, order_id):
+        with self.reader() as cursor:
             cursor.execute('''
-                SELECT o.*, p.name as product_name
+                SELECT o.*, u.username, p.name as product_name 
                 FROM orders o
+                JOIN users u ON o.user_id = u.user_id
                 JOIN products p ON o.product_id = p.id
-                WHERE o.user_id = ? AND o.status = ?
-                ORDER BY o.created_at DESC
-            ''', (user_id, status))
-        else:
+                WHERE o.id = ?
+            ''', (order_id,))
+            return fetch_one(cursor, Order)
+    
+    def get_active_chats(self):
+        """Получает активные чаты между пользователями и админом"""
+        with self.reader() as cursor:
+            cursor.execute('''
+                SELECT DISTINCT o.user_id, u.username, o.chat_id, o.admin_chat_id
+                FROM orders o
+                JOIN users u ON o.user_id = u.user_id
+                WHERE o.status = 'processing' AND o.chat_id IS NOT NULL
+            ''')
+            return fetch_all(cursor, Order)
+    
+    def get_user_chats(self, user_id):
+        """Получает чаты пользователя"""
+        with self.reader() as cursor:
             cursor.execute('''
                 SELECT o.*, p.name as product_name
                 FROM orders o
                 JOIN products p ON o.product_id = p.id
-                WHERE o.user_id = ?
+                WHERE o.user_id = ? AND o.status = 'processing'
                 ORDER BY o.created_at DESC
             ''', (user_id,))
-        
-        columns = [column[0] for column in cursor.description]
-        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+            return fetch_all(cursor, Order)
+    
+    def get_username(self, user_id):
+        """Получает username пользователя"""
+        with self.reader() as cursor:
+            cursor.execute("SELECT username FROM users WHERE user_id = ?", (user_id,))
+            result = cursor.fetchone()
+            return result[0] if result else None
+    
+    def get_user_by_id(self, user_id):
+        """Получает пользователя по ID"""
+        with self.reader() as cursor:
+            cursor.execute("SELECT * FROM users WHERE user_id = ?", (user_id,))
+            return fetch_one(cursor, User)
+    
+    def get_user_orders(self, user_id, status=None):
+        """Получает заказы пользователя"""
+        with self.reader() as cursor:
+            
+            if status:
+                cursor.execute('''
+                    SELECT o.*, p.name as product_name
+                    FROM orders o
+                    JOIN products p ON o.product_id = p.id
+                    WHERE o.user_id = ? AND o.status = ?
+                    ORDER BY o.created_at DESC
+                ''', (user_id, status))
+            else:
+                cursor.execute('''
+                    SELECT o.*, p.name as product_name
+                    FROM orders o
+                    JOIN products p ON o.product_id = p.id
+                    WHERE o.user_id = ?
+                    ORDER BY o.created_at DESC
+                ''', (user_id,))
+            
+            return fetch_all(cursor, Order)
     
     def get_all_orders(self, status=None):
         """Получает все заказы"""
-        cursor = self.conn.cursor()
-        
-        if status:
-            cursor.execute('''
-                SELECT o.*, u.username, p.name as product_name
-                FROM orders o
-                JOIN users u ON o.user_id = u.user_id
-                JOIN products p ON o.product_id = p.id
-                WHERE o.status = ?
-                ORDER BY o.created_at DESC
-            ''', (status,))
-        else:
-            cursor.execute('''
-                SELECT o.*, u.username, p.name as product_name
-                FROM orders o
-                JOIN users u ON o.user_id = u.user_id
-                JOIN products p ON o.product_id = p.id
-                ORDER BY o.created_at DESC
-            ''')
-        
-        columns = [column[0] for column in cursor.description]
-        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+        return list(self.iter_all_orders(status))
+    
+    def iter_all_orders(self, status=None, chunk_size=1000):
+        """Потоково отдает все заказы, не загружая весь результат в память"""
+        with self.reader() as cursor:
+            
+            if status:
+                cursor.execute('''
+                    SELECT o.*, u.username, p.name as product_name
+                    FROM orders o
+                    JOIN users u ON o.user_id = u.user_id
+                    JOIN products p ON o.product_id = p.id
+                    WHERE o.status = ?
+                    ORDER BY o.created_at DESC
+                ''', (status,))
+            else:
+                cursor.execute('''
+                    SELECT o.*, u.username, p.name as product_name
+                    FROM orders o
+                    JOIN users u ON o.user_id = u.user_id
+                    JOIN products p ON o.product_id = p.id
+                    ORDER BY o.created_at DESC
+                ''')
+            
+            yield from iter_records(cursor, Order, chunk_size)
     
     def delete_product(self, product_id):
         """Удаляет товар"""
         cursor = self.conn.cursor()
         cursor.execute("DELETE FROM products WHERE id = ?", (product_id,))
-        self.conn.commit()
         return cursor.rowcount > 0
     
     def update_product(self, product_id, name=None, price=None):
-        """Обновляет товар"""
+        """Обновляет товар; price в нанотонах"""
         cursor = self.conn.cursor()
         
         updates = []
         params = []
         
         if name is not None:
-            updates.append("name = ?")
-            params.append(name)
+            updates.append("name = ?, category = ?")
+            params.extend([name, product_category(name)])
         
         if price is not None:
-            updates.append("price = ?")
-            params.append(price)
+            updates.append("price = ?, price_nano = ?")
+            params.extend([price / NANOTON, price])
         
         if not updates:
             return False
@@ -305,63 +837,568 @@ class Database:
         params.append(product_id)
         query = f"UPDATE products SET {', '.join(updates)} WHERE id = ?"
         cursor.execute(query, params)
-        self.conn.commit()
         return cursor.rowcount > 0
     
     def get_user_transactions(self, user_id):
         """Получает транзакции пользователя"""
+        with self.reader() as cursor:
+            cursor.execute('''
+                SELECT * FROM transactions 
+                WHERE user_id = ? 
+                ORDER BY created_at DESC
+            ''', (user_id,))
+            return fetch_all(cursor, Transaction)
+    
+    def get_orders_page(self, status=None, page_token=None, limit=20):
+        """Страница заказов (новые сверху) и токен следующей страницы"""
+        condition, params = _page_condition("o.created_at, o.id", page_token)
+        if status:
+            condition = "AND o.status = ? " + condition
+            params = (status,) + tuple(params)
+        with self.reader() as cursor:
+            cursor.execute(f'''
+                SELECT o.*, u.username, p.name as product_name
+                FROM orders o
+                JOIN users u ON o.user_id = u.user_id
+                JOIN products p ON o.product_id = p.id
+                WHERE 1 = 1 {condition}
+                ORDER BY o.created_at DESC, o.id DESC
+                LIMIT ?
+            ''', (*params, limit + 1))
+            orders = fetch_all(cursor, Order)
+        return _split_page(orders, limit, lambda order: (order.created_at, order.id))
+    
+    def get_user_orders_page(self, user_id, status=None, page_token=None, limit=20):
+        """Страница заказов пользователя и токен следующей страницы"""
+        condition, params = _page_condition("o.created_at, o.id", page_token)
+        if status:
+            condition = "AND o.status = ? " + condition
+            params = (status,) + tuple(params)
+        with self.reader() as cursor:
+            cursor.execute(f'''
+                SELECT o.*, p.name as product_name
+                FROM orders o
+                JOIN products p ON o.product_id = p.id
+                WHERE o.user_id = ? {condition}
+                ORDER BY o.created_at DESC, o.id DESC
+                LIMIT ?
+            ''', (user_id, *params, limit + 1))
+            orders = fetch_all(cursor, Order)
+        return _split_page(orders, limit, lambda order: (order.created_at, order.id))
+    
+    def get_user_transactions_page(self, user_id, page_token=None, limit=20):
+        """Страница транзакций пользователя и токен следующей страницы"""
+        condition, params = _page_condition("created_at, id", page_token)
+        with self.reader() as cursor:
+            cursor.execute(f'''
+                SELECT * FROM transactions
+                WHERE user_id = ? {condition}
+                ORDER BY created_at DESC, id DESC
+                LIMIT ?
+            ''', (user_id, *params, limit + 1))
+            transactions = fetch_all(cursor, Transaction)
+        return _split_page(transactions, limit, lambda tx: (tx.created_at, tx.id))
+    
+    def get_users_page(self, page_token=None, limit=20):
+        """Страница пользователей (новые сверху) и токен следующей страницы"""
+        condition, params = _page_condition("created_at, user_id", page_token)
+        with self.reader() as cursor:
+            cursor.execute(f'''
+                SELECT * FROM users
+                WHERE 1 = 1 {condition}
+                ORDER BY created_at DESC, user_id DESC
+                LIMIT ?
+            ''', (*params, limit + 1))
+            users = fetch_all(cursor, User)
+        return _split_page(users, limit, lambda user: (user.created_at, user.user_id))
+    
+    def get_active_users_count(self):
+        """Число пользователей, не заблокировавших бота"""
+        with self.reader() as cursor:
+            cursor.execute("SELECT COUNT(*) FROM users WHERE blocked_at IS NULL")
+            return cursor.fetchone()[0]
+    
+    def get_broadcast_recipients(self, after_user_id, limit):
+        """Следующая страница получателей рассылки по возрастанию user_id"""
+        with self.reader() as cursor:
+            cursor.execute('''
+                SELECT user_id FROM users
+                WHERE user_id > ? AND blocked_at IS NULL
+                ORDER BY user_id
+                LIMIT ?
+            ''', (after_user_id, limit))
+            return [row[0] for row in cursor.fetchall()]
+    
+    def create_broadcast(self, text, admin_chat_id, progress_message_id, total):
         cursor = self.conn.cursor()
-        cursor.execute('''
-            SELECT * FROM transactions 
-            WHERE user_id = ? 
-            ORDER BY created_at DESC
-        ''', (user_id,))
-        columns = [column[0] for column in cursor.description]
-        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+        cursor.execute(
+            '''INSERT INTO broadcasts (text, admin_chat_id, progress_message_id, total)
+               VALUES (?, ?, ?, ?)''',
+            (text, admin_chat_id, progress_message_id, total)
+        )
+        return cursor.lastrowid
+    
+    def get_broadcast(self, broadcast_id):
+        with self.reader() as cursor:
+            cursor.execute("SELECT * FROM broadcasts WHERE id = ?", (broadcast_id,))
+            return fetch_one(cursor, Broadcast)
+    
+    def get_running_broadcasts(self):
+        with self.reader() as cursor:
+            cursor.execute("SELECT * FROM broadcasts WHERE status = ? ORDER BY id", (BROADCAST_RUNNING,))
+            return fetch_all(cursor, Broadcast)
+    
+    def save_broadcast_progress(self, broadcast_id, last_user_id, sent, failed, blocked_user_ids):
+        """Сохраняет обработанную страницу рассылки и отмечает заблокировавших бота"""
+        with self.atomic() as cursor:
+            cursor.executemany(
+                "UPDATE users SET blocked_at = CURRENT_TIMESTAMP WHERE user_id = ? AND blocked_at IS NULL",
+                [(user_id,) for user_id in blocked_user_ids]
+            )
+            cursor.execute('''
+                UPDATE broadcasts SET
+                    last_user_id = ?,
+                    sent = sent + ?,
+                    failed = failed + ?,
+                    blocked = blocked + ?
+                WHERE id = ?
+            ''', (last_user_id, sent, failed, len(blocked_user_ids), broadcast_id))
+    
+    def finish_broadcast(self, broadcast_id):
+        cursor = self.conn.cursor()
+        cursor.execute(
+            "UPDATE broadcasts SET status = ?, finished_at = CURRENT_TIMESTAMP WHERE id = ?",
+            (BROADCAST_FINISHED, broadcast_id)
+        )
     
     def get_all_users(self):
         """Получает всех пользователей"""
-        cursor = self.conn.cursor()
-        cursor.execute('''
-            SELECT * FROM users 
-            ORDER BY created_at DESC
-        ''')
-        columns = [column[0] for column in cursor.description]
-        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+        return list(self.iter_all_users())
+    
+    def iter_all_users(self, chunk_size=1000):
+        """Потоково отдает всех пользователей, не загружая весь результат в память"""
+        with self.reader() as cursor:
+            cursor.execute('''
+                SELECT * FROM users 
+                ORDER BY created_at DESC
+            ''')
+            yield from iter_records(cursor, User, chunk_size)
+    
+    def get_counters(self):
+        """Счетчики статистики, которые поддерживаются триггерами"""
+        with self.reader() as cursor:
+            cursor.execute("SELECT name, value FROM counters")
+            return dict(cursor.fetchall())
+    
+    def _get_counter(self, name):
+        with self.reader() as cursor:
+            cursor.execute("SELECT value FROM counters WHERE name = ?", (name,))
+            result = cursor.fetchone()
+            return result[0] if result else 0
+    
+    def verify_counters(self):
+        """Пересчитывает счетчики по таблицам и исправляет расхождения.
+        Возвращает расхождения: {счетчик: (было, стало)}"""
+        with self.atomic() as cursor:
+            cursor.execute(COUNTERS_QUERY)
+            actual = dict(cursor.fetchall())
+            cursor.execute("SELECT name, value FROM counters")
+            stored = dict(cursor.fetchall())
+            
+            mismatches = {}
+            for name in stored.keys() | actual.keys():
+                if stored.get(name, 0) != actual.get(name, 0):
+                    mismatches[name] = (stored.get(name, 0), actual.get(name, 0))
+                    cursor.execute(
+                        "INSERT OR REPLACE INTO counters (name, value) VALUES (?, ?)",
+                        (name, actual.get(name, 0))
+                    )
+            return mismatches
+    
+    def get_users_count(self):
+        """Количество пользователей"""
+        return self._get_counter('users')
+    
+    def get_products_count(self):
+        """Количество товаров"""
+        return self._get_counter('products')
+    
+    def get_pending_orders_count(self):
+        """Количество заявок в ожидании"""
+        return self._get_counter('orders:pending')
+    
+    def get_total_balance(self):
+        """Суммарный баланс пользователей в нанотонах"""
+        return self._get_counter('balance')
     
     def get_statistics(self):
         """Получает статистику"""
-        cursor = self.conn.cursor()
-        
-        stats = {}
-        
-        # Количество пользователей
-        cursor.execute("SELECT COUNT(*) FROM users")
-        stats['total_users'] = cursor.fetchone()[0]
+        counters = self.get_counters()
+        return {
+            'total_users': counters.get('users', 0),
+            'total_products': counters.get('products', 0),
+            'total_balance': counters.get('balance', 0),
+            'orders_by_status': {
+                name.split(':', 1)[1]: value
+                for name, value in counters.items()
+                if name.startswith('orders:') and value
+            },
+            'total_sales': counters.get('sales', 0),
+            'total_transactions': counters.get('transactions', 0)
+        }
+
+class AsyncDatabase:
+    """Асинхронный доступ к базе: чтения выполняются в пуле потоков,
+    записи - в отдельном потоке писателя через очередь, не блокируя цикл событий бота.
+    
+    В режиме group commit записи, пришедшие в пределах окна group_commit_window
+    (но не более group_commit_max_ops), фиксируются одной транзакцией.
+    Вызывающий получает результат только после фиксации своей пачки."""
+    
+    def __init__(self, database, write_queue_size=0, group_commit=False,
+                 group_commit_window=0.005, group_commit_max_ops=100, known_users_size=10000):
+        self.database = database
+        self.group_commit_window = group_commit_window
+        self.group_commit_max_ops = group_commit_max_ops if group_commit else 1
         
-        # Количество товаров
-        cursor.execute("SELECT COUNT(*) FROM products")
-        stats['total_products'] = cursor.fetchone()[0]
+        # Счетчики пачек записи
+        self.batches_committed = 0
+        self.ops_committed = 0
+        self.last_batch_size = 0
+        self.max_batch_size = 0
         
-        # Общий баланс
-        cursor.execute("SELECT SUM(balance) FROM users")
-        total_balance = cursor.fetchone()[0]
-        stats['total_balance'] = total_balance if total_balance else 0
+        # Версия каталога: растет после фиксации каждого изменения товаров
+        self.catalog_version = 0
         
-        # Количество заказов по статусам
-        cursor.execute("SELECT status, COUNT(*) FROM orders GROUP BY status")
-        orders_by_status = cursor.fetchall()
-        stats['orders_by_status'] = dict(orders_by_status)
+        # Недавно виденные пользователи: user_id -> username
+        self.known_users = LRUCache(known_users_size)
         
-        # Общая сумма заказов
-        cursor.execute("SELECT SUM(amount) FROM orders WHERE status = 'completed'")
-        total_sales = cursor.fetchone()[0]
-        stats['total_sales'] = total_sales if total_sales else 0
+        # Потоков чтения столько же, сколько соединений в пуле
+        self.read_executor = ThreadPoolExecutor(
+            max_workers=database.read_pool_size,
+            thread_name_prefix="db-read"
+        )
+        self.write_queue = queue.Queue(maxsize=write_queue_size)
+        self.writer = threading.Thread(target=self._writer_loop, name="db-writer", daemon=True)
+        self.writer.start()
+    
+    @property
+    def write_queue_depth(self):
+        """Количество записей, ожидающих в очереди"""
+        return self.write_queue.qsize()
+    
+    @property
+    def average_batch_size(self):
+        if not self.batches_committed:
+            return 0
+        return self.ops_committed / self.batches_committed
+    
+    def write_stats(self):
+        """Статистика очереди и пачек записи"""
+        return {
+            'queue_depth': self.write_queue_depth,
+            'batches_committed': self.batches_committed,
+            'ops_committed': self.ops_committed,
+            'last_batch_size': self.last_batch_size,
+            'max_batch_size': self.max_batch_size,
+            'average_batch_size': self.average_batch_size
+        }
+    
+    def _collect_batch(self, first):
+        """Добирает записи в пачку до истечения окна или лимита операций"""
+        batch = [first]
+        deadline = time.monotonic() + self.group_commit_window
+        while len(batch) < self.group_commit_max_ops:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                item = self.write_queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if item is None:
+                # Остановка: зафиксируем уже собранное и выйдем
+                self.write_queue.put(None)
+                break
+            batch.append(item)
+        return batch
+    
+    def _commit_batch(self, batch):
+        conn = self.database.conn
+        results = []
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for func, args, future in batch:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                # Каждая операция в своей точке сохранения: ошибка одной
+                # не откатывает остальные операции пачки
+                conn.execute("SAVEPOINT op")
+                try:
+                    result = func(*args)
+                except Exception as e:
+                    conn.execute("ROLLBACK TO op")
+                    conn.execute("RELEASE op")
+                    results.append((future, None, e))
+                else:
+                    conn.execute("RELEASE op")
+                    results.append((future, result, None))
+            conn.execute("COMMIT")
+        except Exception as e:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            for func, args, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
         
-        # Количество транзакций
-        cursor.execute("SELECT COUNT(*) FROM transactions")
-        stats['total_transactions'] = cursor.fetchone()[0]
+        self.batches_committed += 1
+        self.ops_committed += len(results)
+        self.last_batch_size = len(results)
+        self.max_batch_size = max(self.max_batch_size, len(results))
         
-        return stats
+        # Результаты отдаем только после фиксации транзакции
+        for future, result, error in results:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+    
+    def _writer_loop(self):
+        while True:
+            item = self.write_queue.get()
+            if item is None:
+                break
+            self._commit_batch(self._collect_batch(item))
+    
+    async def _read(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.read_executor, func, *args)
+    
+    async def _write(self, func, *args):
+        future = Future()
+        item = (func, args, future)
+        try:
+            self.write_queue.put_nowait(item)
+        except queue.Full:
+            # Очередь переполнена - ждем места, не блокируя цикл событий
+            await asyncio.to_thread(self.write_queue.put, item)
+        return await asyncio.wrap_future(future)
+    
+    async def _stream(self, records, chunk_size):
+        """Асинхронно отдает записи из генератора Database, читая пачками в пуле чтения.
+        При досрочном выходе из цикла оборачивайте вызов в contextlib.aclosing,
+        чтобы соединение сразу вернулось в пул"""
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                chunk = await loop.run_in_executor(
+                    self.read_executor, list, islice(records, chunk_size)
+                )
+                if not chunk:
+                    break
+                for record in chunk:
+                    yield record
+        finally:
+            # Возвращаем соединение в пул, даже если чтение прервали
+            await loop.run_in_executor(self.read_executor, records.close)
+    
+    def close(self):
+        """Дожидается выполнения записей из очереди и останавливает потоки"""
+        self.write_queue.put(None)
+        self.writer.join()
+        self.read_executor.shutdown()
+    
+    async def get_or_create_user(self, user_id, username):
+        user = await self._write(self.database.get_or_create_user, user_id, username)
+        self.known_users.put(user_id, username)
+        return user
+    
+    async def ensure_user(self, user_id, username):
+        """Регистрирует пользователя. Недавно виденные пользователи с тем же
+        username берутся из LRU и к базе не обращаются"""
+        if self.known_users.get(user_id) == username:
+            return
+        await self._write(self.database.upsert_user, user_id, username)
+        self.known_users.put(user_id, username)
+    
+    async def credit(self, user_id, amount, kind, ref=None):
+        return await self._write(self.database.credit, user_id, amount, kind, ref)
+    
+    async def debit(self, user_id, amount, kind, ref=None):
+        return await self._write(self.database.debit, user_id, amount, kind, ref)
+    
+    async def get_balance(self, user_id):
+        return await self._read(self.database.get_balance, user_id)
+    
+    async def get_ledger_entries(self, user_id, limit=50):
+        return await self._read(self.database.get_ledger_entries, user_id, limit)
+    
+    async def take_snapshot(self, force=False):
+        return await self._write(self.database.take_snapshot, force)
+    
+    async def audit_ledger(self):
+        return await self._read(self.database.audit_ledger)
+    
+    async def add_product(self, name, price):
+        product_id = await self._write(self.database.add_product, name, price)
+        self.catalog_version += 1
+        return product_id
+    
+    async def get_products(self):
+        return await self._read(self.database.get_products)
+    
+    async def get_product(self, product_id):
+        return await self._read(self.database.get_product, product_id)
+    
+    async def get_products_page(self, category=None, after_id=None, before_id=None, limit=10):
+        return await self._read(self.database.get_products_page, category, after_id, before_id, limit)
+    
+    async def get_product_categories(self):
+        return await self._read(self.database.get_product_categories)
+    
+    async def create_order(self, user_id, product_id, amount):
+        return await self._write(self.database.create_order, user_id, product_id, amount)
+    
+    async def get_pending_orders(self):
+        return await self._read(self.database.get_pending_orders)
+    
+    async def update_order_chat(self, order_id, chat_id, admin_chat_id):
+        return await self._write(self.database.update_order_chat, order_id, chat_id, admin_chat_id)
+    
+    async def pay_order(self, order_id, user_id, admin_chat_id):
+        return await self._write(self.database.pay_order, order_id, user_id, admin_chat_id)
+    
+    async def complete_order(self, order_id):
+        return await self._write(self.database.complete_order, order_id)
+    
+    async def reject_order(self, order_id):
+        return await self._write(self.database.reject_order, order_id)
+    
+    async def add_transaction(self, user_id, amount, tx_hash):
+        return await self._write(self.database.add_transaction, user_id, amount, tx_hash)
+    
+    async def get_transaction_by_hash(self, tx_hash):
+        return await self._read(self.database.get_transaction_by_hash, tx_hash)
+    
+    async def update_transaction_status(self, tx_id, status):
+        return await self._write(self.database.update_transaction_status, tx_id, status)
+    
+    async def apply_deposits(self, deposits, state_key, state_value):
+        return await self._write(self.database.apply_deposits, deposits, state_key, state_value)
+    
+    async def set_state(self, key, value):
+        return await self._write(self.database.set_state, key, value)
+    
+    async def get_state(self, key, default=None):
+        return await self._read(self.database.get_state, key, default)
+    
+    async def get_order_by_id(self, order_id):
+        return await self._read(self.database.get_order_by_id, order_id)
+    
+    async def get_active_chats(self):
+        return await self._read(self.database.get_active_chats)
+    
+    async def get_user_chats(self, user_id):
+        return await self._read(self.database.get_user_chats, user_id)
+    
+    async def get_username(self, user_id):
+        return await self._read(self.database.get_username, user_id)
+    
+    async def get_user_by_id(self, user_id):
+        return await self._read(self.database.get_user_by_id, user_id)
+    
+    async def get_user_orders(self, user_id, status=None):
+        return await self._read(self.database.get_user_orders, user_id, status)
+    
+    async def get_all_orders(self, status=None):
+        return await self._read(self.database.get_all_orders, status)
+    
+    def iter_all_orders(self, status=None, chunk_size=1000):
+        return self._stream(self.database.iter_all_orders(status, chunk_size), chunk_size)
+    
+    async def delete_product(self, product_id):
+        deleted = await self._write(self.database.delete_product, product_id)
+        self.catalog_version += 1
+        return deleted
+    
+    async def update_product(self, product_id, name=None, price=None):
+        updated = await self._write(self.database.update_product, product_id, name, price)
+        self.catalog_version += 1
+        return updated
+    
+    async def get_user_transactions(self, user_id):
+        return await self._read(self.database.get_user_transactions, user_id)
+    
+    async def get_orders_page(self, status=None, page_token=None, limit=20):
+        return await self._read(self.database.get_orders_page, status, page_token, limit)
+    
+    async def get_user_orders_page(self, user_id, status=None, page_token=None, limit=20):
+        return await self._read(self.database.get_user_orders_page, user_id, status, page_token, limit)
+    
+    async def get_user_transactions_page(self, user_id, page_token=None, limit=20):
+        return await self._read(self.database.get_user_transactions_page, user_id, page_token, limit)
+    
+    async def get_users_page(self, page_token=None, limit=20):
+        return await self._read(self.database.get_users_page, page_token, limit)
+    
+    async def get_active_users_count(self):
+        return await self._read(self.database.get_active_users_count)
+    
+    async def get_broadcast_recipients(self, after_user_id, limit):
+        return await self._read(self.database.get_broadcast_recipients, after_user_id, limit)
+    
+    async def create_broadcast(self, text, admin_chat_id, progress_message_id, total):
+        return await self._write(self.database.create_broadcast, text, admin_chat_id, progress_message_id, total)
+    
+    async def get_broadcast(self, broadcast_id):
+        return await self._read(self.database.get_broadcast, broadcast_id)
+    
+    async def get_running_broadcasts(self):
+        return await self._read(self.database.get_running_broadcasts)
+    
+    async def save_broadcast_progress(self, broadcast_id, last_user_id, sent, failed, blocked_user_ids):
+        # Заблокировавшие бота должны снова пройти через upsert_user, когда напишут
+        for user_id in blocked_user_ids:
+            self.known_users.pop(user_id)
+        return await self._write(self.database.save_broadcast_progress,
+                                 broadcast_id, last_user_id, sent, failed, blocked_user_ids)
+    
+    async def finish_broadcast(self, broadcast_id):
+        return await self._write(self.database.finish_broadcast, broadcast_id)
+    
+    async def get_all_users(self):
+        return await self._read(self.database.get_all_users)
+    
+    def iter_all_users(self, chunk_size=1000):
+        return self._stream(self.database.iter_all_users(chunk_size), chunk_size)
+    
+    async def get_counters(self):
+        return await self._read(self.database.get_counters)
+    
+    async def verify_counters(self):
+        return await self._write(self.database.verify_counters)
+    
+    async def get_users_count(self):
+        return await self._read(self.database.get_users_count)
+    
+    async def get_products_count(self):
+        return await self._read(self.database.get_products_count)
+    
+    async def get_pending_orders_count(self):
+        return await self._read(self.database.get_pending_orders_count)
+    
+    async def get_total_balance(self):
+        return await self._read(self.database.get_total_balance)
+    
+    async def get_statistics(self):
+        return await self._read(self.database.get_statistics)
 
-db = Database()
\ No newline at end of file
+db = AsyncDatabase(
+    Database(),
+    write_queue_size=Config.DB_WRITE_QUEUE_SIZE,
+    group_commit=Config.DB_GROUP_COMMIT,
+    group_commit_window=Config.DB_GROUP_COMMIT_WINDOW_MS / 1000,
+    group_commit_max_ops=Config.DB_GROUP_COMMIT_MAX_OPS,
+    known_users_size=Config.KNOWN_USERS_CACHE_SIZE
+)
\ No newline at end of file
@@ -0,0 +1,132 @@
+from telegram.ext import ContextTypes
+from config import Config
+from database import db
+from money import format_ton
+from outbox import outbox, PRIORITY_TRANSACTIONAL
+from utils import ton_checker
+from templates import templates
+
+# Ключ курсора в таблице state: "lt:hash" последней обработанной транзакции
+CURSOR_KEY = 'deposits_cursor'
+
+# Наибольшее значение INTEGER в SQLite: ID и суммы больше него не сохранить
+SQLITE_MAX_INTEGER = 2 ** 63 - 1
+
+def _tx_id(transaction):
+    transaction_id = transaction['transaction_id']
+    return int(transaction_id['lt']), transaction_id['hash']
+
+def _parse_deposit(transaction):
+    """Входящий перевод как (user_id или None, сумма в нанотонах, хэш)"""
+    in_msg = transaction.get('in_msg') or {}
+    amount = int(in_msg.get('value') or 0)
+    # Внешние сообщения (без source) и транзакции без суммы - не пополнения
+    if not in_msg.get('source') or not 0 < amount <= SQLITE_MAX_INTEGER:
+        return None
+    
+    # В комментарии к переводу пользователь указывает свой ID. Комментарий пишет
+    # отправитель: все, что не похоже на ID (например, "²", для которого isdigit()
+    # верно, или слишком длинное число), сохраняется как перевод без пользователя
+    comment = (in_msg.get('message') or '').strip()
+    user_id = None
+    if comment.isascii() and comment.isdigit() and len(comment) <= 19:
+        user_id = int(comment)
+        if user_id > SQLITE_MAX_INTEGER:
+            user_id = None
+    return user_id, amount, transaction['transaction_id']['hash']
+
+class DepositWatcher:
+    """Фоновое зачисление пополнений.
+    
+    Каждый опрос читает getTransactions кошелька только до сохраненного курсора
+    (to_lt), поэтому стоимость опроса зависит от числа новых транзакций, а не от
+    всей истории. Зачисление и сдвиг курсора фиксируются одной транзакцией базы,
+    а уникальный tx_hash не дает зачислить перевод дважды - после перезапуска
+    опрос продолжается с курсора без повторного сканирования.
+    
+    При первом запуске (курсора еще нет) курсор ставится на последнюю
+    транзакцию кошелька без зачисления: переводы до этого момента могли быть
+    уже зачислены вручную через проверку check_."""
+    
+    def __init__(self, page_size=Config.DEPOSIT_PAGE_SIZE):
+        self.page_size = page_size
+        
+        self.polls = 0
+        self.deposits_credited = 0
+    
+    async def _fetch_new(self, cursor_lt):
+        """Транзакции новее курсора, новые сверху"""
+        transactions = []
+        lt = tx_hash = None
+        while True:
+            page = await ton_checker.fetch_transactions(self.page_size, lt, tx_hash, cursor_lt)
+            full_page = len(page) >= self.page_size
+            # Следующая страница начинается с последней транзакции предыдущей
+            if lt is not None and page and _tx_id(page[0]) == (lt, tx_hash):
+                page = page[1:]
+            
+            fresh = [tx for tx in page if _tx_id(tx)[0] > cursor_lt]
+            transactions.extend(fresh)
+            
+            if not full_page or not fresh or len(fresh) < len(page):
+                return transactions
+            lt, tx_hash = _tx_id(transactions[-1])
+    
+    async def poll(self, context: ContextTypes.DEFAULT_TYPE):
+        self.polls += 1
+        cursor = await db.get_state(CURSOR_KEY)
+        
+        try:
+            if cursor is None:
+                await self._start_cursor()
+                return
+            transactions = await self._fetch_new(int(cursor.split(':', 1)[0]))
+        except Exception as e:
+            # Курсор не сдвигаем - следующий опрос повторит те же страницы
+            print(f"Error polling deposits: {e}")
+            return
+        
+        if not transactions:
+            return
+        
+        lt, tx_hash = _tx_id(transactions[0])
+        deposits = []
+        for transaction in reversed(transactions):
+            # Один странный перевод не должен останавливать зачисление остальных
+            try:
+                deposit = _parse_deposit(transaction)
+            except Exception as e:
+                print(f"Skipping malformed transaction: {e}")
+                continue
+            if deposit:
+                deposits.append(deposit)
+        
+        credited = await db.apply_deposits(deposits, CURSOR_KEY, f"{lt}:{tx_hash}")
+        self.deposits_credited += len(credited)
+        
+        for user_id, amount, _ in credited:
+            outbox.send(
+                user_id,
+                templates.deposit_credited(
+                    amount=format_ton(amount),
+                    balance=format_ton(await db.get_balance(user_id))
+                ),
+                priority=PRIORITY_TRANSACTIONAL,
+                parse_mode='Markdown'
+            )
+    
+    async def _start_cursor(self):
+        """Ставит курсор на последнюю транзакцию кошелька, ничего не зачисляя"""
+        page = await ton_checker.fetch_transactions(1)
+        # Пустой кошелек: зачислять нужно все, что придет дальше
+        cursor = '0:' if not page else '{}:{}'.format(*_tx_id(page[0]))
+        await db.set_state(CURSOR_KEY, cursor)
+    
+    def stats(self):
+        """Счетчики опросов и зачислений"""
+        return {
+            'polls': self.polls,
+            'deposits_credited': self.deposits_credited
+        }
+
+deposit_watcher = DepositWatcher()
@@ -0,0 +1,99 @@
+import asyncio
+from config import Config
+from keyboards import keyboards
+from money import to_nano
+from outbox import outbox, PRIORITY_TRANSACTIONAL
+from templates import templates
+
+# Предел длины сводки с запасом до лимита Telegram в 4096 символов
+MAX_DIGEST_LENGTH = 3500
+
+class AdminDigest:
+    """Сводка событий для администратора.
+    
+    События (новые заявки, сообщения пользователей) копятся window секунд и
+    уходят одним сообщением с кнопками для каждой заявки. Сводка отправляется
+    раньше, если набралось max_events событий или текст стал слишком длинным.
+    Срочные события (в том числе заявки от urgent_amount нанотон) отправляются
+    сразу, минуя окно."""
+    
+    def __init__(self, chat_id, window=10, max_events=10, urgent_amount=None):
+        self.chat_id = chat_id
+        self.window = window
+        self.max_events = max_events
+        self.urgent_amount = urgent_amount
+        
+        # (текст события, id заявок для кнопок)
+        self.events = []
+        self.length = 0
+        self.flush_handle = None
+        
+        self.events_total = 0
+        self.digests_sent = 0
+    
+    def is_urgent(self, amount):
+        return self.urgent_amount is not None and amount >= self.urgent_amount
+    
+    def add(self, text, order_ids=(), urgent=False):
+        self.events_total += 1
+        if urgent or self.window <= 0:
+            self._send([(text, tuple(order_ids))])
+            return
+        
+        if self.events and self.length + len(text) > MAX_DIGEST_LENGTH:
+            self.flush()
+        
+        self.events.append((text, tuple(order_ids)))
+        self.length += len(text)
+        if len(self.events) >= self.max_events:
+            self.flush()
+        elif self.flush_handle is None:
+            self.flush_handle = asyncio.get_running_loop().call_later(self.window, self.flush)
+    
+    def flush(self):
+        """Отправляет накопленные события одной сводкой"""
+        if self.flush_handle is not None:
+            self.flush_handle.cancel()
+            self.flush_handle = None
+        
+        events, self.events = self.events, []
+        self.length = 0
+        if events:
+            self._send(events)
+    
+    def _send(self, events):
+        self.digests_sent += 1
+        order_ids = list(dict.fromkeys(order_id for _, ids in events for order_id in ids))
+        
+        if len(events) == 1:
+            # Одиночное событие - в привычном виде, с обычными кнопками заявки
+            text = events[0][0]
+            reply_markup = keyboards.order_actions(order_ids[0]) if len(order_ids) == 1 else None
+        else:
+            text = templates.digest_header(len(events)) + templates.digest_separator.join(
+                event_text for event_text, _ in events
+            )
+            reply_markup = keyboards.digest_actions(order_ids) if order_ids else None
+        
+        outbox.send(
+            self.chat_id,
+            text,
+            priority=PRIORITY_TRANSACTIONAL,
+            parse_mode='Markdown',
+            reply_markup=reply_markup
+        )
+    
+    def stats(self):
+        """Число событий и отправленных сообщений"""
+        return {
+            'pending': len(self.events),
+            'events': self.events_total,
+            'messages': self.digests_sent
+        }
+
+admin_digest = AdminDigest(
+    Config.ADMIN_ID,
+    window=Config.ADMIN_DIGEST_WINDOW,
+    max_events=Config.ADMIN_DIGEST_MAX_EVENTS,
+    urgent_amount=to_nano(Config.ADMIN_URGENT_AMOUNT) if Config.ADMIN_URGENT_AMOUNT else None
+)
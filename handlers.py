@@ -1,9 +1,17 @@
 from telegram import Update, InlineKeyboardMarkup, InlineKeyboardButton
 from telegram.ext import ContextTypes
+from telegram.helpers import escape_markdown
 from config import Config
-from database import db
+from database import db, TX_COMPLETED, TX_UNMATCHED, PAYMENT_OK, PAYMENT_ALREADY_PAID, PAYMENT_INSUFFICIENT_FUNDS
 from keyboards import keyboards
-from utils import ton_checker
+from catalog import catalog
+from utils import ton_checker, normalize_tx_hash, TONApiUnavailable
+from money import format_ton
+from outbox import outbox, PRIORITY_TRANSACTIONAL
+from digest import admin_digest
+from templates import templates
+from admin import admin_handler
+from router import route, callback_data, callback_code, CB_MAIN_MENU, CB_SHOW_PRODUCTS, CB_CATALOG_NEXT, CB_CATALOG_PREV, CB_PRODUCT, CB_BUY, CB_PAID, CB_CANCEL_PAYMENT, CB_COMPLETE, CB_REJECT
 import asyncio
 
 class BotHandlers:
@@ -12,18 +20,9 @@ class BotHandlers:
     
     async def start(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         user = update.effective_user
-        db.get_or_create_user(user.id, user.username)
+        await db.ensure_user(user.id, user.username)
         
-        welcome_text = f"""{self.emojis['pizza']} *Добро пожаловать в Pizza Numbers Bot!* {self.emojis['pizza']}
-
-🍕 *Горячие номера Telegram как свежая пицца!*
-
-{self.emojis['phone']} Покупайте качественные номера Telegram
-{self.emojis['lock']} Полная анонимность и безопасность
-{self.emojis['ton']} Оплата в TON - быстро и надежно
-{self.emojis['check']} Автоматическая проверка платежей
-
-👇 Выберите действие:"""
+        welcome_text = templates.welcome
         
         is_admin = user.id == Config.ADMIN_ID
         await update.message.reply_text(
@@ -34,14 +33,9 @@ class BotHandlers:
     
     async def show_balance(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         user_id = update.effective_user.id
-        balance = db.get_balance(user_id)
-        
-        text = f"""{self.emojis['balance']} *Ваш баланс*
+        balance = await db.get_balance(user_id)
         
-💰 Доступно: *{balance} TON*
-{self.emojis['ton']} Кошелек: `{ton_checker.format_wallet_address()}`
-        
-👇 Используйте кнопку ниже для пополнения:"""
+        text = templates.balance(balance=format_ton(balance))
         
         await update.message.reply_text(
             text,
@@ -50,21 +44,7 @@ class BotHandlers:
         )
     
     async def deposit(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        text = f"""{self.emojis['money']} *Пополнение баланса*
-        
-{self.emojis['ton']} Отправьте TON на адрес:
-`{Config.WALLET_TON}`
-
-⚠️ *Внимание!*
-1. Отправляйте ТОЛЬКО TON
-2. Минимальная сумма: 0.1 TON
-3. После отправки нажмите "Проверить оплату"
-4. Система проверит платеж автоматически
-
-📝 *Для проверки оплаты:*
-1. Скопируйте хэш транзакции
-2. Отправьте его боту в формате:
-`check_0xваш_хэш`"""
+        text = templates.deposit(user_id=update.effective_user.id)
         
         await update.message.reply_text(
             text,
@@ -75,66 +55,101 @@ class BotHandlers:
     async def check_payment(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         message_text = update.message.text
         if message_text.startswith('check_'):
-            tx_hash = message_text[6:].strip()
+            tx_hash = normalize_tx_hash(message_text[6:])
+            
+            # Обработанные переводы уже есть в базе - API не нужен
+            transaction = await db.get_transaction_by_hash(tx_hash)
+            if transaction and transaction['status'] == TX_COMPLETED:
+                await update.message.reply_text(
+                    templates.payment_already_credited(format_ton(transaction['amount_nano'])),
+                    reply_markup=keyboards.main_menu(update.effective_user.id == Config.ADMIN_ID)
+                )
+                return
+            if transaction and transaction['status'] == TX_UNMATCHED:
+                await update.message.reply_text(
+                    templates.payment_unmatched,
+                    reply_markup=keyboards.main_menu(update.effective_user.id == Config.ADMIN_ID)
+                )
+                return
+            
+            try:
+                found = await ton_checker.check_transaction(tx_hash)
+            except TONApiUnavailable:
+                await update.message.reply_text(
+                    templates.payment_check_unavailable,
+                    reply_markup=keyboards.main_menu(update.effective_user.id == Config.ADMIN_ID)
+                )
+                return
             
-            if ton_checker.check_transaction(tx_hash):
-                # Здесь должна быть логика проверки суммы и зачисления
+            if found:
+                # Зачислением занимается фоновый опрос кошелька (deposits.py)
                 await update.message.reply_text(
-                    f"{self.emojis['check']} Платеж найден! Ожидайте подтверждения...",
+                    templates.payment_found,
                     reply_markup=keyboards.main_menu(update.effective_user.id == Config.ADMIN_ID)
                 )
             else:
                 await update.message.reply_text(
-                    f"{self.emojis['cross']} Платеж не найден или еще не подтвержден.",
+                    templates.payment_not_found,
                     reply_markup=keyboards.main_menu(update.effective_user.id == Config.ADMIN_ID)
                 )
     
-    async def show_products(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        products = db.get_products()
+    @route(CB_SHOW_PRODUCTS, str)
+    async def show_products(self, update: Update, context: ContextTypes.DEFAULT_TYPE, category=''):
+        await self._show_catalog_page(update, category or None)
+    
+    @route(CB_CATALOG_NEXT, str, int)
+    async def show_next_products(self, update: Update, context: ContextTypes.DEFAULT_TYPE, category='', after_id=None):
+        await self._show_catalog_page(update, category or None, after_id=after_id)
+    
+    @route(CB_CATALOG_PREV, str, int)
+    async def show_previous_products(self, update: Update, context: ContextTypes.DEFAULT_TYPE, category='', before_id=None):
+        await self._show_catalog_page(update, category or None, before_id=before_id)
+    
+    async def _show_catalog_page(self, update, category=None, after_id=None, before_id=None):
+        # Страница и ее клавиатура берутся из кэша, пока товары не менялись
+        products, reply_markup = await catalog.get_page(category, after_id, before_id)
+        if not products and (category or after_id or before_id):
+            # Товары страницы удалили - показываем начало каталога
+            products, reply_markup = await catalog.get_page()
+        
+        query = update.callback_query
+        if query:
+            await query.answer()
         
         if not products:
-            text = f"{self.emojis['cross']} Товары временно отсутствуют!"
+            text = templates.products_empty
+            if query:
+                await query.edit_message_text(text)
+                return
             await update.message.reply_text(
                 text,
                 reply_markup=keyboards.main_menu(update.effective_user.id == Config.ADMIN_ID)
             )
             return
         
-        text = f"""{self.emojis['pizza']} *Наши номера* {self.emojis['pizza']}
-
-👇 Выберите номер для покупки:"""
+        text = templates.products
         
-        await update.message.reply_text(
+        # Листание и "Назад к товарам" приходят callback-запросом - редактируем сообщение
+        send = query.edit_message_text if query else update.message.reply_text
+        await send(
             text,
-            reply_markup=keyboards.products_list(products),
+            reply_markup=reply_markup,
             parse_mode='Markdown'
         )
     
-    async def show_product_detail(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+    @route(CB_PRODUCT, int)
+    async def show_product_detail(self, update: Update, context: ContextTypes.DEFAULT_TYPE, product_id):
         query = update.callback_query
         await query.answer()
         
         try:
-            product_id = int(query.data.split('_')[1])
-            product = db.get_product(product_id)
+            # Карточка отрисовывается один раз на версию каталога
+            text = await catalog.get_product_text(product_id)
             
-            if not product:
-                await query.edit_message_text("❌ Товар не найден!")
+            if not text:
+                await query.edit_message_text(templates.product_not_found)
                 return
             
-            # Генерируем описание товара
-            description = self._generate_product_description(product)
-            
-            text = f"""{self.emojis['phone']} *{product['name']}*
-            
-{description}
-
-💰 *Цена:* {product['price']} TON
-🆔 *ID товара:* #{product['id']}
-📅 *Добавлен:* {product['created_at']}
-
-👇 Выберите действие:"""
-            
             await query.edit_message_text(
                 text,
                 reply_markup=keyboards.product_detail(product_id),
@@ -142,84 +157,30 @@ class BotHandlers:
             )
         except Exception as e:
             print(f"Error in show_product_detail: {e}")
-            await query.edit_message_text("❌ Произошла ошибка!")
+            await query.edit_message_text(templates.error)
     
-    def _generate_product_description(self, product):
-        """Генерирует описание товара на основе названия"""
-        name_lower = product['name'].lower()
-        
-        descriptions = {
-            'fresh': f"""🍕 *Свежий номер Telegram*
-            
-• Полностью новый аккаунт
-• Никогда не использовался
-• Полный доступ ко всем функциям
-• Гарантия 30 дней
-• Моментальная доставка""",
-            
-            'vip': f"""👑 *VIP номер Telegram*
-            
-• Премиум качество
-• Приоритетная поддержка
-• Дополнительные гарантии
-• Быстрая активация
-• Эксклюзивный сервис""",
-            
-            'premium': f"""💎 *Premium номер Telegram*
-            
-• Высшее качество
-• Расширенная гарантия
-• Персональный менеджер
-• Быстрая доставка
-• Полная анонимность""",
-            
-            'standard': f"""📱 *Стандартный номер Telegram*
-            
-• Надежный аккаунт
-• Базовая гарантия
-• Быстрая доставка
-• Полный доступ
-• Экономичный вариант"""
-        }
-        
-        # Ищем ключевые слова в названии
-        for key in descriptions:
-            if key in name_lower:
-                return descriptions[key]
-        
-        # Дефолтное описание
-        return f"""📞 *Номер Telegram*
-        
-• Полный доступ к аккаунту
-• Гарантия работоспособности
-• Быстрая доставка
-• Поддержка 24/7
-• Анонимность и безопасность"""
-    
-    async def buy_product(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+    @route(CB_BUY, int)
+    async def buy_product(self, update: Update, context: ContextTypes.DEFAULT_TYPE, product_id):
         query = update.callback_query
         await query.answer()
         
         try:
-            product_id = int(query.data.split('_')[1])
-            product = db.get_product(product_id)
+            product = await catalog.get_product(product_id)
             user_id = query.from_user.id
             
             if not product:
-                await query.edit_message_text("❌ Товар не найден!")
+                await query.edit_message_text(templates.product_not_found)
                 return
             
             # Создаем заказ
-            order_id = db.create_order(user_id, product_id, product['price'])
-            
-            text = f"""{self.emojis['buy']} *Подтверждение покупки*
+            order_id = await db.create_order(user_id, product_id, product['price_nano'])
             
-📱 Товар: {product['name']}
-💰 Цена: {product['price']} TON
-👤 Покупатель: @{query.from_user.username}
-🆔 Заказ: #{order_id}
-
-👇 Нажмите 'Оплатил' для продолжения:"""
+            text = templates.buy_confirmation(
+                name=product['name'],
+                price=format_ton(product['price_nano']),
+                username=query.from_user.username,
+                order_id=order_id
+            )
             
             await query.edit_message_text(
                 text,
@@ -228,68 +189,55 @@ class BotHandlers:
             )
         except Exception as e:
             print(f"Error in buy_product: {e}")
-            await query.edit_message_text("❌ Произошла ошибка!")
+            await query.edit_message_text(templates.error)
     
-    async def confirm_payment(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+    @route(CB_PAID, int)
+    async def confirm_payment(self, update: Update, context: ContextTypes.DEFAULT_TYPE, order_id):
         query = update.callback_query
         await query.answer()
         
         try:
-            order_id = int(query.data.split('_')[1])
             user = query.from_user
             
             # Получаем информацию о заказе
-            order = db.get_order_by_id(order_id)
+            order = await db.get_order_by_id(order_id)
             
             if not order or order['user_id'] != user.id:
-                await query.edit_message_text("❌ Заказ не найден!")
+                await query.edit_message_text(templates.order_not_found)
                 return
             
-            # Проверяем баланс
-            balance = db.get_balance(user.id)
-            if balance < order['amount']:
-                await query.edit_message_text("❌ Недостаточно средств на балансе!")
-                return
-            
-            # Списываем баланс
-            db.update_balance(user.id, -order['amount'])
+            # Списываем баланс и переводим заказ в обработку одной транзакцией
+            result = await db.pay_order(order_id, user.id, Config.ADMIN_ID)
             
-            # Обновляем статус заказа
-            db.update_order_chat(order_id, user.id, Config.ADMIN_ID)
+            if result == PAYMENT_INSUFFICIENT_FUNDS:
+                await query.edit_message_text(templates.insufficient_funds)
+                return
+            if result == PAYMENT_ALREADY_PAID:
+                await query.edit_message_text(templates.order_already_paid)
+                return
+            if result != PAYMENT_OK:
+                await query.edit_message_text(templates.order_not_found)
+                return
             
             # Создаем чат с админом - отправляем сообщение админу
-            admin_chat_text = f"""📦 *Новая заявка!*
-            
-🆔 Заказ: #{order_id}
-👤 Пользователь: @{user.username} (ID: {user.id})
-📱 Товар: {order['product_name']}
-💰 Сумма: {order['amount']} TON
-⏰ Время: {order['created_at']}
-            
-👇 Обработайте заявку:"""
+            admin_chat_text = templates.new_order(
+                order_id=order_id,
+                username=escape_markdown(str(user.username)),
+                user_id=user.id,
+                product_name=escape_markdown(order['product_name']),
+                amount=format_ton(order['amount_nano']),
+                created_at=order['created_at']
+            )
             
-            # Отправляем сообщение админу
-            try:
-                await context.bot.send_message(
-                    Config.ADMIN_ID,
-                    admin_chat_text,
-                    parse_mode='Markdown',
-                    reply_markup=keyboards.order_actions(order_id)
-                )
-            except Exception as e:
-                print(f"Error sending message to admin: {e}")
+            # Заявка попадает в сводку для админа; крупные - сразу отдельным сообщением
+            admin_digest.add(
+                admin_chat_text,
+                [order_id],
+                urgent=admin_digest.is_urgent(order['amount_nano'])
+            )
             
             # Сообщение пользователю об открытии чата
-            user_text = f"""{self.emojis['check']} *Чат с администратором открыт!*
-            
-Здравствуйте, спасибо за покупку!
-Администратор уже уведомлен о вашем заказе.
-
-📞 *Чат открыт!* Вы можете общаться с администратором прямо здесь.
-
-⏰ Время ожидания ответа не больше 24 часов.
-            
-👇 Администратор скоро свяжется с вами."""
+            user_text = templates.chat_opened
             
             await query.edit_message_text(
                 user_text,
@@ -297,180 +245,145 @@ class BotHandlers:
             )
             
             # Отправляем приветственное сообщение от имени бота в чат
-            welcome_chat_text = f"""👋 *Чат с администратором*
-            
-🆔 Заказ: #{order_id}
-📱 Товар: {order['product_name']}
-💰 Сумма: {order['amount']} TON
-
-Администратор получил уведомление о вашем заказе и скоро свяжется с вами для выдачи номера и кода.
-
-Вы можете задавать вопросы прямо в этом чате."""
+            welcome_chat_text = templates.chat_welcome(
+                order_id=order_id,
+                product_name=order['product_name'],
+                amount=format_ton(order['amount_nano'])
+            )
             
-            await context.bot.send_message(
+            outbox.send(
                 user.id,
                 welcome_chat_text,
+                priority=PRIORITY_TRANSACTIONAL,
                 parse_mode='Markdown'
             )
             
         except Exception as e:
             print(f"Error in confirm_payment: {e}")
-            await query.edit_message_text("❌ Произошла ошибка при обработке платежа!")
+            await query.edit_message_text(templates.payment_error)
+    
+    async def _finish_order_action(self, query, order_id, text):
+        """Показывает результат действия над заявкой.
+        В сводке с несколькими заявками убирает только кнопки обработанной"""
+        buttons = (callback_data(CB_COMPLETE, order_id), callback_data(CB_REJECT, order_id))
+        markup = query.message.reply_markup
+        rows = [
+            row for row in (markup.inline_keyboard if markup else ())
+            if not any(button.callback_data in buttons for button in row)
+        ]
+        other_orders = any(
+            callback_code(button.callback_data) in (CB_COMPLETE, CB_REJECT) for row in rows for button in row
+        )
+        
+        if other_orders:
+            await query.edit_message_reply_markup(InlineKeyboardMarkup(rows))
+        else:
+            await query.edit_message_text(text, reply_markup=keyboards.back_to_admin())
     
-    async def complete_order_admin(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+    @route(CB_COMPLETE, int)
+    async def complete_order_admin(self, update: Update, context: ContextTypes.DEFAULT_TYPE, order_id):
         query = update.callback_query
         await query.answer()
         
         if query.from_user.id != Config.ADMIN_ID:
-            await query.edit_message_text("⛔ Доступ запрещен!")
+            await query.edit_message_text(templates.access_denied)
             return
         
         try:
-            order_id = int(query.data.split('_')[1])
-            order = db.get_order_by_id(order_id)
+            order = await db.get_order_by_id(order_id)
             
             if not order:
-                await query.edit_message_text("❌ Заказ не найден!")
+                await query.edit_message_text(templates.order_not_found)
                 return
             
             # Завершаем заказ
-            db.complete_order(order_id)
+            if not await db.complete_order(order_id):
+                await self._finish_order_action(query, order_id, templates.order_already_processed(order_id))
+                return
             
             # Уведомляем пользователя
-            try:
-                await context.bot.send_message(
-                    order['user_id'],
-                    f"""{Config.EMOJIS['check']} *Ваш заказ выполнен!*
-                    
-🆔 Заказ: #{order_id}
-📱 Товар: {order['product_name']}
-✅ Статус: Выполнен
-
-Спасибо за покупку! Если возникнут вопросы, обращайтесь.""",
-                    parse_mode='Markdown'
-                )
-            except:
-                pass
+            outbox.send(
+                order['user_id'],
+                templates.order_completed(order_id=order_id, product_name=order['product_name']),
+                priority=PRIORITY_TRANSACTIONAL,
+                parse_mode='Markdown'
+            )
             
-            await query.edit_message_text(
-                f"{Config.EMOJIS['check']} Заказ #{order_id} выполнен! Пользователь уведомлен.",
-                reply_markup=keyboards.back_to_admin()
+            await self._finish_order_action(
+                query, order_id, templates.order_completed_admin(order_id)
             )
         except Exception as e:
             print(f"Error in complete_order_admin: {e}")
-            await query.edit_message_text("❌ Ошибка при выполнении заказа!")
+            await query.edit_message_text(templates.complete_error)
     
-    async def reject_order_admin(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+    @route(CB_REJECT, int)
+    async def reject_order_admin(self, update: Update, context: ContextTypes.DEFAULT_TYPE, order_id):
         query = update.callback_query
         await query.answer()
         
         if query.from_user.id != Config.ADMIN_ID:
-            await query.edit_message_text("⛔ Доступ запрещен!")
+            await query.edit_message_text(templates.access_denied)
             return
         
         try:
-            order_id = int(query.data.split('_')[1])
-            order = db.get_order_by_id(order_id)
+            order = await db.get_order_by_id(order_id)
             
             if not order:
-                await query.edit_message_text("❌ Заказ не найден!")
+                await query.edit_message_text(templates.order_not_found)
                 return
             
-            # Возвращаем деньги пользователю
-            db.update_balance(order['user_id'], order['amount'])
-            
-            # Обновляем статус заказа
-            cursor = db.conn.cursor()
-            cursor.execute(
-                "UPDATE orders SET status = 'rejected' WHERE id = ?",
-                (order_id,)
-            )
-            db.conn.commit()
+            # Отклоняем заказ и возвращаем деньги пользователю
+            refund = await db.reject_order(order_id)
+            if refund is None:
+                await self._finish_order_action(query, order_id, templates.order_already_processed(order_id))
+                return
             
             # Уведомляем пользователя
-            try:
-                await context.bot.send_message(
-                    order['user_id'],
-                    f"""{Config.EMOJIS['cross']} *Ваш заказ отклонен*
-                    
-🆔 Заказ: #{order_id}
-📱 Товар: {order['product_name']}
-💰 Возвращено: {order['amount']} TON
-❌ Статус: Отклонен
-
-Деньги возвращены на ваш баланс.""",
-                    parse_mode='Markdown'
-                )
-            except:
-                pass
+            outbox.send(
+                order['user_id'],
+                templates.order_rejected(
+                    order_id=order_id,
+                    product_name=order['product_name'],
+                    refund=format_ton(refund)
+                ),
+                priority=PRIORITY_TRANSACTIONAL,
+                parse_mode='Markdown'
+            )
             
-            await query.edit_message_text(
-                f"{Config.EMOJIS['cross']} Заказ #{order_id} отклонен! Деньги возвращены пользователю.",
-                reply_markup=keyboards.back_to_admin()
+            await self._finish_order_action(
+                query, order_id, templates.order_rejected_admin(order_id)
             )
         except Exception as e:
             print(f"Error in reject_order_admin: {e}")
-            await query.edit_message_text("❌ Ошибка при отклонении заказа!")
+            await query.edit_message_text(templates.reject_error)
     
-    async def handle_callback(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+    @route(CB_MAIN_MENU)
+    async def main_menu(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         query = update.callback_query
         await query.answer()
         
-        data = query.data
+        # Отправляем новое сообщение с главным меню
+        user = query.from_user
+        await db.ensure_user(user.id, user.username)
         
-        if data == "main_menu":
-            # Отправляем новое сообщение с главным меню
-            user = query.from_user
-            db.get_or_create_user(user.id, user.username)
-            
-            welcome_text = f"""{self.emojis['pizza']} *Главное меню* {self.emojis['pizza']}
-            
-👇 Выберите действие:"""
-            
-            is_admin = user.id == Config.ADMIN_ID
-            await query.edit_message_text(
-                welcome_text,
-                reply_markup=keyboards.main_menu(is_admin),
-                parse_mode='Markdown'
-            )
-            
-        elif data == "admin_panel":
-            from admin import admin_handler
-            await admin_handler.admin_panel(update, context)
-        elif data == "view_orders":
-            from admin import admin_handler
-            await admin_handler.view_orders(update, context)
-        elif data == "add_product":
-            from admin import admin_handler
-            await admin_handler.start_add_product(update, context)
-        elif data == "give_balance":
-            from admin import admin_handler
-            await admin_handler.start_give_balance(update, context)
-        elif data == "show_products":
-            await self.show_products(update, context)
-        elif data == "back_to_products":
-            await self.show_products(update, context)
-        elif data.startswith("product_"):
-            await self.show_product_detail(update, context)
-        elif data.startswith("buy_"):
-            await self.buy_product(update, context)
-        elif data.startswith("paid_"):
-            await self.confirm_payment(update, context)
-        elif data.startswith("complete_"):
-            await self.complete_order_admin(update, context)
-        elif data.startswith("reject_"):
-            await self.reject_order_admin(update, context)
-        elif data == "cancel_payment":
-            await query.edit_message_text(
-                "❌ Покупка отменена.",
-                reply_markup=keyboards.main_menu(query.from_user.id == Config.ADMIN_ID)
-            )
-        elif data == "cancel_add":
-            # Обработка отмены добавления товара
-            await query.edit_message_text(
-                "❌ Добавление товара отменено.",
-                reply_markup=keyboards.admin_panel()
-            )
+        welcome_text = templates.main_menu
+        
+        is_admin = user.id == Config.ADMIN_ID
+        await query.edit_message_text(
+            welcome_text,
+            reply_markup=keyboards.main_menu(is_admin),
+            parse_mode='Markdown'
+        )
+    
+    @route(CB_CANCEL_PAYMENT)
+    async def cancel_payment(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        query = update.callback_query
+        await query.answer()
+        
+        await query.edit_message_text(
+            templates.purchase_cancelled,
+            reply_markup=keyboards.main_menu(query.from_user.id == Config.ADMIN_ID)
+        )
     
     async def handle_message(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         user_id = update.effective_user.id
@@ -495,34 +408,26 @@ class BotHandlers:
             await self.check_payment(update, context)
         else:
             # Проверяем, есть ли у пользователя активные чаты с админом
-            active_chats = db.get_user_chats(user_id)
+            active_chats = await db.get_user_chats(user_id)
             if active_chats:
-                # Пересылаем сообщение админу
-                for chat in active_chats:
-                    try:
-                        await context.bot.send_message(
-                            Config.ADMIN_ID,
-                            f"""📨 *Сообщение от пользователя*
-                            
-👤 Пользователь: @{update.effective_user.username} (ID: {user_id})
-🆔 Заказ: #{chat['id']}
-📱 Товар: {chat['product_name']}
-💬 Сообщение: {text}""",
-                            parse_mode='Markdown'
-                        )
-                        await update.message.reply_text(
-                            f"{Config.EMOJIS['check']} Сообщение отправлено администратору!",
-                            reply_markup=keyboards.main_menu(is_admin)
-                        )
-                    except Exception as e:
-                        print(f"Error forwarding message to admin: {e}")
-                        await update.message.reply_text(
-                            "❌ Ошибка при отправке сообщения.",
-                            reply_markup=keyboards.main_menu(is_admin)
-                        )
+                # Одно событие в сводку админа на сообщение, со всеми активными заказами
+                orders_text = "\n".join(
+                    templates.user_message_order(chat['id'], escape_markdown(chat['product_name'])) for chat in active_chats
+                )
+                admin_digest.add(templates.user_message(
+                    username=escape_markdown(str(update.effective_user.username)),
+                    user_id=user_id,
+                    orders=orders_text,
+                    text=escape_markdown(text)
+                ))
+                
+                await update.message.reply_text(
+                    templates.message_sent,
+                    reply_markup=keyboards.main_menu(is_admin)
+                )
             else:
                 await update.message.reply_text(
-                    "Используйте кнопки меню для навигации.",
+                    templates.use_menu,
                     reply_markup=keyboards.main_menu(is_admin)
                 )
     
@@ -538,7 +443,6 @@ class BotHandlers:
         elif text == f"{Config.EMOJIS['phone']} Номера":
             await self.show_products(update, context)
         elif text == f"{Config.EMOJIS['admin']} Админ панель":
-            from admin import admin_handler
             await admin_handler.admin_panel(update, context)
         elif text.startswith('check_'):
             await self.check_payment(update, context)
@@ -551,44 +455,40 @@ class BotHandlers:
                     message = parts[2]
                     
                     # Отправляем сообщение пользователю
-                    await context.bot.send_message(
+                    outbox.send(
                         user_id,
-                        f"""📨 *Ответ от администратора*
-                        
-💬 {message}""",
+                        templates.admin_reply(message=message),
                         parse_mode='Markdown'
                     )
                     
                     await update.message.reply_text(
-                        f"{Config.EMOJIS['check']} Ответ отправлен пользователю!",
+                        templates.reply_sent,
                         reply_markup=keyboards.main_menu(True)
                     )
                 else:
                     await update.message.reply_text(
-                        "❌ Неверный формат. Используйте: /reply <user_id> <сообщение>",
+                        templates.reply_usage,
                         reply_markup=keyboards.main_menu(True)
                     )
             except Exception as e:
                 print(f"Error sending reply: {e}")
                 await update.message.reply_text(
-                    "❌ Ошибка при отправке ответа.",
+                    templates.reply_error,
                     reply_markup=keyboards.main_menu(True)
                 )
         elif text == "/chats":
             # Показать активные чаты
-            active_chats = db.get_active_chats()
+            active_chats = await db.get_active_chats()
             if not active_chats:
                 await update.message.reply_text(
-                    "📭 Нет активных чатов.",
+                    templates.no_chats,
                     reply_markup=keyboards.main_menu(True)
                 )
                 return
             
-            text_response = f"{Config.EMOJIS['clock']} *Активные чаты:*\n\n"
-            for chat in active_chats:
-                text_response += f"""👤 Пользователь: @{chat['username']} (ID: {chat['user_id']})
-💬 Чат ID: {chat['chat_id']}
-━━━━━━━━━━━━━━━━━━━━\n"""
+            text_response = templates.chats_header + "".join(
+                templates.active_chat(chat['username'], chat['user_id'], chat['chat_id']) for chat in active_chats
+            )
             
             await update.message.reply_text(
                 text_response,
@@ -597,19 +497,16 @@ class BotHandlers:
             )
         else:
             # Проверяем, есть ли у админа активные чаты
-            active_chats = db.get_active_chats()
+            active_chats = await db.get_active_chats()
             if active_chats and not text.startswith('/'):
                 # Если есть активные чаты и это не команда, предлагаем использовать /reply
                 await update.message.reply_text(
-                    "Для ответа пользователю используйте команду:\n"
-                    "/reply <user_id> <сообщение>\n\n"
-                    "Для просмотра активных чатов:\n"
-                    "/chats",
+                    templates.admin_help,
                     reply_markup=keyboards.main_menu(True)
                 )
             else:
                 await update.message.reply_text(
-                    "Используйте кнопки меню для навигации.",
+                    templates.use_menu,
                     reply_markup=keyboards.main_menu(True)
                 )
 
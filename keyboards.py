@@ -1,11 +1,126 @@
+import json
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup, ReplyKeyboardMarkup, KeyboardButton
 from config import Config
+from cache import LRUCache, MISSING
+from money import format_ton
+from router import (
+    callback_data, CB_MAIN_MENU, CB_ADMIN_PANEL, CB_VIEW_ORDERS, CB_ADD_PRODUCT, CB_CANCEL_ADD,
+    CB_CONFIRM_ADD, CB_GIVE_BALANCE, CB_CANCEL_GIVE_BALANCE, CB_BROADCAST, CB_CONFIRM_BROADCAST,
+    CB_CANCEL_BROADCAST, CB_SHOW_PRODUCTS, CB_CATALOG_NEXT, CB_CATALOG_PREV, CB_PRODUCT, CB_BUY,
+    CB_PAID, CB_CANCEL_PAYMENT, CB_COMPLETE, CB_REJECT
+)
+
+# Подписи кнопок категорий каталога (см. database.PRODUCT_CATEGORIES)
+CATEGORY_LABELS = {
+    'fresh': "🍕 Свежие",
+    'vip': "👑 VIP",
+    'premium': "💎 Premium",
+    'standard': "📱 Стандарт"
+}
+
+class SerializedMarkup:
+    """Клавиатура, сериализованная один раз при создании.
+    
+    Разметки Telegram после создания неизменяемы, поэтому to_dict() и
+    to_json() отдают заранее построенные dict и JSON вместо обхода всех
+    кнопок при каждой отправке. Полученный dict общий - менять его нельзя."""
+    
+    __slots__ = ()
+    
+    def _serialize(self):
+        self._dict = super().to_dict()
+        self._json = json.dumps(self._dict)
+    
+    def to_dict(self, recursive=True):
+        if not recursive:
+            return super().to_dict(recursive=False)
+        return self._dict
+    
+    def to_json(self):
+        return self._json
+
+class FrozenInlineKeyboardMarkup(SerializedMarkup, InlineKeyboardMarkup):
+    __slots__ = ('_dict', '_json')
+    
+    def __init__(self, inline_keyboard, **kwargs):
+        super().__init__(inline_keyboard, **kwargs)
+        self._serialize()
+
+class FrozenReplyKeyboardMarkup(SerializedMarkup, ReplyKeyboardMarkup):
+    __slots__ = ('_dict', '_json')
+    
+    def __init__(self, keyboard, **kwargs):
+        super().__init__(keyboard, **kwargs)
+        self._serialize()
 
 class Keyboards:
-    def __init__(self):
+    """Клавиатуры бота.
+    
+    Постоянные меню строятся один раз и отдаются всем как общие
+    неизменяемые объекты. Клавиатуры товара и заказа хранятся в LRU-кэше
+    по (вид, id). Одноразовые клавиатуры (страницы заявок, сводки) только
+    сериализуются заранее."""
+    
+    def __init__(self, cache_size=1000):
         self.emojis = Config.EMOJIS
+        self.cache = LRUCache(cache_size)
+        
+        self.main_menus = {False: self._build_main_menu(False), True: self._build_main_menu(True)}
+        self.static = {
+            'admin_panel': self._build_admin_panel(),
+            'back_to_admin': self._build_back_to_admin(),
+            'back_to_products': self._build_back_to_products(),
+            'confirm_product_add': self._build_confirm_product_add(),
+            'cancel_add': self._build_cancel_add(),
+            'confirm_broadcast': self._build_confirm_broadcast(),
+            'cancel_broadcast': self._build_cancel_broadcast(),
+            'cancel_give_balance': self._build_cancel_give_balance()
+        }
+    
+    def _cached(self, key, build, *args):
+        markup = self.cache.get(key)
+        if markup is MISSING:
+            markup = build(*args)
+            self.cache.put(key, markup)
+        return markup
     
     def main_menu(self, is_admin=False):
+        return self.main_menus[bool(is_admin)]
+    
+    def admin_panel(self):
+        return self.static['admin_panel']
+    
+    def back_to_admin(self):
+        return self.static['back_to_admin']
+    
+    def back_to_products(self):
+        return self.static['back_to_products']
+    
+    def confirm_product_add(self):
+        return self.static['confirm_product_add']
+    
+    def cancel_add(self):
+        return self.static['cancel_add']
+    
+    def confirm_broadcast(self):
+        return self.static['confirm_broadcast']
+    
+    def cancel_broadcast(self):
+        return self.static['cancel_broadcast']
+    
+    def cancel_give_balance(self):
+        return self.static['cancel_give_balance']
+    
+    def product_detail(self, product_id):
+        return self._cached(('product_detail', product_id), self._build_product_detail, product_id)
+    
+    def payment_confirmation(self, order_id):
+        return self._cached(('payment_confirmation', order_id), self._build_payment_confirmation, order_id)
+    
+    def order_actions(self, order_id):
+        return self._cached(('order_actions', order_id), self._build_order_actions, order_id)
+    
+    def _build_main_menu(self, is_admin):
         keyboard = [
             [KeyboardButton(f"{self.emojis['balance']} Баланс")],
             [KeyboardButton(f"{self.emojis['money']} Пополнить баланс")],
@@ -15,73 +130,135 @@ class Keyboards:
         if is_admin:
             keyboard.append([KeyboardButton(f"{self.emojis['admin']} Админ панель")])
         
-        return ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
+        return FrozenReplyKeyboardMarkup(keyboard, resize_keyboard=True)
     
-    def admin_panel(self):
+    def _build_admin_panel(self):
         keyboard = [
-            [InlineKeyboardButton(f"{self.emojis['buy']} Добавить товар", callback_data="add_product")],
-            [InlineKeyboardButton(f"{self.emojis['clock']} Заявки", callback_data="view_orders")],
-            [InlineKeyboardButton(f"{self.emojis['money']} Выдать баланс", callback_data="give_balance")],
-            [InlineKeyboardButton(f"{self.emojis['check']} Главное меню", callback_data="main_menu")]
+            [InlineKeyboardButton(f"{self.emojis['buy']} Добавить товар", callback_data=CB_ADD_PRODUCT)],
+            [InlineKeyboardButton(f"{self.emojis['clock']} Заявки", callback_data=CB_VIEW_ORDERS)],
+            [InlineKeyboardButton(f"{self.emojis['money']} Выдать баланс", callback_data=CB_GIVE_BALANCE)],
+            [InlineKeyboardButton("📣 Рассылка", callback_data=CB_BROADCAST)],
+            [InlineKeyboardButton(f"{self.emojis['check']} Главное меню", callback_data=CB_MAIN_MENU)]
         ]
-        return InlineKeyboardMarkup(keyboard)
+        return FrozenInlineKeyboardMarkup(keyboard)
     
-    def products_list(self, products):
+    def catalog_page(self, products, category=None, has_newer=False, has_older=False, categories=()):
+        """Страница каталога: товары, кнопки листания с курсором (id крайнего товара) и категории"""
         keyboard = []
         for product in products:
-            button_text = f"{self.emojis['phone']} {product['name']} - {product['price']} TON"
-            keyboard.append([InlineKeyboardButton(button_text, callback_data=f"product_{product['id']}")])
+            button_text = f"{self.emojis['phone']} {product['name']} - {format_ton(product['price_nano'])} TON"
+            keyboard.append([InlineKeyboardButton(button_text, callback_data=callback_data(CB_PRODUCT, product['id']))])
         
-        keyboard.append([InlineKeyboardButton(f"{self.emojis['check']} Назад", callback_data="main_menu")])
-        return InlineKeyboardMarkup(keyboard)
+        category_code = category or ''
+        navigation = []
+        if has_newer:
+            navigation.append(InlineKeyboardButton(
+                "◀️ Предыдущие", callback_data=callback_data(CB_CATALOG_PREV, category_code, products[0]['id'])
+            ))
+        if has_older:
+            navigation.append(InlineKeyboardButton(
+                "Следующие ▶️", callback_data=callback_data(CB_CATALOG_NEXT, category_code, products[-1]['id'])
+            ))
+        if navigation:
+            keyboard.append(navigation)
+        
+        if categories:
+            filters = [
+                InlineKeyboardButton(
+                    f"• {CATEGORY_LABELS[name]}" if name == category else CATEGORY_LABELS[name],
+                    callback_data=callback_data(CB_SHOW_PRODUCTS, name)
+                )
+                for name in categories
+            ]
+            keyboard.extend(filters[i:i + 2] for i in range(0, len(filters), 2))
+            if category:
+                keyboard.append([InlineKeyboardButton("📋 Все номера", callback_data=CB_SHOW_PRODUCTS)])
+        
+        keyboard.append([InlineKeyboardButton(f"{self.emojis['check']} Назад", callback_data=CB_MAIN_MENU)])
+        return FrozenInlineKeyboardMarkup(keyboard)
     
-    def product_detail(self, product_id):
+    def _build_product_detail(self, product_id):
         keyboard = [
             [
-                InlineKeyboardButton(f"{self.emojis['buy']} Купить", callback_data=f"buy_{product_id}"),
-                InlineKeyboardButton(f"{self.emojis['cross']} Назад", callback_data="back_to_products")
+                InlineKeyboardButton(f"{self.emojis['buy']} Купить", callback_data=callback_data(CB_BUY, product_id)),
+                InlineKeyboardButton(f"{self.emojis['cross']} Назад", callback_data=CB_SHOW_PRODUCTS)
             ]
         ]
-        return InlineKeyboardMarkup(keyboard)
+        return FrozenInlineKeyboardMarkup(keyboard)
     
-    def payment_confirmation(self, order_id):
+    def _build_payment_confirmation(self, order_id):
         keyboard = [
             [
-                InlineKeyboardButton(f"{self.emojis['check']} Оплатил", callback_data=f"paid_{order_id}"),
-                InlineKeyboardButton(f"{self.emojis['cross']} Отмена", callback_data="cancel_payment")
+                InlineKeyboardButton(f"{self.emojis['check']} Оплатил", callback_data=callback_data(CB_PAID, order_id)),
+                InlineKeyboardButton(f"{self.emojis['cross']} Отмена", callback_data=CB_CANCEL_PAYMENT)
             ]
         ]
-        return InlineKeyboardMarkup(keyboard)
+        return FrozenInlineKeyboardMarkup(keyboard)
     
-    def order_actions(self, order_id):
+    def _build_order_actions(self, order_id):
         keyboard = [
             [
-                InlineKeyboardButton(f"{self.emojis['check']} Выполнено", callback_data=f"complete_{order_id}"),
-                InlineKeyboardButton(f"{self.emojis['cross']} Отклонить", callback_data=f"reject_{order_id}")
+                InlineKeyboardButton(f"{self.emojis['check']} Выполнено", callback_data=callback_data(CB_COMPLETE, order_id)),
+                InlineKeyboardButton(f"{self.emojis['cross']} Отклонить", callback_data=callback_data(CB_REJECT, order_id))
             ],
-            [InlineKeyboardButton(f"{self.emojis['check']} Назад в админку", callback_data="admin_panel")]
+            [InlineKeyboardButton(f"{self.emojis['check']} Назад в админку", callback_data=CB_ADMIN_PANEL)]
         ]
-        return InlineKeyboardMarkup(keyboard)
+        return FrozenInlineKeyboardMarkup(keyboard)
     
-    def back_to_admin(self):
-        keyboard = [[InlineKeyboardButton(f"{self.emojis['check']} Назад в админку", callback_data="admin_panel")]]
-        return InlineKeyboardMarkup(keyboard)
+    def digest_actions(self, order_ids):
+        keyboard = [
+            [
+                InlineKeyboardButton(f"{self.emojis['check']} #{order_id}", callback_data=callback_data(CB_COMPLETE, order_id)),
+                InlineKeyboardButton(f"{self.emojis['cross']} #{order_id}", callback_data=callback_data(CB_REJECT, order_id))
+            ]
+            for order_id in order_ids
+        ]
+        keyboard.append([InlineKeyboardButton(f"{self.emojis['check']} Назад в админку", callback_data=CB_ADMIN_PANEL)])
+        return FrozenInlineKeyboardMarkup(keyboard)
     
-    def back_to_products(self):
-        keyboard = [[InlineKeyboardButton(f"{self.emojis['check']} Назад к товарам", callback_data="show_products")]]
-        return InlineKeyboardMarkup(keyboard)
+    def orders_page(self, next_token=None):
+        keyboard = []
+        if next_token:
+            keyboard.append([InlineKeyboardButton("▶️ Дальше", callback_data=callback_data(CB_VIEW_ORDERS, next_token))])
+        keyboard.append([InlineKeyboardButton(f"{self.emojis['check']} Назад в админку", callback_data=CB_ADMIN_PANEL)])
+        return FrozenInlineKeyboardMarkup(keyboard)
     
-    def confirm_product_add(self):
+    def _build_back_to_admin(self):
+        keyboard = [[InlineKeyboardButton(f"{self.emojis['check']} Назад в админку", callback_data=CB_ADMIN_PANEL)]]
+        return FrozenInlineKeyboardMarkup(keyboard)
+    
+    def _build_back_to_products(self):
+        keyboard = [[InlineKeyboardButton(f"{self.emojis['check']} Назад к товарам", callback_data=CB_SHOW_PRODUCTS)]]
+        return FrozenInlineKeyboardMarkup(keyboard)
+    
+    def _build_confirm_product_add(self):
         keyboard = [
             [
-                InlineKeyboardButton(f"{self.emojis['check']} Да", callback_data="confirm_add"),
-                InlineKeyboardButton(f"{self.emojis['cross']} Нет", callback_data="cancel_add")
+                InlineKeyboardButton(f"{self.emojis['check']} Да", callback_data=CB_CONFIRM_ADD),
+                InlineKeyboardButton(f"{self.emojis['cross']} Нет", callback_data=CB_CANCEL_ADD)
             ]
         ]
-        return InlineKeyboardMarkup(keyboard)
+        return FrozenInlineKeyboardMarkup(keyboard)
     
-    def cancel_give_balance(self):
-        keyboard = [[InlineKeyboardButton(f"{self.emojis['cross']} Отмена", callback_data="admin_panel")]]
-        return InlineKeyboardMarkup(keyboard)
+    def _build_confirm_broadcast(self):
+        keyboard = [
+            [
+                InlineKeyboardButton(f"{self.emojis['check']} Отправить", callback_data=CB_CONFIRM_BROADCAST),
+                InlineKeyboardButton(f"{self.emojis['cross']} Отмена", callback_data=CB_CANCEL_BROADCAST)
+            ]
+        ]
+        return FrozenInlineKeyboardMarkup(keyboard)
+    
+    def _build_cancel_add(self):
+        keyboard = [[InlineKeyboardButton("❌ Отмена", callback_data=CB_CANCEL_ADD)]]
+        return FrozenInlineKeyboardMarkup(keyboard)
+    
+    def _build_cancel_broadcast(self):
+        keyboard = [[InlineKeyboardButton(f"{self.emojis['cross']} Отмена", callback_data=CB_CANCEL_BROADCAST)]]
+        return FrozenInlineKeyboardMarkup(keyboard)
+    
+    def _build_cancel_give_balance(self):
+        keyboard = [[InlineKeyboardButton(f"{self.emojis['cross']} Отмена", callback_data=CB_CANCEL_GIVE_BALANCE)]]
+        return FrozenInlineKeyboardMarkup(keyboard)
 
-keyboards = Keyboards()
\ No newline at end of file
+keyboards = Keyboards(cache_size=Config.KEYBOARD_CACHE_SIZE)
\ No newline at end of file
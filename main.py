@@ -1,9 +1,23 @@
+import asyncio
 import logging
+import secrets
+import sys
 from telegram import Update
-from telegram.ext import Application, CommandHandler, MessageHandler, filters, CallbackQueryHandler, ConversationHandler
+from telegram.ext import Application, CommandHandler, MessageHandler, filters, CallbackQueryHandler, ConversationHandler, ContextTypes
 from config import Config
+from database import db
+from utils import ton_checker
+from deposits import deposit_watcher
+from processor import update_processor
+from outbox import outbox
+from broadcast import broadcaster
+from digest import admin_digest
 from handlers import bot_handlers
-from admin import admin_handler, PRODUCT_NAME, PRODUCT_PRICE, GIVE_BALANCE_USER, GIVE_BALANCE_AMOUNT
+from router import (
+    router, CB_ADD_PRODUCT, CB_CANCEL_ADD, CB_GIVE_BALANCE, CB_CANCEL_GIVE_BALANCE,
+    CB_BROADCAST, CB_CONFIRM_BROADCAST, CB_CANCEL_BROADCAST
+)
+from admin import admin_handler, PRODUCT_NAME, PRODUCT_PRICE, GIVE_BALANCE_USER, GIVE_BALANCE_AMOUNT, BROADCAST_TEXT, BROADCAST_CONFIRM
 
 # Настройка логирования
 logging.basicConfig(
@@ -12,54 +26,139 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Бот обрабатывает только сообщения и нажатия кнопок - остальные обновления
+# Telegram не присылает вовсе
+ALLOWED_UPDATES = [Update.MESSAGE, Update.CALLBACK_QUERY]
+
+def config_error():
+    """Описание ошибки в настройках режима запуска, либо None"""
+    if Config.RUN_MODE not in ('polling', 'webhook'):
+        return f"RUN_MODE должен быть polling или webhook, задан: {Config.RUN_MODE!r}"
+    if Config.RUN_MODE == 'webhook':
+        if not Config.WEBHOOK_URL:
+            return "Для RUN_MODE=webhook задайте WEBHOOK_URL - публичный https-адрес бота"
+        if not Config.WEBHOOK_URL.startswith('https://'):
+            return f"Telegram принимает только https-адрес webhook, задан WEBHOOK_URL={Config.WEBHOOK_URL!r}"
+    return None
+
+def webhook_settings():
+    """Параметры webhook-сервера (Updater.start_webhook / run_webhook)"""
+    # Telegram подписывает каждый запрос секретом, чужие запросы сервер отклоняет
+    return {
+        'listen': Config.WEBHOOK_LISTEN,
+        'port': Config.WEBHOOK_PORT,
+        'url_path': Config.WEBHOOK_PATH,
+        'webhook_url': f"{Config.WEBHOOK_URL.rstrip('/')}/{Config.WEBHOOK_PATH}",
+        'secret_token': Config.WEBHOOK_SECRET or secrets.token_urlsafe(32),
+        'max_connections': Config.WEBHOOK_MAX_CONNECTIONS,
+        'allowed_updates': ALLOWED_UPDATES
+    }
+
+async def recheck_counters(context: ContextTypes.DEFAULT_TYPE):
+    # Сверяем счетчики статистики с таблицами и исправляем расхождения
+    mismatches = await db.verify_counters()
+    if mismatches:
+        logger.warning("Счетчики статистики исправлены: %s", mismatches)
+
+async def snapshot_ledger(context: ContextTypes.DEFAULT_TYPE):
+    # Снимок балансов - отдельная запись в очереди, а не часть покупки, пересекшей порог
+    snapshot_id = await db.take_snapshot()
+    if snapshot_id:
+        logger.info("Снимок балансов #%s сохранен", snapshot_id)
+
+async def on_startup(application: Application):
+    # Очередь исходящих сообщений работает в том же event loop, что и бот
+    outbox.start(application.bot)
+    # Продолжаем рассылки, прерванные остановкой бота
+    await broadcaster.start(application.bot)
+
+async def on_stop(application: Application):
+    # Останавливаем рассылки (продолжатся после запуска) и досылаем
+    # исходящие сообщения, пока бот еще может отправлять запросы
+    await broadcaster.stop()
+    admin_digest.flush()
+    await outbox.stop()
+
+async def on_shutdown(application: Application):
+    # Закрываем соединения с TON API и дожидаемся записи всех изменений из очереди
+    await ton_checker.close()
+    await asyncio.to_thread(db.close)
+
 def main():
-    # Создаем приложение
-    application = Application.builder().token(Config.BOT_TOKEN).build()
+    error = config_error()
+    if error:
+        print(f"{Config.EMOJIS['cross']} Ошибка настройки: {error}")
+        sys.exit(1)
+    
+    # Создаем приложение: обновления разных пользователей обрабатываются параллельно
+    application = (
+        Application.builder()
+        .token(Config.BOT_TOKEN)
+        .concurrent_updates(update_processor)
+        .post_init(on_startup)
+        .post_stop(on_stop)
+        .post_shutdown(on_shutdown)
+        .build()
+    )
     
     # Conversation handler для добавления товара
     add_product_handler = ConversationHandler(
-        entry_points=[CallbackQueryHandler(admin_handler.start_add_product, pattern='^add_product$')],
+        entry_points=[CallbackQueryHandler(admin_handler.start_add_product, pattern=router.pattern(CB_ADD_PRODUCT))],
         states={
             PRODUCT_NAME: [
                 MessageHandler(filters.TEXT & ~filters.COMMAND, admin_handler.get_product_name),
-                CallbackQueryHandler(admin_handler.cancel_add, pattern='^cancel_add$')
+                CallbackQueryHandler(admin_handler.cancel_add, pattern=router.pattern(CB_CANCEL_ADD))
             ],
             PRODUCT_PRICE: [
                 MessageHandler(filters.TEXT & ~filters.COMMAND, admin_handler.get_product_price),
-                CallbackQueryHandler(admin_handler.cancel_add, pattern='^cancel_add$')
+                CallbackQueryHandler(admin_handler.cancel_add, pattern=router.pattern(CB_CANCEL_ADD))
             ],
         },
-        fallbacks=[CallbackQueryHandler(admin_handler.cancel_add, pattern='^cancel_add$')],
+        fallbacks=[CallbackQueryHandler(admin_handler.cancel_add, pattern=router.pattern(CB_CANCEL_ADD))],
     )
     
     # Conversation handler для выдачи баланса
     give_balance_handler = ConversationHandler(
-        entry_points=[CallbackQueryHandler(admin_handler.start_give_balance, pattern='^give_balance$')],
+        entry_points=[CallbackQueryHandler(admin_handler.start_give_balance, pattern=router.pattern(CB_GIVE_BALANCE))],
         states={
             GIVE_BALANCE_USER: [
                 MessageHandler(filters.TEXT & ~filters.COMMAND, admin_handler.get_user_for_balance),
-                CallbackQueryHandler(admin_handler.cancel_give_balance, pattern='^cancel_add$')
+                CallbackQueryHandler(admin_handler.cancel_give_balance, pattern=router.pattern(CB_CANCEL_GIVE_BALANCE))
             ],
             GIVE_BALANCE_AMOUNT: [
                 MessageHandler(filters.TEXT & ~filters.COMMAND, admin_handler.get_amount_for_balance),
-                CallbackQueryHandler(admin_handler.cancel_give_balance, pattern='^cancel_add$')
+                CallbackQueryHandler(admin_handler.cancel_give_balance, pattern=router.pattern(CB_CANCEL_GIVE_BALANCE))
             ],
         },
-        fallbacks=[CallbackQueryHandler(admin_handler.cancel_give_balance, pattern='^cancel_add$')],
+        fallbacks=[CallbackQueryHandler(admin_handler.cancel_give_balance, pattern=router.pattern(CB_CANCEL_GIVE_BALANCE))],
+    )
+    
+    # Conversation handler для рассылки
+    broadcast_handler = ConversationHandler(
+        entry_points=[CallbackQueryHandler(admin_handler.start_broadcast, pattern=router.pattern(CB_BROADCAST))],
+        states={
+            BROADCAST_TEXT: [
+                MessageHandler(filters.TEXT & ~filters.COMMAND, admin_handler.get_broadcast_text),
+                CallbackQueryHandler(admin_handler.cancel_broadcast, pattern=router.pattern(CB_CANCEL_BROADCAST))
+            ],
+            BROADCAST_CONFIRM: [
+                CallbackQueryHandler(admin_handler.confirm_broadcast, pattern=router.pattern(CB_CONFIRM_BROADCAST)),
+                CallbackQueryHandler(admin_handler.cancel_broadcast, pattern=router.pattern(CB_CANCEL_BROADCAST))
+            ],
+        },
+        fallbacks=[CallbackQueryHandler(admin_handler.cancel_broadcast, pattern=router.pattern(CB_CANCEL_BROADCAST))],
     )
     
     # Добавляем обработчики в правильном порядке
     application.add_handler(CommandHandler("start", bot_handlers.start))
     application.add_handler(add_product_handler)
     application.add_handler(give_balance_handler)
+    application.add_handler(broadcast_handler)
     
-    # Обработчики callback-запросов
-    application.add_handler(CallbackQueryHandler(bot_handlers.show_product_detail, pattern='^product_'))
-    application.add_handler(CallbackQueryHandler(bot_handlers.buy_product, pattern='^buy_'))
-    application.add_handler(CallbackQueryHandler(bot_handlers.confirm_payment, pattern='^paid_'))
-    application.add_handler(CallbackQueryHandler(bot_handlers.complete_order_admin, pattern='^complete_'))
-    application.add_handler(CallbackQueryHandler(bot_handlers.reject_order_admin, pattern='^reject_'))
-    application.add_handler(CallbackQueryHandler(bot_handlers.handle_callback))
+    # Остальные нажатия кнопок: обработчик выбирается по коду в callback_data
+    router.include(bot_handlers)
+    router.include(admin_handler)
+    application.add_handler(CallbackQueryHandler(router.dispatch))
     
     # Обработчик текстовых сообщений
     application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, bot_handlers.handle_message))
@@ -68,12 +167,36 @@ def main():
     application.add_handler(CommandHandler("chats", bot_handlers.handle_admin_message))
     application.add_handler(CommandHandler("reply", bot_handlers.handle_admin_message))
     
+    # Периодическая сверка счетчиков статистики
+    application.job_queue.run_repeating(
+        recheck_counters,
+        interval=Config.STATS_RECHECK_INTERVAL,
+        first=Config.STATS_RECHECK_INTERVAL
+    )
+    
+    # Снимки балансов для сверки журнала
+    application.job_queue.run_repeating(
+        snapshot_ledger,
+        interval=Config.LEDGER_SNAPSHOT_CHECK_INTERVAL,
+        first=Config.LEDGER_SNAPSHOT_CHECK_INTERVAL
+    )
+    
+    # Опрос кошелька и автоматическое зачисление пополнений
+    application.job_queue.run_repeating(
+        deposit_watcher.poll,
+        interval=Config.DEPOSIT_POLL_INTERVAL,
+        first=1
+    )
+    
     # Запуск бота
     print(f"{Config.EMOJIS['pizza']} Pizza Numbers Bot запущен!")
     print(f"{Config.EMOJIS['admin']} Админ ID: {Config.ADMIN_ID}")
     print(f"{Config.EMOJIS['ton']} TON кошелек: {Config.WALLET_TON}")
     
-    application.run_polling(allowed_updates=Update.ALL_TYPES)
+    if Config.RUN_MODE == 'webhook':
+        application.run_webhook(**webhook_settings())
+    else:
+        application.run_polling(allowed_updates=ALLOWED_UPDATES)
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
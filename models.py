@@ -0,0 +1,88 @@
+from collections import namedtuple
+from functools import lru_cache, partial
+
+class Record:
+    """Базовый класс записей из базы.
+
+    Конкретный класс строится по набору колонок запроса (см. record_class):
+    это namedtuple со слотами, поэтому строка не копируется в dict, а поля
+    доступны и как атрибуты (order.amount), и по ключу (order['amount'])."""
+
+    __slots__ = ()
+    _index = {}
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            try:
+                key = self._index[key]
+            except KeyError:
+                raise KeyError(key) from None
+        return tuple.__getitem__(self, key)
+
+    def __contains__(self, key):
+        return key in self._index
+
+    def get(self, key, default=None):
+        index = self._index.get(key)
+        return default if index is None else tuple.__getitem__(self, index)
+
+    def keys(self):
+        return self._index.keys()
+
+    def items(self):
+        return zip(self._index, self)
+
+    def to_dict(self):
+        return dict(zip(self._index, self))
+
+class User(Record):
+    __slots__ = ()
+
+class Product(Record):
+    __slots__ = ()
+
+class Order(Record):
+    __slots__ = ()
+
+class Transaction(Record):
+    __slots__ = ()
+
+class LedgerEntry(Record):
+    __slots__ = ()
+
+class Broadcast(Record):
+    __slots__ = ()
+
+@lru_cache(maxsize=None)
+def record_class(base, columns):
+    """Класс записи для набора колонок; строится один раз на запрос"""
+    # rename=True: колонки вроде COUNT(*) остаются доступны по ключу
+    row_type = namedtuple(base.__name__ + "Row", columns, rename=True)
+    namespace = {
+        '__slots__': (),
+        '_index': {column: i for i, column in enumerate(columns)}
+    }
+    return type(base.__name__, (base, row_type), namespace)
+
+def _row_maker(cursor, base):
+    columns = tuple(column[0] for column in cursor.description)
+    # tuple.__new__ напрямую - без проверок namedtuple._make на каждой строке
+    return partial(tuple.__new__, record_class(base, columns))
+
+def fetch_one(cursor, base):
+    """Следующая строка курсора как запись, либо None"""
+    row = cursor.fetchone()
+    return _row_maker(cursor, base)(row) if row else None
+
+def fetch_all(cursor, base):
+    """Все строки курсора как список записей"""
+    return list(map(_row_maker(cursor, base), cursor.fetchall()))
+
+def iter_records(cursor, base, chunk_size=1000):
+    """Построчно отдает записи, читая курсор пачками по chunk_size"""
+    make = _row_maker(cursor, base)
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            return
+        yield from map(make, rows)
@@ -0,0 +1,24 @@
+from decimal import Decimal, InvalidOperation
+
+# Суммы хранятся в целых нанотонах: 1 TON = 10^9 нанотон
+NANOTON = 10 ** 9
+
+def to_nano(value):
+    """Переводит сумму в TON (строка, число или Decimal) в целые нанотоны"""
+    try:
+        amount = Decimal(str(value).strip().replace(',', '.'))
+    except InvalidOperation:
+        raise ValueError(f"Неверная сумма: {value}") from None
+
+    if not amount.is_finite():
+        raise ValueError(f"Неверная сумма: {value}")
+
+    nano = amount * NANOTON
+    if nano != nano.to_integral_value():
+        raise ValueError("Точность суммы - не более 9 знаков после запятой")
+    return int(nano)
+
+def format_ton(nano):
+    """Форматирует сумму в нанотонах для отображения: 1500000000 -> '1.5'"""
+    amount = Decimal(nano or 0).scaleb(-9).normalize()
+    return f"{amount:f}"
@@ -0,0 +1,173 @@
+import asyncio
+import heapq
+import itertools
+import time
+from telegram.error import RetryAfter, BadRequest, NetworkError
+from config import Config
+from resilience import TokenBucket
+
+# Приоритеты исходящих сообщений: меньше - раньше
+PRIORITY_TRANSACTIONAL = 0  # заказы, возвраты, зачисления
+PRIORITY_NORMAL = 1         # переписка с администратором
+PRIORITY_BULK = 2           # рассылки
+
+class Outbox:
+    """Очередь исходящих сообщений с учетом лимитов Telegram.
+    
+    Общий поток ограничен global_rate сообщений в секунду, каждый чат -
+    chat_rate. Сообщения одного чата уходят по порядку (в пределах
+    приоритета), а среди готовых к отправке чатов первым обслуживается
+    сообщение с меньшим приоритетом. RetryAfter приостанавливает отправку
+    на указанное Telegram время, после чего сообщение уходит повторно.
+    
+    send() только ставит сообщение в очередь и сразу возвращает Future."""
+    
+    def __init__(self, global_rate=25, chat_rate=1, workers=4, max_retries=3):
+        self.limiter = TokenBucket(global_rate)
+        self.chat_interval = 1 / chat_rate
+        self.workers_count = workers
+        self.max_retries = max_retries
+        
+        self.seq = itertools.count()
+        # Сообщения чата: куча (priority, seq, chat_id, kwargs, future, attempts)
+        self.pending = {}
+        # Чаты, которые можно обслужить сейчас: куча (priority, seq, chat_id)
+        self.ready = []
+        # Чаты в очереди или в ожидании своего интервала
+        self.scheduled = set()
+        # Когда чату без очереди снова можно писать
+        self.next_allowed = {}
+        self.paused_until = 0
+        
+        self.wakeup = asyncio.Event()
+        self.bot = None
+        self.workers = []
+        
+        self.sent = 0
+        self.failed = 0
+        self.flood_waits = 0
+    
+    def start(self, bot):
+        self.bot = bot
+        self.workers = [asyncio.create_task(self._worker()) for _ in range(self.workers_count)]
+    
+    async def stop(self, timeout=10):
+        """Дожидается отправки очереди (не дольше timeout секунд) и останавливает обработчики"""
+        deadline = time.monotonic() + timeout
+        while self.pending and time.monotonic() < deadline:
+            await asyncio.sleep(0.1)
+        for worker in self.workers:
+            worker.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = []
+    
+    def send(self, chat_id, text, priority=PRIORITY_NORMAL, **kwargs):
+        """Ставит сообщение в очередь; kwargs передаются в bot.send_message"""
+        future = asyncio.get_running_loop().create_future()
+        # Ошибку уже напечатал обработчик очереди - не ждущий результат не должен получать предупреждение
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        
+        kwargs['text'] = text
+        item = (priority, next(self.seq), chat_id, kwargs, future, 0)
+        self._push(item)
+        return future
+    
+    def _push(self, item):
+        chat_id = item[2]
+        heapq.heappush(self.pending.setdefault(chat_id, []), item)
+        if chat_id in self.scheduled:
+            return
+        
+        self.scheduled.add(chat_id)
+        delay = self.next_allowed.pop(chat_id, 0) - time.monotonic()
+        if delay > 0:
+            asyncio.get_running_loop().call_later(delay, self._make_ready, chat_id)
+        else:
+            self._make_ready(chat_id)
+    
+    def _make_ready(self, chat_id):
+        priority, seq = self.pending[chat_id][0][:2]
+        heapq.heappush(self.ready, (priority, seq, chat_id))
+        self.wakeup.set()
+    
+    def _release(self, chat_id):
+        # Следующее сообщение чата - не раньше чем через chat_interval
+        if self.pending.get(chat_id):
+            asyncio.get_running_loop().call_later(self.chat_interval, self._make_ready, chat_id)
+            return
+        
+        self.pending.pop(chat_id, None)
+        self.scheduled.discard(chat_id)
+        now = time.monotonic()
+        self.next_allowed[chat_id] = now + self.chat_interval
+        if len(self.next_allowed) > 10000:
+            self.next_allowed = {key: value for key, value in self.next_allowed.items() if value > now}
+    
+    async def _worker(self):
+        while True:
+            while not self.ready:
+                self.wakeup.clear()
+                await self.wakeup.wait()
+            
+            _, _, chat_id = heapq.heappop(self.ready)
+            item = heapq.heappop(self.pending[chat_id])
+            try:
+                await self._deliver(item)
+            finally:
+                self._release(chat_id)
+    
+    async def _deliver(self, item):
+        priority, seq, chat_id, kwargs, future, attempts = item
+        if future.cancelled():
+            return
+        
+        pause = self.paused_until - time.monotonic()
+        if pause > 0:
+            await asyncio.sleep(pause)
+        await self.limiter.acquire()
+        
+        try:
+            message = await self.bot.send_message(chat_id, **kwargs)
+        except RetryAfter as e:
+            # Telegram просит подождать: останавливаем всю отправку и повторяем сообщение
+            self.flood_waits += 1
+            self.paused_until = time.monotonic() + e.retry_after
+            heapq.heappush(self.pending[chat_id], item)
+        except BadRequest as e:
+            # BadRequest наследует NetworkError, но повтор не поможет
+            self._fail(chat_id, future, e)
+        except NetworkError as e:
+            if attempts < self.max_retries:
+                heapq.heappush(self.pending[chat_id], (priority, seq, chat_id, kwargs, future, attempts + 1))
+            else:
+                self._fail(chat_id, future, e)
+        except Exception as e:
+            self._fail(chat_id, future, e)
+        else:
+            self.sent += 1
+            if not future.done():
+                future.set_result(message)
+    
+    def _fail(self, chat_id, future, error):
+        # Например, пользователь заблокировал бота
+        self.failed += 1
+        print(f"Error sending message to {chat_id}: {error}")
+        if not future.done():
+            future.set_exception(error)
+    
+    def stats(self):
+        """Размер очереди и счетчики отправки"""
+        return {
+            'queued': sum(len(items) for items in self.pending.values()),
+            'chats': len(self.pending),
+            'sent': self.sent,
+            'failed': self.failed,
+            'flood_waits': self.flood_waits
+        }
+
+outbox = Outbox(
+    global_rate=Config.OUTBOX_GLOBAL_RATE,
+    chat_rate=Config.OUTBOX_CHAT_RATE,
+    workers=Config.OUTBOX_WORKERS,
+    max_retries=Config.OUTBOX_MAX_RETRIES
+)
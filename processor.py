@@ -0,0 +1,84 @@
+import asyncio
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+from config import Config
+
+class PerUserUpdateProcessor(BaseUpdateProcessor):
+    """Параллельная обработка обновлений с сохранением порядка для каждого пользователя.
+    
+    Обновления разных пользователей выполняются одновременно (не больше
+    max_concurrent_updates), а обновления одного пользователя - строго по
+    очереди, в порядке поступления. Поэтому шаги ConversationHandler из
+    admin.py не обгоняют друг друга.
+    
+    Семафор базового класса захватывается до очереди пользователя, поэтому ему
+    передается max_queued_updates - предел ожидающих обновлений. Число реально
+    выполняемых ограничивает собственный семафор после очереди: пользователь,
+    приславший десяток сообщений, занимает не больше одного слота."""
+    
+    def __init__(self, max_concurrent_updates, max_queued_updates):
+        super().__init__(max_queued_updates)
+        self.concurrency = max_concurrent_updates
+        self.running = asyncio.Semaphore(max_concurrent_updates)
+        
+        # Очередь пользователя: Lock (ожидающие обслуживаются по порядку) и число обновлений в ней
+        self.locks = {}
+        self.depths = {}
+        
+        self.processed = 0
+        self.max_depth = 0
+    
+    @staticmethod
+    def _key(update):
+        if isinstance(update, Update):
+            if update.effective_user:
+                return update.effective_user.id
+            if update.effective_chat:
+                return update.effective_chat.id
+        return None
+    
+    async def do_process_update(self, update, coroutine):
+        key = self._key(update)
+        if key is None:
+            async with self.running:
+                await coroutine
+            self.processed += 1
+            return
+        
+        # До первого await ничего не ждем: место в очереди занимается в порядке поступления
+        lock = self.locks.setdefault(key, asyncio.Lock())
+        depth = self.depths[key] = self.depths.get(key, 0) + 1
+        self.max_depth = max(self.max_depth, depth)
+        try:
+            async with lock:
+                async with self.running:
+                    await coroutine
+        finally:
+            self.processed += 1
+            self.depths[key] -= 1
+            if not self.depths[key]:
+                del self.depths[key]
+                del self.locks[key]
+    
+    async def initialize(self):
+        pass
+    
+    async def shutdown(self):
+        pass
+    
+    def queue_depth(self, key):
+        """Число обновлений пользователя в очереди, включая выполняемое"""
+        return self.depths.get(key, 0)
+    
+    def stats(self):
+        """Глубина очередей и счетчики обработки"""
+        return {
+            'concurrency': self.concurrency,
+            'active_keys': len(self.depths),
+            'queued': sum(self.depths.values()),
+            'max_depth': self.max_depth,
+            'processed': self.processed,
+            'depths': dict(self.depths)
+        }
+
+update_processor = PerUserUpdateProcessor(Config.UPDATE_CONCURRENCY, Config.UPDATE_MAX_QUEUED)
@@ -0,0 +1,112 @@
+import asyncio
+import random
+import time
+
+# Состояния автомата (CircuitBreaker.state)
+CIRCUIT_CLOSED = 'closed'
+CIRCUIT_OPEN = 'open'
+CIRCUIT_HALF_OPEN = 'half_open'
+
+class TokenBucket:
+    """Ограничитель частоты: rate запросов в секунду, всплеск до capacity"""
+    
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(1, rate)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.lock = asyncio.Lock()
+        
+        self.waits = 0
+    
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+    
+    async def acquire(self):
+        """Ждет свободный токен; ожидающие обслуживаются по очереди"""
+        async with self.lock:
+            self._refill()
+            if self.tokens < 1:
+                self.waits += 1
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= 1
+    
+    def stats(self):
+        self._refill()
+        return {
+            'rate': self.rate,
+            'capacity': self.capacity,
+            'tokens': round(self.tokens, 2),
+            'waits': self.waits
+        }
+
+class CircuitBreaker:
+    """Автомат отключения: после failure_threshold неудач подряд запросы
+    отклоняются сразу, пока не пройдет reset_timeout секунд. Затем один
+    пробный запрос (half_open) решает, закрыть автомат или открыть снова"""
+    
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        
+        self.state = CIRCUIT_CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.probe_in_flight = False
+        
+        self.rejected = 0
+        self.times_opened = 0
+    
+    def allow(self):
+        """Можно ли выполнить запрос сейчас"""
+        if self.state == CIRCUIT_OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self.state = CIRCUIT_HALF_OPEN
+        
+        if self.state == CIRCUIT_CLOSED:
+            return True
+        if self.state == CIRCUIT_HALF_OPEN and not self.probe_in_flight:
+            self.probe_in_flight = True
+            return True
+        
+        self.rejected += 1
+        return False
+    
+    def record_success(self):
+        self.state = CIRCUIT_CLOSED
+        self.failures = 0
+        self.probe_in_flight = False
+    
+    def record_failure(self):
+        self.failures += 1
+        self.probe_in_flight = False
+        if self.state == CIRCUIT_HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != CIRCUIT_OPEN:
+                self.times_opened += 1
+            self.state = CIRCUIT_OPEN
+            self.opened_at = time.monotonic()
+    
+    def record_cancel(self):
+        """Запрос прерван до результата: освобождаем место пробного запроса"""
+        self.probe_in_flight = False
+    
+    def retry_in(self):
+        """Секунд до пробного запроса (0, если автомат не открыт)"""
+        if self.state != CIRCUIT_OPEN:
+            return 0
+        return max(0, self.reset_timeout - (time.monotonic() - self.opened_at))
+    
+    def stats(self):
+        return {
+            'state': self.state,
+            'failures': self.failures,
+            'retry_in': round(self.retry_in(), 1),
+            'rejected': self.rejected,
+            'times_opened': self.times_opened
+        }
+
+def backoff_delay(attempt, base, cap):
+    """Экспоненциальная задержка с полным джиттером: случайно от 0 до base * 2^attempt"""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
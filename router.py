@@ -0,0 +1,140 @@
+import inspect
+import re
+
+# Коды действий для callback_data. Telegram ограничивает callback_data 64 байтами,
+# поэтому вместо "product_123" кнопки несут короткий код и упакованные id: "p:3f"
+CB_MAIN_MENU = 'm'
+CB_ADMIN_PANEL = 'a'
+CB_VIEW_ORDERS = 'o'
+CB_ADD_PRODUCT = 'ap'
+CB_CANCEL_ADD = 'ac'
+CB_CONFIRM_ADD = 'ay'
+CB_GIVE_BALANCE = 'g'
+CB_CANCEL_GIVE_BALANCE = 'gc'
+CB_BROADCAST = 'bc'
+CB_CONFIRM_BROADCAST = 'by'
+CB_CANCEL_BROADCAST = 'bn'
+CB_SHOW_PRODUCTS = 's'
+CB_CATALOG_NEXT = 'sn'
+CB_CATALOG_PREV = 'sp'
+CB_PRODUCT = 'p'
+CB_BUY = 'b'
+CB_PAID = 'pd'
+CB_CANCEL_PAYMENT = 'pc'
+CB_COMPLETE = 'c'
+CB_REJECT = 'r'
+
+SEPARATOR = ':'
+DIGITS = '0123456789abcdefghijklmnopqrstuvwxyz'
+
+def pack_id(value):
+    """Число в base36: 1000000 -> 'lfls'"""
+    if value < 0:
+        return '-' + pack_id(-value)
+    if value < 36:
+        return DIGITS[value]
+    
+    digits = []
+    while value:
+        value, digit = divmod(value, 36)
+        digits.append(DIGITS[digit])
+    return ''.join(reversed(digits))
+
+def unpack_id(text):
+    return int(text, 36)
+
+def callback_data(code, *args):
+    """callback_data кнопки: код действия и аргументы (числа упаковываются в base36)"""
+    if not args:
+        return code
+    return SEPARATOR.join([code, *(pack_id(arg) if isinstance(arg, int) else arg for arg in args)])
+
+def callback_code(data):
+    """Код действия из callback_data"""
+    return data.partition(SEPARATOR)[0]
+
+class CallbackRouter:
+    """Маршрутизация нажатий кнопок по таблице кодов.
+    
+    Обработчики помечаются декоратором route(код, типы аргументов) и
+    подключаются через include(объект). dispatch находит обработчик одним
+    поиском в словаре по коду и передает ему разобранные аргументы после
+    update и context. Кнопки с неизвестным кодом или неверным числом
+    аргументов (например, из сообщений, отправленных до смены формата, или
+    с подделанной callback_data) получают ответ, что кнопка устарела."""
+    
+    def __init__(self):
+        # код -> (обработчик, типы аргументов, сколько аргументов обязательно)
+        self.routes = {}
+        self.dispatched = 0
+        self.unknown = 0
+    
+    @staticmethod
+    def route(code, *types):
+        """Помечает метод обработчиком кода; типы - int или str для каждого аргумента"""
+        def decorator(func):
+            func.__dict__.setdefault('callback_routes', []).append((code, types))
+            return func
+        return decorator
+    
+    @staticmethod
+    def _required_args(handler, types):
+        """Сколько аргументов из callback_data нельзя опустить: у них нет значения по умолчанию"""
+        params = list(inspect.signature(handler).parameters.values())[2:]
+        if len(params) < len(types):
+            raise ValueError(f"{handler.__qualname__} accepts fewer arguments than route types")
+        return sum(1 for param in params[:len(types)] if param.default is inspect.Parameter.empty)
+    
+    def include(self, handler):
+        """Регистрирует помеченные методы объекта"""
+        for name in dir(type(handler)):
+            for code, types in getattr(getattr(type(handler), name), 'callback_routes', ()):
+                if code in self.routes:
+                    raise ValueError(f"Callback code {code!r} is already registered")
+                method = getattr(handler, name)
+                self.routes[code] = (method, types, self._required_args(method, types))
+    
+    @staticmethod
+    def pattern(code):
+        """Шаблон для CallbackQueryHandler внутри ConversationHandler"""
+        return re.compile(f"^{re.escape(code)}(?:{SEPARATOR}|$)")
+    
+    def resolve(self, data):
+        """(обработчик, аргументы) для callback_data, либо None"""
+        code, *parts = (data or '').split(SEPARATOR)
+        route = self.routes.get(code)
+        if route is None:
+            return None
+        
+        handler, types, required = route
+        # Опустить можно только аргументы со значением по умолчанию:
+        # "o" - первая страница заявок, "o:<токен>" - следующая
+        if not required <= len(parts) <= len(types):
+            return None
+        try:
+            args = [unpack_id(part) if arg_type is int else part for arg_type, part in zip(types, parts)]
+        except ValueError:
+            return None
+        return handler, args
+    
+    async def dispatch(self, update, context):
+        query = update.callback_query
+        resolved = self.resolve(query.data)
+        if resolved is None:
+            self.unknown += 1
+            await query.answer("Кнопка устарела, откройте меню заново")
+            return
+        
+        self.dispatched += 1
+        handler, args = resolved
+        return await handler(update, context, *args)
+    
+    def stats(self):
+        return {
+            'routes': len(self.routes),
+            'dispatched': self.dispatched,
+            'unknown': self.unknown
+        }
+
+router = CallbackRouter()
+route = CallbackRouter.route
@@ -0,0 +1,341 @@
+from config import Config
+from database import product_category
+from utils import ton_checker
+
+EMOJIS = Config.EMOJIS
+WALLET = Config.WALLET_TON
+
+class Templates:
+    """Все тексты бота в одном месте.
+    
+    Тексты без данных пользователя собираются один раз при импорте и
+    хранятся готовыми строками. Остальные - методы с f-строкой: эмодзи и
+    адрес кошелька берутся из констант модуля, отрисовка стоит той же
+    сборки строки, что и f-строка прямо в обработчике, плюс вызов метода
+    (замер - benchmarks/bench_templates.py)."""
+    
+    def __init__(self):
+        self.wallet_short = ton_checker.format_wallet_address()
+        
+        self.welcome = f"""{EMOJIS['pizza']} *Добро пожаловать в Pizza Numbers Bot!* {EMOJIS['pizza']}
+
+🍕 *Горячие номера Telegram как свежая пицца!*
+
+{EMOJIS['phone']} Покупайте качественные номера Telegram
+{EMOJIS['lock']} Полная анонимность и безопасность
+{EMOJIS['ton']} Оплата в TON - быстро и надежно
+{EMOJIS['check']} Автоматическая проверка платежей
+
+👇 Выберите действие:"""
+        
+        self.main_menu = f"""{EMOJIS['pizza']} *Главное меню* {EMOJIS['pizza']}
+
+👇 Выберите действие:"""
+        
+        self.products = f"""{EMOJIS['pizza']} *Наши номера* {EMOJIS['pizza']}
+
+👇 Выберите номер для покупки:"""
+        
+        # Описание товара по его категории (database.product_category)
+        self.descriptions = {
+            'fresh': """🍕 *Свежий номер Telegram*
+
+• Полностью новый аккаунт
+• Никогда не использовался
+• Полный доступ ко всем функциям
+• Гарантия 30 дней
+• Моментальная доставка""",
+            
+            'vip': """👑 *VIP номер Telegram*
+
+• Премиум качество
+• Приоритетная поддержка
+• Дополнительные гарантии
+• Быстрая активация
+• Эксклюзивный сервис""",
+            
+            'premium': """💎 *Premium номер Telegram*
+
+• Высшее качество
+• Расширенная гарантия
+• Персональный менеджер
+• Быстрая доставка
+• Полная анонимность""",
+            
+            'standard': """📱 *Стандартный номер Telegram*
+
+• Надежный аккаунт
+• Базовая гарантия
+• Быстрая доставка
+• Полный доступ
+• Экономичный вариант"""
+        }
+        
+        self.default_description = """📞 *Номер Telegram*
+
+• Полный доступ к аккаунту
+• Гарантия работоспособности
+• Быстрая доставка
+• Поддержка 24/7
+• Анонимность и безопасность"""
+        
+        self.chat_opened = f"""{EMOJIS['check']} *Чат с администратором открыт!*
+
+Здравствуйте, спасибо за покупку!
+Администратор уже уведомлен о вашем заказе.
+
+📞 *Чат открыт!* Вы можете общаться с администратором прямо здесь.
+
+⏰ Время ожидания ответа не больше 24 часов.
+
+👇 Администратор скоро свяжется с вами."""
+        
+        # Проверка платежа по хэшу
+        self.payment_unmatched = f"{EMOJIS['cross']} Платеж получен без вашего ID в комментарии. Обратитесь к администратору."
+        self.payment_check_unavailable = f"{EMOJIS['clock']} Проверка платежей временно недоступна. Попробуйте через пару минут."
+        self.payment_found = f"{EMOJIS['check']} Платеж найден! Баланс пополнится автоматически в течение минуты..."
+        self.payment_not_found = f"{EMOJIS['cross']} Платеж не найден или еще не подтвержден."
+        
+        # Каталог и покупка
+        self.products_empty = f"{EMOJIS['cross']} Товары временно отсутствуют!"
+        self.product_not_found = "❌ Товар не найден!"
+        self.order_not_found = "❌ Заказ не найден!"
+        self.insufficient_funds = "❌ Недостаточно средств на балансе!"
+        self.order_already_paid = "✅ Заказ уже оплачен!"
+        self.purchase_cancelled = "❌ Покупка отменена."
+        self.error = "❌ Произошла ошибка!"
+        self.payment_error = "❌ Произошла ошибка при обработке платежа!"
+        
+        # Переписка с администратором
+        self.message_sent = f"{EMOJIS['check']} Сообщение отправлено администратору!"
+        self.use_menu = "Используйте кнопки меню для навигации."
+        self.reply_sent = f"{EMOJIS['check']} Ответ отправлен пользователю!"
+        self.reply_usage = "❌ Неверный формат. Используйте: /reply <user_id> <сообщение>"
+        self.reply_error = "❌ Ошибка при отправке ответа."
+        self.no_chats = "📭 Нет активных чатов."
+        self.chats_header = f"{EMOJIS['clock']} *Активные чаты:*\n\n"
+        self.admin_help = """Для ответа пользователю используйте команду:
+/reply <user_id> <сообщение>
+
+Для просмотра активных чатов:
+/chats"""
+        
+        # Админка
+        self.access_denied = "⛔ Доступ запрещен!"
+        self.no_orders = f"{EMOJIS['check']} Нет активных заявок!"
+        self.orders_header = f"{EMOJIS['clock']} *Активные заявки:*\n\n"
+        self.complete_error = "❌ Ошибка при выполнении заказа!"
+        self.reject_error = "❌ Ошибка при отклонении заказа!"
+        self.enter_product_name = f"{EMOJIS['buy']} Введите название товара:"
+        self.enter_product_price = f"{EMOJIS['money']} Введите цену товара в TON:"
+        self.invalid_price = "❌ Неверная цена! Введите число."
+        self.price_not_positive = "❌ Цена должна быть больше 0! Введите число."
+        self.add_product_cancelled = "❌ Добавление товара отменено."
+        self.enter_balance_user = f"{EMOJIS['money']} Введите ID пользователя, которому хотите выдать баланс:"
+        self.invalid_user_id = """❌ Неверный ID пользователя! Введите число.
+Попробуйте еще раз или нажмите 'Отмена':"""
+        self.amount_not_positive = """❌ Сумма должна быть больше 0!
+Попробуйте еще раз или нажмите 'Отмена':"""
+        self.invalid_amount = """❌ Неверная сумма! Введите число.
+Попробуйте еще раз или нажмите 'Отмена':"""
+        self.give_balance_cancelled = "❌ Выдача баланса отменена."
+        self.enter_broadcast_text = "📣 Введите текст рассылки для всех пользователей:"
+        self.broadcast_started = "📣 *Рассылка запущена...*"
+        self.broadcast_cancelled = "❌ Рассылка отменена."
+        self.digest_separator = "\n━━━━━━━━━━━━━━━━━━━━\n"
+    
+    def product_description(self, name):
+        return self.descriptions.get(product_category(name), self.default_description)
+    
+    def balance(self, balance):
+        return f"""{EMOJIS['balance']} *Ваш баланс*
+
+💰 Доступно: *{balance} TON*
+{EMOJIS['ton']} Кошелек: `{self.wallet_short}`
+
+👇 Используйте кнопку ниже для пополнения:"""
+    
+    def deposit(self, user_id):
+        return f"""{EMOJIS['money']} *Пополнение баланса*
+
+{EMOJIS['ton']} Отправьте TON на адрес:
+`{WALLET}`
+
+📝 В комментарии к переводу укажите ваш ID:
+`{user_id}`
+
+⚠️ *Внимание!*
+1. Отправляйте ТОЛЬКО TON
+2. Минимальная сумма: 0.1 TON
+3. Без комментария платеж не будет зачислен автоматически
+4. Баланс пополнится сам в течение минуты после подтверждения
+
+🔎 *Проверка оплаты:*
+Отправьте боту хэш транзакции в формате:
+`check_0xваш_хэш`"""
+    
+    def deposit_credited(self, amount, balance):
+        return f"""{EMOJIS['money']} *Баланс пополнен!*
+
+💰 Сумма: *{amount} TON*
+
+Ваш текущий баланс: *{balance} TON*"""
+    
+    def payment_already_credited(self, amount):
+        return f"{EMOJIS['check']} Платеж на {amount} TON уже зачислен!"
+    
+    def product_detail(self, name, description, price, product_id, created_at):
+        return f"""{EMOJIS['phone']} *{name}*
+
+{description}
+
+💰 *Цена:* {price} TON
+🆔 *ID товара:* #{product_id}
+📅 *Добавлен:* {created_at}
+
+👇 Выберите действие:"""
+    
+    def buy_confirmation(self, name, price, username, order_id):
+        return f"""{EMOJIS['buy']} *Подтверждение покупки*
+
+📱 Товар: {name}
+💰 Цена: {price} TON
+👤 Покупатель: @{username}
+🆔 Заказ: #{order_id}
+
+👇 Нажмите 'Оплатил' для продолжения:"""
+    
+    def new_order(self, order_id, username, user_id, product_name, amount, created_at):
+        return f"""📦 *Новая заявка!*
+
+🆔 Заказ: #{order_id}
+👤 Пользователь: @{username} (ID: {user_id})
+📱 Товар: {product_name}
+💰 Сумма: {amount} TON
+⏰ Время: {created_at}
+
+👇 Обработайте заявку:"""
+    
+    def chat_welcome(self, order_id, product_name, amount):
+        return f"""👋 *Чат с администратором*
+
+🆔 Заказ: #{order_id}
+📱 Товар: {product_name}
+💰 Сумма: {amount} TON
+
+Администратор получил уведомление о вашем заказе и скоро свяжется с вами для выдачи номера и кода.
+
+Вы можете задавать вопросы прямо в этом чате."""
+    
+    def order_completed(self, order_id, product_name):
+        return f"""{EMOJIS['check']} *Ваш заказ выполнен!*
+
+🆔 Заказ: #{order_id}
+📱 Товар: {product_name}
+✅ Статус: Выполнен
+
+Спасибо за покупку! Если возникнут вопросы, обращайтесь."""
+    
+    def order_rejected(self, order_id, product_name, refund):
+        return f"""{EMOJIS['cross']} *Ваш заказ отклонен*
+
+🆔 Заказ: #{order_id}
+📱 Товар: {product_name}
+💰 Возвращено: {refund} TON
+❌ Статус: Отклонен
+
+Деньги возвращены на ваш баланс."""
+    
+    def order_already_processed(self, order_id):
+        return f"❌ Заказ #{order_id} уже обработан!"
+    
+    def order_completed_admin(self, order_id):
+        return f"{EMOJIS['check']} Заказ #{order_id} выполнен! Пользователь уведомлен."
+    
+    def order_rejected_admin(self, order_id):
+        return f"{EMOJIS['cross']} Заказ #{order_id} отклонен! Деньги возвращены пользователю."
+    
+    def user_message(self, username, user_id, orders, text):
+        return f"""📨 *Сообщение от пользователя*
+
+👤 Пользователь: @{username} (ID: {user_id})
+{orders}
+💬 Сообщение: {text}"""
+    
+    def user_message_order(self, order_id, product_name):
+        return f"🆔 Заказ: #{order_id} - {product_name}"
+    
+    def admin_reply(self, message):
+        return f"""📨 *Ответ от администратора*
+
+💬 {message}"""
+    
+    def active_chat(self, username, user_id, chat_id):
+        return f"""👤 Пользователь: @{username} (ID: {user_id})
+💬 Чат ID: {chat_id}
+━━━━━━━━━━━━━━━━━━━━
+"""
+    
+    def admin_panel(self, users, products, pending, balance):
+        return f"""{EMOJIS['admin']} *Админ панель*
+
+📊 Статистика:
+• Пользователей: {users}
+• Товаров: {products}
+• Заявок: {pending}
+• Баланс системы: {balance} TON"""
+    
+    def admin_order(self, order_id, username, product_name, amount, created_at):
+        return f"""📦 Заявка #{order_id}
+👤 Пользователь: @{username}
+📱 Товар: {product_name}
+💰 Сумма: {amount} TON
+⏰ Время: {created_at}
+━━━━━━━━━━━━━━━━━━━━
+"""
+    
+    def product_added(self, name, price):
+        return f"{EMOJIS['check']} Товар '{name}' успешно добавлен за {price} TON!"
+    
+    def balance_user_found(self, username):
+        return f"""👤 Пользователь найден: @{username}
+{EMOJIS['money']} Введите сумму в TON для выдачи:"""
+    
+    def balance_user_not_found(self, user_id):
+        return f"""❌ Пользователь с ID {user_id} не найден.
+Попробуйте еще раз или нажмите 'Отмена':"""
+    
+    def balance_granted(self, amount, time, balance):
+        return f"""{EMOJIS['money']} *Вам выдан баланс!*
+
+💰 Сумма: *{amount} TON*
+👑 Выдал: администратор
+📅 Время: {time}
+
+Ваш текущий баланс: *{balance} TON*"""
+    
+    def balance_granted_admin(self, username, user_id, amount, balance):
+        return f"""{EMOJIS['check']} Баланс успешно выдан!
+
+👤 Пользователь: @{username} (ID: {user_id})
+💰 Сумма: {amount} TON
+✅ Новый баланс: {balance} TON"""
+    
+    def broadcast_preview(self, total, text):
+        return f"📣 Сообщение получат ~{total} пользователей:\n\n{text}"
+    
+    def broadcast_progress(self, broadcast_id, done, total, sent, blocked, failed, rate, finished=False):
+        title = "✅ *Рассылка завершена*" if finished else "📣 *Идет рассылка...*"
+        return f"""{title}
+
+🆔 Рассылка: #{broadcast_id}
+📨 Обработано: {done} из ~{total}
+✅ Доставлено: {sent}
+🚫 Заблокировали бота: {blocked}
+❌ Ошибки: {failed}
+⚡ Скорость: {rate:.1f} сообщ./с"""
+    
+    def digest_header(self, count):
+        return f"📬 *Сводка: {count} событий*\n\n"
+
+templates = Templates()
@@ -0,0 +1,26 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+# Модули бота лежат в корне репозитория и создают синглтоны при импорте,
+# поэтому база по умолчанию подменяется до первого импорта: тесты не трогают
+# telegram_numbers.db из репозитория
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+os.environ["DATABASE_NAME"] = os.path.join(tempfile.mkdtemp(prefix="nufix-tests-"), "bot.db")
+
+from config import Config
+from database import Database
+
+@pytest.fixture
+def database(tmp_path, monkeypatch):
+    """Отдельная база со всеми миграциями для одного теста"""
+    monkeypatch.setattr(Config, "DATABASE_NAME", str(tmp_path / "test.db"))
+    database = Database(read_pool_size=2)
+    yield database
+    while not database.readers.empty():
+        database.readers.get().close()
+    database.conn.close()
@@ -0,0 +1,72 @@
+import asyncio
+
+import pytest
+
+from database import db
+from deposits import deposit_watcher, CURSOR_KEY
+from utils import ton_checker
+
+def transfer(lt, comment, value=1_000_000_000):
+    return {
+        'transaction_id': {'lt': str(lt), 'hash': f"h{lt}"},
+        'in_msg': {'source': 'EQsender', 'value': str(value), 'message': comment}
+    }
+
+@pytest.fixture
+def wallet(monkeypatch):
+    """История кошелька, новые сверху, вместо запросов к toncenter"""
+    history = []
+    
+    async def fetch_transactions(limit=10, lt=None, tx_hash=None, to_lt=None):
+        page = [tx for tx in history if lt is None or int(tx['transaction_id']['lt']) <= int(lt)]
+        page = [tx for tx in page if to_lt is None or int(tx['transaction_id']['lt']) > int(to_lt)]
+        return page[:limit]
+    
+    monkeypatch.setattr(ton_checker, "fetch_transactions", fetch_transactions)
+    db.database.conn.execute("DELETE FROM state")
+    return history
+
+def poll():
+    asyncio.run(deposit_watcher.poll(None))
+    return db.database.get_state(CURSOR_KEY)
+
+def test_bad_comments_do_not_block_deposits(wallet):
+    db.database.upsert_user(7001, "user7001")
+    db.database.set_state(CURSOR_KEY, "100:h100")
+    balance = db.database.get_balance(7001)
+    wallet[:0] = [
+        transfer(105, "7001"),
+        # "²" проходит isdigit(), но не int()
+        transfer(104, "²"),
+        {'transaction_id': {'lt': '103', 'hash': 'h103'}, 'in_msg': {'source': 'EQsender', 'value': 'bad'}},
+        # Не помещается в INTEGER SQLite
+        transfer(102, "9" * 40),
+        transfer(101, "7001"),
+        transfer(100, "7001"),
+    ]
+    
+    assert poll() == "105:h105"
+    assert db.database.get_balance(7001) == balance + 2 * 1_000_000_000
+    
+    cursor = db.database.conn.cursor()
+    cursor.execute("SELECT tx_hash, user_id, status FROM transactions WHERE tx_hash IN ('h102', 'h104')")
+    assert sorted(cursor.fetchall()) == [('h102', None, 'unmatched'), ('h104', None, 'unmatched')]
+
+def test_first_run_sets_cursor_without_crediting(wallet):
+    db.database.upsert_user(7002, "user7002")
+    wallet[:0] = [transfer(201, "7002"), transfer(200, "7002")]
+    
+    assert poll() == "201:h201"
+    assert db.database.get_balance(7002) == 0
+    
+    wallet.insert(0, transfer(202, "7002"))
+    assert poll() == "202:h202"
+    assert db.database.get_balance(7002) == 1_000_000_000
+
+def test_first_run_on_empty_wallet(wallet):
+    db.database.upsert_user(7003, "user7003")
+    assert poll() == "0:"
+    
+    wallet.append(transfer(300, "7003"))
+    assert poll() == "300:h300"
+    assert db.database.get_balance(7003) == 1_000_000_000
@@ -0,0 +1,55 @@
+import pytest
+
+from database import LEDGER_GRANT, LEDGER_PURCHASE
+
+def test_snapshot_does_not_hide_drift(database):
+    database.upsert_user(5, "user5")
+    database.credit(5, 100, LEDGER_GRANT)
+    database.take_snapshot(force=True)
+    
+    # Расхождение в balances, которого нет в журнале
+    database.conn.execute("UPDATE balances SET amount = amount + 999 WHERE user_id = 5")
+    assert database.audit_ledger() == [(5, 100, 1099)]
+    
+    # Снимок считается по журналу и не переносит расхождение в себя
+    database.credit(5, 1, LEDGER_GRANT)
+    assert database.take_snapshot(force=True)
+    assert database.audit_ledger() == [(5, 101, 1100)]
+
+def test_snapshot_interval_and_pruning(database):
+    database.snapshot_interval = 3
+    database.snapshots_keep = 2
+    database.upsert_user(1, "user1")
+    
+    assert database.take_snapshot() is None
+    snapshots = []
+    for round_number in range(5):
+        for _ in range(3):
+            database.credit(1, 10, LEDGER_GRANT)
+        database.debit(1, 5, LEDGER_PURCHASE)
+        snapshots.append(database.take_snapshot())
+        # Записей после снимка меньше интервала - новый снимок не нужен
+        assert database.take_snapshot() is None
+    
+    cursor = database.conn.cursor()
+    cursor.execute("SELECT id FROM ledger_snapshots ORDER BY id")
+    assert [row[0] for row in cursor.fetchall()] == snapshots[-2:]
+    cursor.execute("SELECT snapshot_id, amount FROM ledger_snapshot_balances WHERE user_id = 1 ORDER BY snapshot_id")
+    assert cursor.fetchall() == [(snapshots[-2], 4 * 25), (snapshots[-1], 5 * 25)]
+    assert database.audit_ledger() == []
+
+@pytest.mark.parametrize("amount", [0, -5])
+def test_non_positive_amounts_are_rejected(database, amount):
+    database.upsert_user(1, "user1")
+    database.credit(1, 3000000000, LEDGER_GRANT)
+    
+    with pytest.raises(ValueError):
+        database.debit(1, amount, LEDGER_PURCHASE)
+    with pytest.raises(ValueError):
+        database.credit(1, amount, LEDGER_GRANT)
+    with pytest.raises(ValueError):
+        database.add_product("Номер", amount)
+    
+    assert database.get_balance(1) == 3000000000
+    assert database.conn.execute("SELECT COUNT(*) FROM ledger").fetchone()[0] == 1
+    assert database.conn.execute("SELECT COUNT(*) FROM products").fetchone()[0] == 0
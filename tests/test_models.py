@@ -0,0 +1,41 @@
+import sqlite3
+
+import pytest
+
+from models import Order, fetch_all, fetch_one, iter_records
+
+def make_cursor():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE orders (id INTEGER PRIMARY KEY, name TEXT, amount_nano INTEGER)")
+    conn.executemany("INSERT INTO orders (name, amount_nano) VALUES (?, ?)", [("first", 100), ("second", 200)])
+    return conn.execute("SELECT id, name, amount_nano, COUNT(*) OVER () FROM orders ORDER BY id")
+
+def test_record_behaves_like_row_dict():
+    order = fetch_one(make_cursor(), Order)
+    
+    # Обработчики обращаются и по ключу, и как к атрибуту
+    assert order['name'] == order.name == "first"
+    assert order['amount_nano'] == order.amount_nano == 100
+    assert order[0] == 1
+    with pytest.raises(KeyError):
+        order['missing']
+    
+    assert order.get('name') == "first"
+    assert order.get('missing') is None
+    assert order.get('missing', 0) == 0
+    
+    assert 'name' in order
+    assert 'missing' not in order
+    assert list(order.keys()) == ['id', 'name', 'amount_nano', 'COUNT(*) OVER ()']
+    # Колонка без имени-идентификатора доступна по ключу
+    assert order['COUNT(*) OVER ()'] == 2
+    assert order.to_dict() == {'id': 1, 'name': "first", 'amount_nano': 100, 'COUNT(*) OVER ()': 2}
+    assert isinstance(order, Order)
+
+def test_fetch_all_and_iter_records_return_the_same_rows():
+    rows = fetch_all(make_cursor(), Order)
+    streamed = list(iter_records(make_cursor(), Order, chunk_size=1))
+    
+    assert rows == streamed
+    assert [order.name for order in rows] == ["first", "second"]
+    assert fetch_one(make_cursor().execute("SELECT 1 WHERE 0"), Order) is None
@@ -0,0 +1,27 @@
+import base64
+
+import pytest
+
+from database import encode_page_token, decode_page_token
+
+def test_page_token_roundtrip():
+    token = encode_page_token("2024-01-02 03:04:05", 42)
+    assert decode_page_token(token) == ("2024-01-02 03:04:05", 42)
+
+@pytest.mark.parametrize("token", [
+    "!!!",
+    "²",
+    "a",
+    base64.urlsafe_b64encode(b"no separator").decode(),
+    base64.urlsafe_b64encode(b"2024-01-01|not a number").decode(),
+    base64.urlsafe_b64encode(b"\xff\xfe|1").decode(),
+])
+def test_malformed_token_gives_first_page(database, token):
+    assert decode_page_token(token) is None
+    
+    database.upsert_user(1, "user1")
+    product_id = database.add_product("Fresh", 1)
+    for _ in range(3):
+        database.create_order(1, product_id, 1)
+    orders, next_token = database.get_orders_page("pending", token, 2)
+    assert [order["id"] for order in orders] == [3, 2] and next_token
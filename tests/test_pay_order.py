@@ -0,0 +1,52 @@
+import asyncio
+import random
+
+import pytest
+
+from database import AsyncDatabase, LEDGER_GRANT, PAYMENT_OK, PAYMENT_ALREADY_PAID, PAYMENT_INSUFFICIENT_FUNDS
+
+PRICE = 1_000_000_000
+USERS = 20
+ORDERS_PER_USER = 10
+AFFORDABLE = 4
+TAPS = 3
+
+@pytest.mark.parametrize("group_commit", [False, True])
+def test_concurrent_payments(database, group_commit):
+    # Каждому пользователю хватает денег ровно на AFFORDABLE заказов из ORDERS_PER_USER
+    orders = []
+    for user_id in range(1, USERS + 1):
+        database.upsert_user(user_id, f"user{user_id}")
+        database.credit(user_id, AFFORDABLE * PRICE, LEDGER_GRANT)
+        for _ in range(ORDERS_PER_USER):
+            orders.append((database.create_order(user_id, 1, PRICE), user_id))
+    
+    async def hammer():
+        async_db = AsyncDatabase(database, group_commit=group_commit, group_commit_window=0.002)
+        try:
+            # Каждый заказ "оплачивают" несколько раз подряд, все задачи идут вперемешку
+            taps = [(order_id, user_id) for order_id, user_id in orders for _ in range(TAPS)]
+            random.Random(0).shuffle(taps)
+            return await asyncio.gather(*(
+                async_db.pay_order(order_id, user_id, 0) for order_id, user_id in taps
+            ))
+        finally:
+            await asyncio.to_thread(async_db.close)
+    
+    results = asyncio.run(hammer())
+    
+    assert results.count(PAYMENT_OK) == USERS * AFFORDABLE
+    assert set(results) <= {PAYMENT_OK, PAYMENT_ALREADY_PAID, PAYMENT_INSUFFICIENT_FUNDS}
+    
+    cursor = database.conn.cursor()
+    cursor.execute("SELECT COUNT(*) FROM balances WHERE amount < 0")
+    assert cursor.fetchone()[0] == 0
+    cursor.execute("SELECT COUNT(*), COALESCE(SUM(amount), 0) FROM balances WHERE amount != 0")
+    assert cursor.fetchone() == (0, 0)
+    
+    cursor.execute("SELECT user_id, COUNT(*) FROM orders WHERE status = 'processing' GROUP BY user_id")
+    assert dict(cursor.fetchall()) == {user_id: AFFORDABLE for user_id in range(1, USERS + 1)}
+    # Одна запись списания на каждую успешную оплату, без двойных списаний
+    cursor.execute("SELECT COUNT(*), COUNT(DISTINCT ref) FROM ledger WHERE kind = 'purchase'")
+    assert cursor.fetchone() == (USERS * AFFORDABLE, USERS * AFFORDABLE)
+    assert database.audit_ledger() == []
@@ -0,0 +1,49 @@
+import asyncio
+import random
+
+from telegram import Update, Message, Chat, User
+
+from processor import PerUserUpdateProcessor
+
+def make_update(update_id, user_id):
+    user = User(user_id, f"user{user_id}", False)
+    chat = Chat(user_id, Chat.PRIVATE)
+    return Update(update_id, message=Message(update_id, None, chat, from_user=user, text=str(update_id)))
+
+def test_order_is_preserved_per_user():
+    users = 8
+    per_user = 25
+    rng = random.Random(0)
+    
+    async def run():
+        processor = PerUserUpdateProcessor(max_concurrent_updates=4, max_queued_updates=1000)
+        handled = {user_id: [] for user_id in range(1, users + 1)}
+        running = 0
+        max_running = 0
+        
+        async def handle(update, delay):
+            nonlocal running, max_running
+            running += 1
+            max_running = max(max_running, running)
+            # Случайные задержки: без очереди пользователя поздние обновления обгоняли бы ранние
+            await asyncio.sleep(delay)
+            handled[update.effective_user.id].append(update.update_id)
+            running -= 1
+        
+        updates = [make_update(update_id, user_id)
+                   for update_id in range(per_user) for user_id in range(1, users + 1)]
+        tasks = [asyncio.create_task(processor.process_update(update, handle(update, rng.random() / 200)))
+                 for update in updates]
+        
+        await asyncio.sleep(0)
+        assert max(processor.stats()['depths'].values()) > 1
+        await asyncio.gather(*tasks)
+        return processor, handled, max_running
+    
+    processor, handled, max_running = asyncio.run(run())
+    
+    assert all(ids == list(range(per_user)) for ids in handled.values())
+    # Разные пользователи обрабатывались параллельно, но не больше лимита
+    assert 1 < max_running <= 4
+    assert processor.stats()['processed'] == users * per_user
+    assert processor.stats()['active_keys'] == 0
@@ -0,0 +1,38 @@
+import pytest
+
+def query_plan(database, method, *args):
+    """Выполняет метод Database и возвращает план каждого его SELECT"""
+    statements = []
+    connections = [database.readers.get() for _ in range(database.read_pool_size)]
+    for conn in connections:
+        conn.set_trace_callback(statements.append)
+        database.readers.put(conn)
+    try:
+        method(*args)
+    finally:
+        for conn in connections:
+            conn.set_trace_callback(None)
+    
+    plans = []
+    for statement in statements:
+        if statement.lstrip().upper().startswith("SELECT"):
+            rows = database.conn.execute("EXPLAIN QUERY PLAN " + statement).fetchall()
+            plans.append([row[3] for row in rows])
+    assert plans, f"{method.__name__} не выполнил ни одного SELECT"
+    return plans
+
+@pytest.mark.parametrize("name, args, index", [
+    ("get_pending_orders", (), "idx_orders_status_created"),
+    ("get_user_chats", (1,), "idx_orders_user_status_created"),
+    ("get_active_chats", (), "idx_orders_status_created"),
+    ("get_user_orders", (1,), "idx_orders_user_created"),
+    ("get_user_orders", (1, "completed"), "idx_orders_user_status_created"),
+    ("get_transaction_by_hash", ("0xabc",), "idx_transactions_tx_hash"),
+])
+def test_hot_query_uses_index(database, name, args, index):
+    for plan in query_plan(database, getattr(database, name), *args):
+        details = "\n".join(plan)
+        assert index in details
+        # Ни полного прохода по таблицам заказов и транзакций, ни сортировки во временном B-дереве
+        assert not any(step.startswith("SCAN") for step in plan), details
+        assert "TEMP B-TREE FOR ORDER BY" not in details
@@ -0,0 +1,168 @@
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from config import Config
+from resilience import TokenBucket, CIRCUIT_CLOSED, CIRCUIT_OPEN
+from utils import TONChecker, TONApiUnavailable
+
+class FakeToncenter(ThreadingHTTPServer):
+    """Локальный toncenter: отвечает статусами из очереди, после нее - fallback"""
+    
+    daemon_threads = True
+    
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), FakeToncenterHandler)
+        self.script = []
+        self.fallback = 503
+        self.requests = []
+    
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/"
+
+class FakeToncenterHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server
+        server.requests.append((time.monotonic(), self.path))
+        status = server.script.pop(0) if server.script else server.fallback
+        
+        body = json.dumps({'ok': status == 200, 'result': []}).encode()
+        self.send_response(status)
+        if status == 429:
+            self.send_header('Retry-After', '1')
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def toncenter(monkeypatch):
+    server = FakeToncenter()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    
+    monkeypatch.setattr(Config, "TONCENTER_API_URL", server.url)
+    monkeypatch.setattr(Config, "TONCENTER_API_KEY", None)
+    monkeypatch.setattr(Config, "TONCENTER_RPS", 1000)
+    monkeypatch.setattr(Config, "TONCENTER_MAX_RETRIES", 2)
+    # Без джиттера: задержку повтора задает только Retry-After (с потолком BACKOFF_MAX)
+    monkeypatch.setattr(Config, "TONCENTER_BACKOFF_BASE", 0)
+    monkeypatch.setattr(Config, "TONCENTER_BACKOFF_MAX", 0.2)
+    monkeypatch.setattr(Config, "TONCENTER_BREAKER_THRESHOLD", 2)
+    monkeypatch.setattr(Config, "TONCENTER_BREAKER_RESET", 0.5)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def run(checker, coro):
+    async def main():
+        try:
+            return await coro
+        finally:
+            await checker.close()
+    return asyncio.run(main())
+
+def test_retries_429_and_5xx_up_to_max_retries(toncenter):
+    toncenter.script = [429, 503]
+    checker = TONChecker()
+    
+    with pytest.raises(TONApiUnavailable):
+        run(checker, checker._get("getTransaction", {'hash': 'x'}))
+    
+    assert len(toncenter.requests) == Config.TONCENTER_MAX_RETRIES + 1
+    assert checker.retries == Config.TONCENTER_MAX_RETRIES
+    # После 429 повтор ждет Retry-After (обрезанный до BACKOFF_MAX), после 503 - сразу
+    first, second, third = (at for at, path in toncenter.requests)
+    assert second - first >= Config.TONCENTER_BACKOFF_MAX * 0.9
+    assert third - second < Config.TONCENTER_BACKOFF_MAX
+
+def test_retry_returns_response_once_api_recovers(toncenter):
+    toncenter.script = [429, 503, 200]
+    checker = TONChecker()
+    
+    response = run(checker, checker._get("getTransaction", {'hash': 'x'}))
+    
+    assert response.status_code == 200
+    assert len(toncenter.requests) == 3
+    assert checker.breaker.state == CIRCUIT_CLOSED
+
+def test_breaker_opens_rejects_and_closes_after_probe(toncenter):
+    checker = TONChecker()
+    calls_per_failure = Config.TONCENTER_MAX_RETRIES + 1
+    
+    async def scenario():
+        for _ in range(Config.TONCENTER_BREAKER_THRESHOLD):
+            with pytest.raises(TONApiUnavailable):
+                await checker._get("getTransaction", {'hash': 'x'})
+        assert checker.breaker.state == CIRCUIT_OPEN
+        sent = len(toncenter.requests)
+        assert sent == Config.TONCENTER_BREAKER_THRESHOLD * calls_per_failure
+        
+        # Открытый автомат отказывает сразу, не отправляя запросов
+        for _ in range(3):
+            with pytest.raises(TONApiUnavailable):
+                await checker._get("getTransaction", {'hash': 'x'})
+        assert len(toncenter.requests) == sent
+        assert checker.breaker.rejected == 3
+        
+        # После reset_timeout проходит один пробный запрос и закрывает автомат
+        toncenter.fallback = 200
+        await asyncio.sleep(Config.TONCENTER_BREAKER_RESET)
+        probe = asyncio.ensure_future(checker._get("getTransaction", {'hash': 'x'}))
+        await asyncio.sleep(0)
+        with pytest.raises(TONApiUnavailable):
+            await checker._get("getTransaction", {'hash': 'x'})
+        response = await probe
+        
+        assert response.status_code == 200
+        assert len(toncenter.requests) == sent + 1
+        assert checker.breaker.state == CIRCUIT_CLOSED
+        
+        await checker._get("getTransaction", {'hash': 'x'})
+        assert len(toncenter.requests) == sent + 2
+    
+    run(checker, scenario())
+
+def test_token_bucket_keeps_rate():
+    rate = 50
+    count = 26
+    
+    async def scenario():
+        bucket = TokenBucket(rate, capacity=1)
+        started = time.monotonic()
+        await asyncio.gather(*(bucket.acquire() for _ in range(count)))
+        return time.monotonic() - started, bucket.waits
+    
+    elapsed, waits = asyncio.run(scenario())
+    
+    # Первый токен есть сразу, остальные выдаются по одному раз в 1/rate секунд
+    expected = (count - 1) / rate
+    assert expected * 0.95 <= elapsed < expected + 0.25
+    assert waits == count - 1
+
+def test_checker_requests_keep_configured_rate(toncenter, monkeypatch):
+    monkeypatch.setattr(Config, "TONCENTER_RPS", 10)
+    toncenter.fallback = 200
+    checker = TONChecker()
+    count = 15
+    
+    async def scenario():
+        started = time.monotonic()
+        await asyncio.gather(*(checker._get("getTransaction", {'hash': str(i)}) for i in range(count)))
+        return time.monotonic() - started
+    
+    elapsed = run(checker, scenario())
+    
+    # Всплеск до capacity (= rate) проходит сразу, остальные запросы - не чаще rate в секунду
+    assert len(toncenter.requests) == count
+    expected = (count - Config.TONCENTER_RPS) / Config.TONCENTER_RPS
+    assert elapsed >= expected * 0.95
+    assert checker.limiter.waits == count - Config.TONCENTER_RPS
@@ -0,0 +1,61 @@
+import pytest
+
+from router import CallbackRouter, route, callback_data
+
+class Handlers:
+    @route('p', int)
+    async def product(self, update, context, product_id):
+        pass
+    
+    @route('o', str)
+    async def orders(self, update, context, page_token=None):
+        pass
+    
+    @route('m')
+    async def menu(self, update, context):
+        pass
+
+@pytest.fixture
+def router():
+    router = CallbackRouter()
+    router.include(Handlers())
+    return router
+
+def test_resolve_parses_arguments(router):
+    handler, args = router.resolve(callback_data('p', 123456))
+    assert handler.__name__ == 'product' and args == [123456]
+    assert router.resolve('o')[1] == []
+    assert router.resolve('o:token')[1] == ['token']
+    assert router.resolve('m')[1] == []
+
+@pytest.mark.parametrize("data", [
+    'p',            # id без значения по умолчанию опустить нельзя
+    'p:1:2',
+    'p:!',
+    'm:1',
+    'x',
+    '',
+    None,
+])
+def test_resolve_rejects_malformed_data(router, data):
+    assert router.resolve(data) is None
+
+def test_route_with_more_types_than_parameters():
+    class Broken:
+        @route('b', int)
+        async def broken(self, update, context):
+            pass
+    
+    with pytest.raises(ValueError):
+        CallbackRouter().include(Broken())
+
+def test_bot_routes_require_ids():
+    from handlers import bot_handlers
+    from admin import admin_handler
+    
+    router = CallbackRouter()
+    router.include(bot_handlers)
+    router.include(admin_handler)
+    for code in ('p', 'b', 'pd', 'c', 'r'):
+        assert router.resolve(code) is None
+        assert router.resolve(callback_data(code, 42))[1] == [42]
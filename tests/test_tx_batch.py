@@ -0,0 +1,67 @@
+import asyncio
+import base64
+
+import pytest
+
+from config import Config
+from utils import TONChecker
+
+def tx_hash(number):
+    return base64.b64encode(number.to_bytes(32, 'big')).decode()
+
+class FakeResponse:
+    status_code = 200
+    
+    def __init__(self, data):
+        self.data = data
+    
+    def json(self):
+        return self.data
+    
+    def raise_for_status(self):
+        pass
+
+def run_checks(monkeypatch, wallet_hashes, checked_hashes):
+    """Проверяет хэши одновременно; возвращает результаты и вызванные методы API"""
+    monkeypatch.setattr(Config, "TX_BATCH_WINDOW", 0.01)
+    calls = []
+    history = [{'transaction_id': {'lt': str(1000 - i), 'hash': h}} for i, h in enumerate(wallet_hashes)]
+    
+    async def get(method, params):
+        calls.append(method)
+        if method == "getTransactions":
+            return FakeResponse({'ok': True, 'result': history[:params['limit']]})
+        return FakeResponse({'ok': params['hash'] in wallet_hashes})
+    
+    async def check():
+        checker = TONChecker()
+        checker._get = get
+        return await asyncio.gather(*(checker.check_transaction(h) for h in checked_hashes))
+    
+    return asyncio.run(check()), calls
+
+def test_single_hash_is_checked_directly(monkeypatch):
+    results, calls = run_checks(monkeypatch, [tx_hash(1)], [tx_hash(2)])
+    assert results == [False]
+    assert calls == ["getTransaction"]
+
+@pytest.mark.parametrize("count", range(1, Config.TX_BATCH_HASHES_PER_PAGE))
+def test_small_batch_is_checked_directly(monkeypatch, count):
+    hashes = [tx_hash(i) for i in range(count)]
+    results, calls = run_checks(monkeypatch, hashes, hashes)
+    assert results == [True] * count
+    assert calls == ["getTransaction"] * count
+
+def test_large_batch_is_resolved_by_one_page(monkeypatch):
+    hashes = [tx_hash(i) for i in range(10)]
+    results, calls = run_checks(monkeypatch, hashes, hashes)
+    assert results == [True] * 10
+    assert calls == ["getTransactions"]
+
+def test_scan_stops_when_few_hashes_remain(monkeypatch):
+    # Страница заполнена, два хэша в ней не нашлись - вторую страницу ради них не читаем
+    found = [tx_hash(i) for i in range(Config.TX_BATCH_PAGE_SIZE)]
+    missing = [tx_hash(1000), tx_hash(1001)]
+    results, calls = run_checks(monkeypatch, found, found[:5] + missing)
+    assert results == [True] * 5 + [False, False]
+    assert calls == ["getTransactions", "getTransaction", "getTransaction"]
@@ -0,0 +1,122 @@
+import asyncio
+import json
+import socket
+
+import httpx
+import pytest
+from telegram.ext import Application, MessageHandler, filters
+from telegram.request import BaseRequest
+
+from config import Config
+from main import webhook_settings
+
+SECRET = "local-test-secret"
+
+# Обновление в том виде, в каком Telegram присылает его на webhook
+RECORDED_UPDATE = {
+    "update_id": 815234901,
+    "message": {
+        "message_id": 1834,
+        "from": {"id": 555000111, "is_bot": False, "first_name": "Тест", "username": "pizza_tester", "language_code": "ru"},
+        "chat": {"id": 555000111, "first_name": "Тест", "username": "pizza_tester", "type": "private"},
+        "date": 1760787000,
+        "text": "/start",
+        "entities": [{"offset": 0, "length": 6, "type": "bot_command"}]
+    }
+}
+
+class FakeBotApi(BaseRequest):
+    """Bot API без сети: отвечает на getMe и (set|delete)Webhook, запоминает вызовы"""
+    
+    def __init__(self):
+        self.calls = []
+    
+    async def initialize(self):
+        pass
+    
+    async def shutdown(self):
+        pass
+    
+    async def do_request(self, url, method, request_data=None, read_timeout=None,
+                         write_timeout=None, connect_timeout=None, pool_timeout=None):
+        api_method = url.rsplit('/', 1)[-1]
+        self.calls.append((api_method, request_data.parameters if request_data else {}))
+        if api_method == 'getMe':
+            result = {"id": 1, "is_bot": True, "first_name": "Pizza", "username": "pizza_numbers_bot"}
+        else:
+            result = True
+        return 200, json.dumps({"ok": True, "result": result}).encode()
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+@pytest.fixture
+def webhook_config(monkeypatch):
+    monkeypatch.setattr(Config, "WEBHOOK_URL", "https://bot.example.com/")
+    monkeypatch.setattr(Config, "WEBHOOK_SECRET", SECRET)
+    monkeypatch.setattr(Config, "WEBHOOK_LISTEN", "127.0.0.1")
+    monkeypatch.setattr(Config, "WEBHOOK_PORT", free_port())
+
+def post_updates(headers_list):
+    """Запускает webhook-сервер PTB с настройками бота и отправляет RECORDED_UPDATE
+    с каждым набором заголовков. Возвращает статусы ответов, обновления,
+    дошедшие до обработчика, и вызовы Bot API"""
+    api = FakeBotApi()
+    handled = []
+    
+    async def run():
+        application = Application.builder().token("123456:TEST").request(api).get_updates_request(FakeBotApi()).build()
+        
+        async def record(update, context):
+            handled.append(update)
+        
+        application.add_handler(MessageHandler(filters.ALL, record))
+        settings = webhook_settings()
+        url = f"http://127.0.0.1:{settings['port']}/{settings['url_path']}"
+        
+        await application.initialize()
+        await application.start()
+        await application.updater.start_webhook(**settings)
+        try:
+            statuses = []
+            async with httpx.AsyncClient() as client:
+                for headers in headers_list:
+                    response = await client.post(url, json=RECORDED_UPDATE, headers=headers)
+                    statuses.append(response.status_code)
+            # Принятое обновление обрабатывается из очереди, а не в ответе на POST
+            for _ in range(100):
+                if len(handled) == statuses.count(200):
+                    break
+                await asyncio.sleep(0.01)
+        finally:
+            await application.updater.stop()
+            await application.stop()
+            await application.shutdown()
+        return statuses
+    
+    return asyncio.run(run()), handled, api.calls
+
+def test_update_with_secret_reaches_handler(webhook_config):
+    statuses, handled, calls = post_updates([{'X-Telegram-Bot-Api-Secret-Token': SECRET}])
+    
+    assert statuses == [200]
+    assert len(handled) == 1
+    assert handled[0].update_id == RECORDED_UPDATE['update_id']
+    assert handled[0].effective_user.id == 555000111
+    assert handled[0].message.text == "/start"
+    
+    # Telegram получил адрес webhook и секрет, которым будет подписывать запросы
+    params = dict(calls)['setWebhook']
+    assert params['url'] == "https://bot.example.com/telegram"
+    assert params['secret_token'] == SECRET
+    assert params['allowed_updates'] == ["message", "callback_query"]
+
+@pytest.mark.parametrize("headers", [{}, {'X-Telegram-Bot-Api-Secret-Token': 'wrong'}])
+def test_update_without_valid_secret_is_rejected(webhook_config, headers):
+    # Следом - запрос с верным секретом: сервер работает, а до обработчика дошел только он
+    statuses, handled, calls = post_updates([headers, {'X-Telegram-Bot-Api-Secret-Token': SECRET}])
+    
+    assert statuses == [403, 200]
+    assert len(handled) == 1
@@ -1,50 +1,298 @@
-import requests
-import time
+import asyncio
+import base64
+import binascii
+import httpx
+from functools import partial
 from config import Config
+from cache import LRUCache, TTLCache, MISSING
+from resilience import TokenBucket, CircuitBreaker, backoff_delay
+
+class TONApiUnavailable(Exception):
+    """TON API не отвечает: исчерпаны повторы или открыт автомат отключения"""
+
+def normalize_tx_hash(tx_hash):
+    """Приводит хэш транзакции к виду, который возвращает toncenter (base64).
+    Принимает hex (в том числе с префиксом 0x) и base64/base64url"""
+    value = tx_hash.strip()
+    if value[:2].lower() == '0x':
+        value = value[2:]
+    
+    try:
+        if len(value) == 64:
+            raw = bytes.fromhex(value)
+        else:
+            value = value.replace('-', '+').replace('_', '/')
+            raw = base64.b64decode(value + '=' * (-len(value) % 4), validate=True)
+    except (ValueError, binascii.Error):
+        return tx_hash.strip()
+    
+    if len(raw) != 32:
+        return tx_hash.strip()
+    return base64.b64encode(raw).decode()
+
+def _settle(future, result=None, error=None):
+    # Ожидающий мог быть отменен - такой Future уже завершен
+    if future.done():
+        return
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
 
 class TONChecker:
     def __init__(self):
         self.api_key = Config.TONCENTER_API_KEY
         self.api_url = Config.TONCENTER_API_URL
         self.wallet_address = Config.WALLET_TON
+        
+        # Не больше max_concurrency одновременных запросов к API
+        self.semaphore = asyncio.Semaphore(Config.TONCENTER_MAX_CONCURRENCY)
+        self.client = None
+        
+        self.limiter = TokenBucket(Config.TONCENTER_RPS)
+        self.breaker = CircuitBreaker(Config.TONCENTER_BREAKER_THRESHOLD, Config.TONCENTER_BREAKER_RESET)
+        self.max_retries = Config.TONCENTER_MAX_RETRIES
+        self.retries = 0
+        
+        # Транзакции неизменяемы: найденная остается найденной навсегда,
+        # а "не найдено" может измениться, поэтому живет недолго
+        self.found = LRUCache(Config.TX_CACHE_SIZE)
+        self.not_found = TTLCache(Config.TX_NEGATIVE_CACHE_SIZE, Config.TX_NEGATIVE_TTL)
+        # Запросы в процессе: одновременные проверки одного хэша ждут один запрос
+        self.in_flight = {}
+        self.coalesced = 0
+        
+        # Пакет хэшей, ожидающих проверки по истории кошелька: хэш -> Future
+        self.batch = {}
+        self.batch_task = None
+        self.batches = 0
+        self.pages_scanned = 0
+        self.resolved_by_scan = 0
+        self.stragglers = 0
     
-    def check_transaction(self, tx_hash):
-        """Проверяет транзакцию по хэшу"""
-        try:
-            headers = {'X-API-Key': self.api_key}
-            params = {'hash': tx_hash}
-            
-            response = requests.get(
-                f"{self.api_url}getTransaction",
+    def _get_client(self):
+        # Один клиент на все время работы: соединения переиспользуются (keep-alive)
+        if self.client is None:
+            headers = {'X-API-Key': self.api_key} if self.api_key else {}
+            self.client = httpx.AsyncClient(
+                base_url=self.api_url,
                 headers=headers,
-                params=params
+                timeout=httpx.Timeout(Config.TONCENTER_TIMEOUT),
+                limits=httpx.Limits(
+                    max_connections=Config.TONCENTER_MAX_CONCURRENCY,
+                    max_keepalive_connections=Config.TONCENTER_MAX_CONCURRENCY
+                )
             )
+        return self.client
+    
+    def _retry_delay(self, attempt, response=None):
+        delay = backoff_delay(attempt, Config.TONCENTER_BACKOFF_BASE, Config.TONCENTER_BACKOFF_MAX)
+        if response is not None:
+            try:
+                retry_after = float(response.headers.get('Retry-After', 0))
+            except ValueError:
+                retry_after = 0
+            delay = max(delay, min(retry_after, Config.TONCENTER_BACKOFF_MAX))
+        return delay
+    
+    async def _send(self, method, params):
+        """Запрос с лимитом частоты и повторами при 429/5xx и сетевых ошибках"""
+        error = None
+        delay = 0
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                self.retries += 1
+                await asyncio.sleep(delay)
+            
+            await self.limiter.acquire()
+            try:
+                async with self.semaphore:
+                    response = await self._get_client().get(method, params=params)
+            except httpx.TransportError as e:
+                error = e
+                delay = self._retry_delay(attempt)
+                continue
             
-            if response.status_code == 200:
-                data = response.json()
-                return data.get('ok', False)
+            if response.status_code != 429 and response.status_code < 500:
+                return response
+            error = f"HTTP {response.status_code}"
+            delay = self._retry_delay(attempt, response)
+        
+        raise TONApiUnavailable(f"TON API недоступен: {error}")
+    
+    async def _get(self, method, params):
+        # Пока автомат открыт, не копим запросы к лежащему API - отказываем сразу
+        if not self.breaker.allow():
+            raise TONApiUnavailable("TON API временно отключен после серии ошибок")
+        
+        try:
+            response = await self._send(method, params)
+        except TONApiUnavailable:
+            self.breaker.record_failure()
+            raise
+        except BaseException:
+            self.breaker.record_cancel()
+            raise
+        
+        self.breaker.record_success()
+        return response
+    
+    async def _fetch_transaction(self, tx_hash):
+        response = await self._get("getTransaction", {'hash': tx_hash})
+        
+        if response.status_code == 200:
+            data = response.json()
+            return data.get('ok', False)
+        return False
+    
+    async def _lookup_transaction(self, tx_hash):
+        # Хэш ждет окно TX_BATCH_WINDOW и проверяется вместе с остальными
+        future = asyncio.get_running_loop().create_future()
+        self.batch[tx_hash] = future
+        if self.batch_task is None:
+            self.batch_task = asyncio.ensure_future(self._run_batch())
+        return await future
+    
+    async def _run_batch(self):
+        await asyncio.sleep(Config.TX_BATCH_WINDOW)
+        batch, self.batch = self.batch, {}
+        self.batch_task = None
+        await self._resolve_batch(batch)
+    
+    async def _resolve_batch(self, batch):
+        """Ищет хэши пакета в последних страницах истории кошелька.
+        Отдельный запрос getTransaction - только для не найденных в просмотренных страницах.
+        Страница стоит одного запроса, поэтому следующую читаем, только пока ненайденных
+        хэшей не меньше TX_BATCH_HASHES_PER_PAGE: один-два хэша проверяются напрямую"""
+        self.batches += 1
+        page_size = Config.TX_BATCH_PAGE_SIZE
+        lt = tx_hash = None
+        try:
+            for _ in range(Config.TX_BATCH_SCAN_PAGES):
+                if len(batch) < Config.TX_BATCH_HASHES_PER_PAGE:
+                    break
+                page = await self.fetch_transactions(page_size, lt, tx_hash)
+                self.pages_scanned += 1
+                
+                index = {normalize_tx_hash(tx['transaction_id']['hash']) for tx in page}
+                for found in [key for key in batch if key in index]:
+                    self.resolved_by_scan += 1
+                    _settle(batch.pop(found), True)
+                
+                if not batch:
+                    return
+                if len(page) < page_size:
+                    # Просмотрена вся история кошелька - остальных хэшей в ней нет
+                    for future in batch.values():
+                        _settle(future, False)
+                    return
+                lt, tx_hash = page[-1]['transaction_id']['lt'], page[-1]['transaction_id']['hash']
+        except Exception as e:
+            for future in batch.values():
+                _settle(future, error=e)
+            return
+        
+        self.stragglers += len(batch)
+        await asyncio.gather(*(self._resolve_single(key, future) for key, future in batch.items()))
+    
+    async def _resolve_single(self, tx_hash, future):
+        try:
+            _settle(future, await self._fetch_transaction(tx_hash))
+        except Exception as e:
+            _settle(future, error=e)
+    
+    def _remember(self, tx_hash, task):
+        self.in_flight.pop(tx_hash, None)
+        # Ошибки не кэшируем: следующая проверка снова спросит API
+        if task.cancelled() or task.exception() is not None:
+            return
+        if task.result():
+            self.found.put(tx_hash, True)
+        else:
+            self.not_found.put(tx_hash, True)
+    
+    async def check_transaction(self, tx_hash):
+        """Проверяет транзакцию по хэшу"""
+        tx_hash = normalize_tx_hash(tx_hash)
+        if self.found.get(tx_hash) is not MISSING:
+            return True
+        if self.not_found.get(tx_hash) is not MISSING:
+            return False
+        
+        task = self.in_flight.get(tx_hash)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            task = asyncio.ensure_future(self._lookup_transaction(tx_hash))
+            task.add_done_callback(partial(self._remember, tx_hash))
+            self.in_flight[tx_hash] = task
+        
+        try:
+            # shield: отмена одного ожидающего не отменяет общий запрос
+            return await asyncio.shield(task)
+        except TONApiUnavailable:
+            raise
         except Exception as e:
             print(f"Error checking transaction: {e}")
         
         return False
     
-    def get_wallet_transactions(self, limit=10):
+    def cache_stats(self):
+        """Счетчики кэша проверок транзакций"""
+        return {
+            'hits': self.found.hits + self.not_found.hits,
+            'misses': self.not_found.misses,
+            'coalesced': self.coalesced,
+            'in_flight': len(self.in_flight),
+            'found': self.found.stats(),
+            'not_found': self.not_found.stats()
+        }
+    
+    def api_stats(self):
+        """Состояние лимитера, повторов и автомата отключения"""
+        return {
+            'breaker': self.breaker.stats(),
+            'limiter': self.limiter.stats(),
+            'retries': self.retries
+        }
+    
+    def batch_stats(self):
+        """Счетчики пакетной проверки хэшей"""
+        return {
+            'batches': self.batches,
+            'pages_scanned': self.pages_scanned,
+            'resolved_by_scan': self.resolved_by_scan,
+            'stragglers': self.stragglers,
+            'pending': len(self.batch)
+        }
+    
+    async def fetch_transactions(self, limit=10, lt=None, tx_hash=None, to_lt=None):
+        """Страница транзакций кошелька, новые сверху.
+        
+        lt/tx_hash - транзакция, с которой начинается страница (включительно),
+        to_lt - нижняя граница logical time (не включительно).
+        В отличие от get_wallet_transactions, ошибки API не глушатся"""
+        params = {
+            'address': self.wallet_address,
+            'limit': limit
+        }
+        if lt is not None:
+            params['lt'] = lt
+            params['hash'] = tx_hash
+        if to_lt is not None:
+            params['to_lt'] = to_lt
+        
+        response = await self._get("getTransactions", params)
+        response.raise_for_status()
+        data = response.json()
+        if not data.get('ok', False):
+            raise RuntimeError(data.get('error', 'TON API error'))
+        return data.get('result', [])
+    
+    async def get_wallet_transactions(self, limit=10):
         """Получает последние транзакции кошелька"""
         try:
-            headers = {'X-API-Key': self.api_key}
-            params = {
-                'address': self.wallet_address,
-                'limit': limit
-            }
-            
-            response = requests.get(
-                f"{self.api_url}getTransactions",
-                headers=headers,
-                params=params
-            )
-            
-            if response.status_code == 200:
-                return response.json().get('result', [])
+            return await self.fetch_transactions(limit)
         except Exception as e:
             print(f"Error getting transactions: {e}")
         
@@ -55,5 +303,11 @@ class TONChecker:
         if len(self.wallet_address) > 20:
             return f"{self.wallet_address[:10]}...{self.wallet_address[-10:]}"
         return self.wallet_address
+    
+    async def close(self):
+        """Закрывает пул соединений"""
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
 
 ton_checker = TONChecker()
\ No newline at end of file